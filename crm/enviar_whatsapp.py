@@ -1,7 +1,6 @@
 # enviar_whatsapp.py (Versão Final com Logs e Controle Semanal)
 
 import os
-import re
 import sys
 import time
 import random
@@ -11,6 +10,10 @@ import json
 from datetime import datetime
 from dotenv import load_dotenv
 
+# Permite importar o pacote licitai quando o script é executado de dentro da pasta crm.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from licitai.processing.contact_extractor import normalizar_telefone
+
 # ==============================================================================
 # --- ÁREA DE CONFIGURAÇÃO ---
 # ==============================================================================
@@ -186,9 +189,11 @@ def main():
             print(f"AVISO: Linha {index + 2} ignorada por falta de nome ou telefone.")
             continue
             
-        telefone_limpo = re.sub(r'\D', '', telefone_original)
-        if len(telefone_limpo) >= 10 and not telefone_limpo.startswith('55'):
-            telefone_limpo = '55' + telefone_limpo
+        telefone_e164 = normalizar_telefone(telefone_original)
+        if not telefone_e164:
+            print(f"AVISO: Linha {index + 2} ignorada: telefone '{telefone_original}' inválido.")
+            continue
+        telefone_limpo = telefone_e164.lstrip('+') # A API espera apenas os dígitos.
         
         print(f"\n({index + 1}/{total}) Preparando para enviar para: {nome} ({telefone_limpo})")
 
@@ -0,0 +1,74 @@
+# higienizar_contatos.py
+"""
+Higieniza uma lista de contatos (CSV com as colunas nome, email e telefone) antes das campanhas:
+normaliza os e-mails (inclusive ofuscados, como "fulano [at] orgao.gov.br") e os telefones
+para E.164, descarta os inválidos e remove os repetidos. Usa as mesmas regras da extração
+de contatos do enriquecimento (licitai/processing/contact_extractor.py).
+
+Uso: python higienizar_contatos.py [contatos.csv] [--saida contatos_higienizados.csv]
+"""
+import os
+import sys
+import argparse
+import pandas as pd
+
+# Permite importar o pacote licitai quando o script é executado de dentro da pasta crm.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from licitai.processing.contact_extractor import desofuscar, normalizar_email, normalizar_telefone
+
+def _valor(contato, coluna):
+    valor = contato.get(coluna)
+    return '' if pd.isna(valor) else str(valor).strip()
+
+def higienizar(contatos_df: pd.DataFrame) -> tuple:
+    """Retorna (DataFrame higienizado, contadores de descartes)."""
+    contatos_df = contatos_df.rename(columns=str.lower)
+    higienizados = []
+    vistos = set()
+    descartes = {'email_invalido': 0, 'telefone_invalido': 0, 'sem_contato': 0, 'duplicado': 0}
+
+    for _, contato in contatos_df.iterrows():
+        email_original = _valor(contato, 'email')
+        telefone_original = _valor(contato, 'telefone')
+
+        email = normalizar_email(desofuscar(email_original)) if email_original else None
+        telefone = normalizar_telefone(telefone_original) if telefone_original else None
+        if email_original and not email:
+            descartes['email_invalido'] += 1
+        if telefone_original and not telefone:
+            descartes['telefone_invalido'] += 1
+        if not email and not telefone:
+            descartes['sem_contato'] += 1
+            continue
+
+        chaves = {chave for chave in (email, telefone) if chave}
+        if chaves & vistos:
+            descartes['duplicado'] += 1
+            continue
+        vistos |= chaves
+        higienizados.append({**contato.to_dict(), 'email': email or '', 'telefone': telefone or ''})
+
+    return pd.DataFrame(higienizados, columns=list(contatos_df.columns)), descartes
+
+def main():
+    parser = argparse.ArgumentParser(description="Higieniza uma lista de contatos (e-mails e telefones).")
+    parser.add_argument('entrada', nargs='?', default='contatos.csv', help="Arquivo CSV de entrada (padrão: contatos.csv).")
+    parser.add_argument('--saida', help="Arquivo CSV de saída (padrão: <entrada>_higienizado.csv).")
+    args = parser.parse_args()
+
+    try:
+        contatos_df = pd.read_csv(args.entrada, dtype=str)
+    except FileNotFoundError:
+        print(f"ERRO: Arquivo '{args.entrada}' não encontrado.")
+        return
+
+    resultado_df, descartes = higienizar(contatos_df)
+    saida = args.saida or f"{os.path.splitext(args.entrada)[0]}_higienizado.csv"
+    resultado_df.to_csv(saida, index=False)
+
+    print(f"{len(contatos_df)} contato(s) lidos, {len(resultado_df)} mantido(s) em '{saida}'.")
+    print(f"E-mails inválidos: {descartes['email_invalido']} | Telefones inválidos: {descartes['telefone_invalido']} | "
+          f"Sem contato válido: {descartes['sem_contato']} | Duplicados: {descartes['duplicado']}")
+
+if __name__ == "__main__":
+    main()
@@ -2,50 +2,197 @@
 """
 Módulo simples para abstrair a execução de buscas no Google.
 Utiliza a biblioteca 'googlesearch-python' para realizar as buscas.
+Todas as buscas do processo (síncronas ou assíncronas, de qualquer thread) passam por um
+único limitador de cortesia, que espaça as requisições pela taxa configurada, com jitter,
+e reduz o ritmo quando o Google começa a bloquear.
+As buscas em si são feitas pelo backend escolhido em LICITAI_BUSCA_BACKEND (scraping do
+Google por padrão; ver licitai/processing/search_backends.py).
 """
+import asyncio
+import os
+import random
+import threading
 import time
 import logging
-from collections import namedtuple
-from googlesearch import search as google_search_lib
+from licitai.processing.search_backends import SearchResult, QueryResultSet, ErroAPIBusca, obter_backend_busca
 
 # Configuração do logger
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Estruturas de dados para os resultados
-SearchResult = namedtuple('SearchResult', ['url', 'title', 'snippet'])
-QueryResultSet = namedtuple('QueryResultSet', ['query', 'results'])
+# --- Configuração (variáveis de ambiente) ---
+BUSCAS_POR_MINUTO = float(os.getenv("LICITAI_BUSCAS_POR_MINUTO", "20"))
+JITTER_BUSCAS = float(os.getenv("LICITAI_JITTER_BUSCAS", "0.3")) # Variação relativa do intervalo entre buscas.
+PAUSA_BLOQUEIO = 30.0 # Segundos sem buscas após um bloqueio, multiplicados pela penalidade atual.
+PENALIDADE_MAXIMA = 16.0
+MAX_TENTATIVAS_BLOQUEIO = 4
+
+class ErroBloqueioBusca(Exception):
+    """O Google continuou bloqueando a busca após todas as tentativas."""
+
+class ErroConfiguracaoBusca(Exception):
+    """O backend de busca não pôde ser criado ou recusou as credenciais: nenhuma busca vai funcionar até corrigir a configuração."""
+
+class ErroBuscaIncompleta(Exception):
+    """
+    Parte das buscas falhou e as demais não trouxeram o que se procurava: o resultado vazio
+    não deve ser tratado (nem guardado no diretório de órgãos) como "nada encontrado".
+    """
+
+# Respostas da API de busca que indicam chave inválida, API desativada ou requisição malformada.
+STATUS_ERRO_CONFIGURACAO = frozenset({400, 401, 403})
+
+def eh_erro_de_configuracao(erro: Exception) -> bool:
+    """Identifica os erros que não se resolvem tentando de novo (ex: chave da API inválida)."""
+    return isinstance(erro, ErroAPIBusca) and status_http(erro) in STATUS_ERRO_CONFIGURACAO
+
+def _obter_backend():
+    try:
+        return obter_backend_busca()
+    except Exception as e:
+        raise ErroConfiguracaoBusca(f"Backend de busca indisponível: {e}") from e
+
+# Respostas HTTP do Google que indicam limitação de taxa (429) ou bloqueio do scraping (503 da página de captcha).
+STATUS_BLOQUEIO = frozenset({429, 503})
+
+def status_http(erro: Exception) -> int | None:
+    """
+    Código HTTP de um erro de busca: `status`/`status_code`/`code` da exceção (ErroAPIBusca,
+    aiohttp.ClientResponseError, ...) ou `response.status_code` (requests.HTTPError, usado pelo googlesearch).
+    """
+    for atributo in ('status', 'status_code', 'code'):
+        valor = getattr(erro, atributo, None)
+        if isinstance(valor, int):
+            return valor
+    return getattr(getattr(erro, 'response', None), 'status_code', None)
+
+def eh_bloqueio(erro: Exception) -> bool:
+    """Identifica as respostas do Google que indicam limitação de taxa ou bloqueio do scraping, pelo status HTTP."""
+    return status_http(erro) in STATUS_BLOQUEIO
+
+class LimitadorCortesia:
+    """
+    Espaça as buscas de todo o processo em `buscas_por_minuto`, com jitter. Cada bloqueio
+    dobra o intervalo (até PENALIDADE_MAXIMA vezes) e pausa as buscas; cada sucesso o
+    reduz aos poucos de volta à taxa configurada. É seguro entre threads e event loops.
+    """
+
+    def __init__(self, buscas_por_minuto: float = BUSCAS_POR_MINUTO, jitter: float = JITTER_BUSCAS):
+        self._intervalo = 60.0 / buscas_por_minuto
+        self._jitter = jitter
+        self._lock = threading.Lock()
+        self._proxima = 0.0 # Instante (time.monotonic) liberado para a próxima busca.
+        self.penalidade = 1.0
+        self.bloqueios = 0
+
+    def _reservar(self) -> float:
+        """Reserva o próximo horário livre e retorna quantos segundos faltam até ele."""
+        with self._lock:
+            agora = time.monotonic()
+            inicio = max(agora, self._proxima)
+            intervalo = self._intervalo * self.penalidade
+            self._proxima = inicio + intervalo * random.uniform(1 - self._jitter, 1 + self._jitter)
+            return inicio - agora
+
+    async def aguardar(self):
+        await asyncio.sleep(self._reservar())
+
+    def aguardar_sync(self):
+        time.sleep(self._reservar())
+
+    def registrar_bloqueio(self):
+        with self._lock:
+            self.bloqueios += 1
+            self.penalidade = min(PENALIDADE_MAXIMA, self.penalidade * 2)
+            self._proxima = max(self._proxima, time.monotonic() + PAUSA_BLOQUEIO * self.penalidade)
+        logger.warning(f"Busca bloqueada pelo Google. Reduzindo o ritmo (intervalo x{self.penalidade:.0f}).")
+
+    def definir_taxa(self, buscas_por_minuto: float):
+        """Altera a taxa configurada (ex: benchmarks com o backend falso)."""
+        with self._lock:
+            self._intervalo = 60.0 / buscas_por_minuto
+
+    def registrar_sucesso(self):
+        with self._lock:
+            self.penalidade = max(1.0, self.penalidade * 0.9)
+
+    def metricas(self) -> dict:
+        return {
+            'buscasPorMinuto': round(60.0 / (self._intervalo * self.penalidade), 2),
+            'penalidade': round(self.penalidade, 2),
+            'bloqueios': self.bloqueios
+        }
+
+# Limitador compartilhado por todas as buscas deste processo.
+limitador_buscas = LimitadorCortesia()
+
+async def _buscar_query(query: str, num_results: int, lang: str) -> QueryResultSet:
+    backend = _obter_backend()
+    for tentativa in range(1, MAX_TENTATIVAS_BLOQUEIO + 1):
+        await limitador_buscas.aguardar()
+        try:
+            logger.info(f"Executando busca para a query: '{query}'")
+            resultados = await backend.buscar_async(query, num_results, lang)
+        except Exception as e:
+            if eh_erro_de_configuracao(e):
+                raise ErroConfiguracaoBusca(f"Busca recusada pelo backend: {e}") from e
+            if not eh_bloqueio(e):
+                logger.error(f"Erro ao executar a busca para a query '{query}': {e}")
+                return QueryResultSet(query=query, results=[], erro=str(e) or type(e).__name__)
+            limitador_buscas.registrar_bloqueio()
+            if tentativa == MAX_TENTATIVAS_BLOQUEIO:
+                raise ErroBloqueioBusca(f"Busca bloqueada após {MAX_TENTATIVAS_BLOQUEIO} tentativas: {e}") from e
+            continue
+        limitador_buscas.registrar_sucesso()
+        return QueryResultSet(query=query, results=resultados)
+
+async def search_async(queries: list, num_results: int = 5, lang: str = 'pt-br') -> list:
+    """
+    Executa as queries concorrentemente, no ritmo do limitador global, e retorna os
+    resultados na ordem das queries. Erros comuns resultam em uma lista vazia para a
+    query, com a mensagem em `erro` (quem chamou decide se o resultado pode ser guardado);
+    bloqueios persistentes lançam ErroBloqueioBusca e erros de configuração do backend,
+    ErroConfiguracaoBusca, para que quem chamou tente de novo mais tarde em vez de tratar
+    a busca como sem resultados. Ao primeiro desses erros, as queries ainda em andamento
+    são canceladas (não adianta continuar batendo no Google enquanto ele bloqueia).
+    """
+    tarefas = [asyncio.create_task(_buscar_query(query, num_results, lang)) for query in queries]
+    try:
+        return list(await asyncio.gather(*tarefas))
+    finally:
+        pendentes = [tarefa for tarefa in tarefas if not tarefa.done()]
+        for tarefa in pendentes:
+            tarefa.cancel()
+        # Aguarda os cancelamentos (e recolhe erros simultâneos, que já não têm quem os trate).
+        await asyncio.gather(*pendentes, return_exceptions=True)
 
 def search(queries: list, num_results: int = 5, lang: str = 'pt-br', pause: int = 2):
     """
     Executa uma lista de queries no Google e retorna os resultados.
+    O espaçamento entre buscas vem do limitador global; `pause` é mantido apenas por compatibilidade.
     """
+    backend = _obter_backend()
     all_results = []
     for query in queries:
-        try:
-            logger.info(f"Executando busca para a query: '{query}'")
-            # A biblioteca retorna um gerador, então o convertemos para uma lista
-            search_results_generator = google_search_lib(
-                query,
-                num_results=num_results,
-                lang=lang
-                # O argumento 'pause' foi removido daqui, pois não é suportado pela biblioteca.
-            )
-            
-            # O snippet não é fornecido por esta biblioteca, então passamos um texto padrão.
-            # O mais importante é a URL, que será usada para extrair o conteúdo da página.
-            current_results = [
-                SearchResult(url=url, title="N/A", snippet="Snippet não disponível") 
-                for url in search_results_generator
-            ]
-
-            all_results.append(QueryResultSet(query=query, results=current_results))
-            
-        except Exception as e:
-            logger.error(f"Erro ao executar a busca para a query '{query}': {e}")
-            all_results.append(QueryResultSet(query=query, results=[]))
-        
-        # Mantemos uma pausa manual entre as diferentes queries para não sobrecarregar o serviço
-        time.sleep(pause)
-        
-    return all_results
\ No newline at end of file
+        current_results = []
+        erro = None
+        for tentativa in range(1, MAX_TENTATIVAS_BLOQUEIO + 1):
+            limitador_buscas.aguardar_sync()
+            try:
+                logger.info(f"Executando busca para a query: '{query}'")
+                current_results = backend.buscar(query, num_results, lang)
+                limitador_buscas.registrar_sucesso()
+                break
+            except Exception as e:
+                if eh_erro_de_configuracao(e):
+                    raise ErroConfiguracaoBusca(f"Busca recusada pelo backend: {e}") from e
+                if eh_bloqueio(e):
+                    limitador_buscas.registrar_bloqueio()
+                    if tentativa < MAX_TENTATIVAS_BLOQUEIO:
+                        continue
+                logger.error(f"Erro ao executar a busca para a query '{query}': {e}")
+                erro = str(e) or type(e).__name__
+                break
+        all_results.append(QueryResultSet(query=query, results=current_results, erro=erro))
+
+    return all_results
@@ -0,0 +1,21 @@
+# licitai/benchmarks/_comum.py
+"""Funções compartilhadas pelos benchmarks: percentis das latências e limpeza das coleções do emulador."""
+
+def percentil(valores: list, p: float) -> float:
+    """Percentil `p` (0 a 1) dos valores, pelo elemento mais próximo (0 se não houver valores)."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+def limpar_colecoes(db, nomes):
+    """Apaga todos os documentos das coleções (em lotes de 500). Use apenas contra o emulador."""
+    for nome in nomes:
+        while True:
+            docs = list(db.collection(nome).limit(500).stream())
+            if not docs:
+                break
+            batch = db.batch()
+            for doc in docs:
+                batch.delete(doc.reference)
+            batch.commit()
@@ -0,0 +1,164 @@
+# licitai/benchmarks/ai_worker_bench.py
+"""
+Benchmark de ponta a ponta do ai_worker sem consumir cota do Gemini.
+Popula o emulador do Firestore com contratações e tarefas sintéticas, executa o
+WorkerPool real do worker com o backend de LLM falso até a fila esvaziar e
+reporta vazão (tarefas/s), latências p50/p95 e retentativas.
+
+Uso (requer o emulador: `gcloud emulators firestore start --host-port=localhost:8080`):
+  FIRESTORE_EMULATOR_HOST=localhost:8080 python -m licitai.benchmarks.ai_worker_bench --tarefas 500
+"""
+import os
+import sys
+
+# O backend falso precisa ser escolhido antes de importar o worker (que exige a chave do Gemini).
+os.environ.setdefault("LICITAI_LLM_BACKEND", "falso")
+
+import argparse
+import asyncio
+import datetime
+import logging
+import random
+import time
+from collections import Counter
+
+from google.cloud import firestore
+
+from licitai.benchmarks._comum import limpar_colecoes, percentil
+from licitai.processing import ai_worker, task_retries
+from licitai.processing.contratacao_snapshot import CAMPO_SNAPSHOT, montar_snapshot
+from licitai.processing.llm_backends import BackendFalso, definir_backend
+from licitai.processing.regex_extractor import limitador, metricas_cascata
+
+logger = logging.getLogger(__name__)
+
+OBJETOS_MODELO = [
+    "Registro de preços para aquisição de microcomputadores e notebooks para a {orgao}",
+    "Renovação de licenças de software antivírus corporativo para {n} estações de trabalho",
+    "Contratação de empresa para prestação de serviços de suporte técnico em informática",
+    "Aquisição de licenças perpétuas de Microsoft Office LTSC para a {orgao}",
+    "Contratação de solução de backup e storage para o datacenter da {orgao}",
+    "Aquisição de material de expediente para as escolas municipais",
+    "Subscrição de Google Workspace para {n} usuários da {orgao}",
+    "Contratação de serviços de desenvolvimento e manutenção de sistemas",
+]
+ORGAOS = ["Prefeitura Municipal de Anápolis", "Secretaria de Saúde", "Câmara Municipal de Itu", "Tribunal de Contas"]
+
+def popular_fila(db, total: int, taxa_duplicados: float, semente: int):
+    """Cria `total` contratações e tarefas pendentes; uma fração repete objetos já usados."""
+    rnd = random.Random(semente)
+    agora = datetime.datetime.now(datetime.timezone.utc)
+    objetos_usados = []
+    batch = db.batch()
+    operacoes = 0
+    for i in range(total):
+        if objetos_usados and rnd.random() < taxa_duplicados:
+            objeto = rnd.choice(objetos_usados)
+        else:
+            objeto = rnd.choice(OBJETOS_MODELO).format(orgao=rnd.choice(ORGAOS), n=rnd.randint(10, 5000)) + f" (processo {i})"
+            objetos_usados.append(objeto)
+        pncp = f"BENCH-{i:06d}"
+        contratacao = {"numeroControlePNCP": pncp, "objetoCompra": objeto}
+        batch.set(db.collection(ai_worker.CONTRATACOES_COLLECTION_NAME).document(pncp), contratacao)
+        batch.set(db.collection(ai_worker.TAREFAS_COLLECTION_NAME).document(f"bench-{i:06d}"), {
+            "contratacaoId": pncp, "numeroControlePNCP": pncp, "clienteId": "benchmark",
+            "status": ai_worker.STATUS_PENDENTE, "data_criacao": agora,
+            CAMPO_SNAPSHOT: montar_snapshot(contratacao)
+        })
+        operacoes += 2
+        if operacoes >= 400:
+            batch.commit()
+            batch = db.batch()
+            operacoes = 0
+    if operacoes:
+        batch.commit()
+
+async def aguardar_fila_vazia(db_async, pool, intervalo: float = 1.0):
+    """
+    Encerra o pool quando não houver mais tarefas pendentes, em análise ou reagendadas
+    (estas ainda serão retentadas após o `nextAttemptAt`).
+    """
+    query = db_async.collection(ai_worker.TAREFAS_COLLECTION_NAME).where(
+        'status', 'in', [ai_worker.STATUS_PENDENTE, ai_worker.STATUS_ANALISANDO, task_retries.STATUS_REAGENDADA_ANALISE]
+    )
+    while True:
+        await asyncio.sleep(intervalo)
+        restantes = len([doc async for doc in query.stream()])
+        if restantes == 0:
+            pool.parar()
+            return
+
+def relatorio(db, inicio: float, fim: float, backend: BackendFalso):
+    tarefas = [doc.to_dict() for doc in db.collection(ai_worker.TAREFAS_COLLECTION_NAME).stream()]
+    status = Counter(t.get('status') for t in tarefas)
+    origens = Counter(t.get('origemAnalise') for t in tarefas if t.get('origemAnalise'))
+    ponta_a_ponta = [(t['fimAnalise'] - t['data_criacao']).total_seconds() for t in tarefas if t.get('fimAnalise')]
+    servico = [(t['fimAnalise'] - t['inicioAnalise']).total_seconds() for t in tarefas if t.get('fimAnalise') and t.get('inicioAnalise')]
+    # Tentativas por tarefa: 'tentativasAnalise' nas concluídas; 'attempts' (falhas registradas) nas demais.
+    tentativas = Counter(t.get('tentativasAnalise', t.get('attempts', 0)) for t in tarefas)
+    retentativas_quota = Counter((t.get('usoIA') or {}).get('retentativas', 0) for t in tarefas if t.get('usoIA'))
+    duracao = fim - inicio
+
+    print("\n===========================================")
+    print("      BENCHMARK DO AI WORKER (LLM FALSO)")
+    print("===========================================")
+    print(f"Tarefas: {len(tarefas)} em {duracao:.1f}s -> {len(tarefas) / duracao:.2f} tarefas/s")
+    print(f"Latência ponta a ponta (criação -> fim): p50 {percentil(ponta_a_ponta, 0.5):.2f}s | p95 {percentil(ponta_a_ponta, 0.95):.2f}s")
+    print(f"Latência de serviço (reivindicação -> fim): p50 {percentil(servico, 0.5):.2f}s | p95 {percentil(servico, 0.95):.2f}s")
+    print(f"Status finais: {dict(status)}")
+    print(f"Tentativas por tarefa: {dict(sorted(tentativas.items()))} "
+          f"(retentativas: {sum(n * (k - 1) for k, n in tentativas.items() if k > 1)})")
+    print(f"Retentativas por cota nas análises da IA: {dict(sorted(retentativas_quota.items()))} "
+          f"(total: {sum(k * n for k, n in retentativas_quota.items())})")
+    print(f"Origem das análises: {dict(origens)}")
+    print(f"Backend falso: {backend.metricas()}")
+    print(f"Limitador: {limitador.metricas()}")
+    print(f"Cascata: {metricas_cascata.resumo()}")
+    print("===========================================")
+
+async def executar(args):
+    # Cliente síncrono para preparar e ler o emulador; o worker usa o seu AsyncClient.
+    db = firestore.Client(project=ai_worker.PROJECT_ID)
+    db_async = ai_worker.get_firestore_client()
+    logger.info("Limpando coleções do emulador e populando a fila sintética...")
+    limpar_colecoes(db, [ai_worker.TAREFAS_COLLECTION_NAME, ai_worker.CONTRATACOES_COLLECTION_NAME, 'cacheAnalises'])
+    popular_fila(db, args.tarefas, args.taxa_duplicados, args.semente)
+
+    backend = BackendFalso(latencia_media=args.latencia_media, latencia_desvio=args.latencia_desvio,
+                           taxa_erro=args.taxa_erro, taxa_429=args.taxa_429,
+                           taxa_json_malformado=args.taxa_json_malformado, semente=args.semente)
+    definir_backend(backend)
+    # Backoff curto: o benchmark espera as retentativas das tarefas reagendadas antes de encerrar.
+    task_retries.BACKOFF_BASE_SEGUNDOS = args.backoff_base
+
+    pool = ai_worker.montar_worker(db_async, concorrencia=args.concorrencia, tamanho_lote=args.tamanho_lote)
+    pool.intervalo_ocioso = 1
+    inicio = time.monotonic()
+    await asyncio.gather(pool.executar(), aguardar_fila_vazia(db_async, pool))
+    fim = time.monotonic()
+    relatorio(db, inicio, fim, backend)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do ai_worker com LLM falso e emulador do Firestore.")
+    parser.add_argument('--tarefas', type=int, default=200)
+    parser.add_argument('--concorrencia', type=int, default=ai_worker.CONCORRENCIA_PADRAO)
+    parser.add_argument('--tamanho-lote', type=int, default=ai_worker.TAMANHO_LOTE)
+    parser.add_argument('--latencia-media', type=float, default=2.0, help="Latência média de cada chamada ao LLM falso (s).")
+    parser.add_argument('--latencia-desvio', type=float, default=0.8)
+    parser.add_argument('--taxa-erro', type=float, default=0.01)
+    parser.add_argument('--taxa-429', type=float, default=0.05)
+    parser.add_argument('--taxa-json-malformado', type=float, default=0.03)
+    parser.add_argument('--backoff-base', type=float, default=2.0,
+                        help="Espera base (s) antes de retentar uma tarefa reagendada (em produção: LICITAI_BACKOFF_BASE).")
+    parser.add_argument('--taxa-duplicados', type=float, default=0.3, help="Fração de tarefas que repetem um objeto já visto.")
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        logger.error("FIRESTORE_EMULATOR_HOST não definido. O benchmark apaga coleções e só roda contra o emulador do Firestore.")
+        sys.exit(1)
+
+    asyncio.run(executar(args))
+
+if __name__ == "__main__":
+    main()
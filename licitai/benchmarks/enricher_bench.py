@@ -0,0 +1,152 @@
+# licitai/benchmarks/enricher_bench.py
+"""
+Benchmark do enriquecimento sem buscas reais no Google.
+Popula o emulador do Firestore com tarefas sintéticas já reivindicadas (com snapshot da
+contratação), executa `enrich_task` com a concorrência pedida, o backend de busca falso,
+o agrupador de escritas e o diretório de órgãos do worker, e reporta vazão (tarefas/s e
+contatos/s), latências p50/p95 e a origem dos contatos. As páginas dos resultados não são
+baixadas (os resultados falsos não existem na rede): só os snippets são examinados.
+
+Uso (requer o emulador: `gcloud emulators firestore start --host-port=localhost:8080`):
+  FIRESTORE_EMULATOR_HOST=localhost:8080 python -m licitai.benchmarks.enricher_bench --tarefas 500
+"""
+import os
+import sys
+
+# O backend falso precisa ser escolhido antes da primeira busca.
+os.environ.setdefault("LICITAI_BUSCA_BACKEND", "falso")
+
+import argparse
+import asyncio
+import datetime
+import logging
+import random
+import time
+from collections import Counter
+
+from google.cloud import firestore
+
+from google_search import limitador_buscas
+from licitai.benchmarks._comum import limpar_colecoes, percentil
+from licitai.processing import lead_enricher
+from licitai.processing.contratacao_snapshot import CAMPO_SNAPSHOT, montar_snapshot
+from licitai.processing.orgao_directory import ORGAOS_COLLECTION_NAME, DiretorioOrgaos
+from licitai.processing.search_backends import BackendBuscaFalso, definir_backend_busca
+from licitai.processing.write_coalescer import AgrupadorEscritas
+
+logger = logging.getLogger(__name__)
+
+MUNICIPIOS = [("Anápolis", "GO"), ("Itu", "SP"), ("Campinas", "SP"), ("Londrina", "PR"), ("Caruaru", "PE"),
+              ("Juiz de Fora", "MG"), ("Joinville", "SC"), ("Sobral", "CE"), ("Marabá", "PA"), ("Petrolina", "PE")]
+TIPOS_ORGAO = ["Prefeitura Municipal de {m}", "Câmara Municipal de {m}", "Secretaria Municipal de Saúde de {m}",
+               "Serviço Autônomo de Água e Esgoto de {m}"]
+
+def popular_tarefas(db, total: int, total_orgaos: int, semente: int):
+    """Cria `total` tarefas 'enriquecendo' distribuídas entre `total_orgaos` órgãos distintos."""
+    rnd = random.Random(semente)
+    orgaos = []
+    for i in range(total_orgaos):
+        municipio, uf = MUNICIPIOS[i % len(MUNICIPIOS)]
+        nome = TIPOS_ORGAO[(i // len(MUNICIPIOS)) % len(TIPOS_ORGAO)].format(m=municipio)
+        if i >= len(MUNICIPIOS) * len(TIPOS_ORGAO):
+            nome += f" {i}"
+        orgaos.append({"orgaoRazaoSocial": nome, "orgaoCnpj": f"{10000000 + i:08d}000190", "municipioNome": municipio, "ufSigla": uf})
+
+    agora = datetime.datetime.now(datetime.timezone.utc)
+    batch = db.batch()
+    operacoes = 0
+    for i in range(total):
+        pncp = f"BENCH-ENR-{i:06d}"
+        contratacao = {"numeroControlePNCP": pncp, "objetoCompra": f"Aquisição de licenças de software (processo {i})",
+                       **rnd.choice(orgaos)}
+        batch.set(db.collection(lead_enricher.TAREFAS_COLLECTION_NAME).document(f"bench-enr-{i:06d}"), {
+            "contratacaoId": pncp, "numeroControlePNCP": pncp, "clienteId": "benchmark",
+            "status": lead_enricher.STATUS_ENRICHING, "data_criacao": agora,
+            CAMPO_SNAPSHOT: montar_snapshot(contratacao)
+        })
+        operacoes += 1
+        if operacoes >= 400:
+            batch.commit()
+            batch = db.batch()
+            operacoes = 0
+    if operacoes:
+        batch.commit()
+
+def relatorio(db, duracao: float, latencias: list, backend: BackendBuscaFalso, diretorio, escritas):
+    tarefas = [doc.to_dict() for doc in db.collection(lead_enricher.TAREFAS_COLLECTION_NAME).stream()]
+    status = Counter(t.get('status') for t in tarefas)
+    origens = Counter(t.get('origemContatos') for t in tarefas if t.get('origemContatos'))
+    emails = sum(len(t.get('contatosEncontrados') or []) for t in tarefas)
+    telefones = sum(len(t.get('telefonesEncontrados') or []) for t in tarefas)
+    com_contato = sum(1 for t in tarefas if t.get('contatosEncontrados') or t.get('telefonesEncontrados'))
+
+    print("\n===========================================")
+    print("   BENCHMARK DO ENRIQUECIMENTO (BUSCA FALSA)")
+    print("===========================================")
+    print(f"Tarefas: {len(tarefas)} em {duracao:.1f}s -> {len(tarefas) / duracao:.2f} tarefas/s")
+    print(f"Contatos: {emails} e-mail(s) e {telefones} telefone(s) -> {(emails + telefones) / duracao:.2f} contatos/s")
+    print(f"Tarefas com algum contato: {com_contato} ({com_contato / max(1, len(tarefas)):.0%})")
+    print(f"Latência por tarefa: p50 {percentil(latencias, 0.5):.2f}s | p95 {percentil(latencias, 0.95):.2f}s")
+    print(f"Status finais: {dict(status)}")
+    print(f"Origem dos contatos: {dict(origens)}")
+    print(f"Backend falso: {backend.metricas()}")
+    print(f"Limitador: {limitador_buscas.metricas()}")
+    if diretorio is not None:
+        print(f"Diretório de órgãos: {diretorio.metricas()}")
+    print(f"Escritas: {escritas.metricas()}")
+    print("===========================================")
+
+async def executar(args):
+    # Cliente síncrono para preparar e ler o emulador; o enriquecedor usa o seu AsyncClient.
+    db = firestore.Client(project=lead_enricher.PROJECT_ID)
+    db_async = lead_enricher.get_firestore_client()
+    logger.info("Limpando coleções do emulador e criando as tarefas sintéticas...")
+    limpar_colecoes(db, [lead_enricher.TAREFAS_COLLECTION_NAME, ORGAOS_COLLECTION_NAME])
+    popular_tarefas(db, args.tarefas, args.orgaos, args.semente)
+
+    backend = BackendBuscaFalso(latencia_media=args.latencia_media, latencia_desvio=args.latencia_desvio,
+                                taxa_bloqueio=args.taxa_bloqueio, taxa_contatos=args.taxa_contatos, semente=args.semente)
+    definir_backend_busca(backend)
+    limitador_buscas.definir_taxa(args.buscas_por_minuto)
+
+    escritas = AgrupadorEscritas(db_async)
+    diretorio = None if args.sem_diretorio else DiretorioOrgaos(db_async)
+    docs = [doc async for doc in db_async.collection(lead_enricher.TAREFAS_COLLECTION_NAME).stream()]
+    semaforo = asyncio.Semaphore(args.concorrencia)
+    latencias = []
+
+    async def enriquecer(doc):
+        async with semaforo:
+            inicio_tarefa = time.monotonic()
+            await lead_enricher.enrich_task(db_async, doc, escritas, diretorio)
+            latencias.append(time.monotonic() - inicio_tarefa)
+
+    inicio = time.monotonic()
+    await asyncio.gather(*(enriquecer(doc) for doc in docs))
+    await escritas.descarregar()
+    fim = time.monotonic()
+    relatorio(db, fim - inicio, latencias, backend, diretorio, escritas)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do enriquecimento com busca falsa e emulador do Firestore.")
+    parser.add_argument('--tarefas', type=int, default=200)
+    parser.add_argument('--orgaos', type=int, default=40, help="Órgãos distintos entre as tarefas (repetições exercitam o diretório).")
+    parser.add_argument('--concorrencia', type=int, default=lead_enricher.CONCORRENCIA_PADRAO)
+    parser.add_argument('--latencia-media', type=float, default=0.8, help="Latência média de cada busca falsa (s).")
+    parser.add_argument('--latencia-desvio', type=float, default=0.3)
+    parser.add_argument('--taxa-bloqueio', type=float, default=0.0, help="Fração de buscas que recebem um 429 simulado.")
+    parser.add_argument('--taxa-contatos', type=float, default=0.5, help="Fração de resultados com contatos no snippet.")
+    parser.add_argument('--buscas-por-minuto', type=float, default=6000,
+                        help="Taxa do limitador durante o benchmark (em produção: LICITAI_BUSCAS_POR_MINUTO).")
+    parser.add_argument('--sem-diretorio', action='store_true', help="Não usa o diretório de órgãos (uma busca por tarefa).")
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        logger.error("FIRESTORE_EMULATOR_HOST não definido. O benchmark apaga coleções e só roda contra o emulador do Firestore.")
+        sys.exit(1)
+
+    asyncio.run(executar(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# licitai/data_collection/cnpj_index.py
+"""
+Índice local dos contatos de órgãos públicos a partir dos dados abertos do CNPJ (Receita Federal).
+O importador lê os arquivos de Empresas (para saber quais CNPJs básicos têm natureza
+jurídica de administração pública, 1xxx) e de Estabelecimentos (e-mail, telefones, UF)
+e grava dois arquivos:
+  - `cnpj.chaves`: entradas de tamanho fixo (CNPJ de 14 dígitos, offset e tamanho),
+    ordenadas pelo CNPJ;
+  - `cnpj.registros`: os registros empacotados (campos UTF-8 separados por \\x1f).
+A consulta abre os dois com mmap e faz busca binária nas chaves: não há leitura do
+arquivo inteiro nem chamadas externas.
+
+Uso: python -m licitai.data_collection.cnpj_index --origem <pasta com os .zip/.csv> [--destino <pasta>]
+"""
+import argparse
+import csv
+import io
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from licitai.processing.contact_extractor import normalizar_email, normalizar_telefone
+
+logger = logging.getLogger(__name__)
+
+# --- Constantes ---
+DIRETORIO_INDICE_PADRAO = os.getenv("LICITAI_INDICE_CNPJ", os.path.join("dados", "cnpj"))
+ARQUIVO_CHAVES = 'cnpj.chaves'
+ARQUIVO_REGISTROS = 'cnpj.registros'
+ENTRADA = struct.Struct('<14sQI') # CNPJ, offset e tamanho do registro.
+SEPARADOR = '\x1f'
+CAMPOS_REGISTRO = ('cnpj', 'razaoSocial', 'nomeFantasia', 'naturezaJuridica', 'uf', 'email', 'telefones')
+PREFIXO_ADMINISTRACAO_PUBLICA = '1' # Naturezas jurídicas 1xxx: administração pública.
+SITUACAO_ATIVA = '02'
+
+# Posições das colunas nos arquivos da Receita (CSV com ';', em latin-1, sem cabeçalho).
+EMPRESA_CNPJ_BASICO, EMPRESA_RAZAO_SOCIAL, EMPRESA_NATUREZA = 0, 1, 2
+(ESTAB_CNPJ_BASICO, ESTAB_CNPJ_ORDEM, ESTAB_CNPJ_DV, ESTAB_NOME_FANTASIA, ESTAB_SITUACAO,
+ ESTAB_UF, ESTAB_DDD1, ESTAB_TELEFONE1, ESTAB_DDD2, ESTAB_TELEFONE2, ESTAB_EMAIL) = 0, 1, 2, 4, 5, 19, 21, 22, 23, 24, 27
+
+def _linhas_csv(caminho: Path):
+    """Linhas de um arquivo da Receita, lido diretamente do .zip quando for o caso."""
+    if caminho.suffix.lower() == '.zip':
+        with zipfile.ZipFile(caminho) as arquivo_zip:
+            for nome in arquivo_zip.namelist():
+                with arquivo_zip.open(nome) as bruto:
+                    yield from csv.reader(io.TextIOWrapper(bruto, encoding='latin-1', newline=''), delimiter=';')
+    else:
+        with open(caminho, encoding='latin-1', newline='') as arquivo:
+            yield from csv.reader(arquivo, delimiter=';')
+
+def _arquivos(origem: Path, marcador: str) -> list:
+    """Arquivos da origem cujo nome contém o marcador (ex: 'EMPRE' em 'Empresas0.zip' ou 'K3241.EMPRECSV')."""
+    return sorted(p for p in origem.iterdir() if p.is_file() and marcador in p.name.upper())
+
+def importar(origem: str, destino: str = DIRETORIO_INDICE_PADRAO) -> int:
+    """Constrói o índice a partir dos arquivos de Empresas e Estabelecimentos em `origem`. Retorna o número de registros."""
+    origem, destino = Path(origem), Path(destino)
+    arquivos_empresas = _arquivos(origem, 'EMPRE')
+    arquivos_estabelecimentos = _arquivos(origem, 'ESTABELE')
+    if not arquivos_empresas or not arquivos_estabelecimentos:
+        raise FileNotFoundError(f"Arquivos de Empresas e Estabelecimentos não encontrados em '{origem}'.")
+
+    # 1. CNPJs básicos da administração pública, com razão social e natureza jurídica
+    empresas = {}
+    for caminho in arquivos_empresas:
+        logger.info(f"Lendo empresas de '{caminho.name}'...")
+        for linha in _linhas_csv(caminho):
+            if len(linha) > EMPRESA_NATUREZA and linha[EMPRESA_NATUREZA].startswith(PREFIXO_ADMINISTRACAO_PUBLICA):
+                empresas[linha[EMPRESA_CNPJ_BASICO]] = (linha[EMPRESA_RAZAO_SOCIAL].strip(), linha[EMPRESA_NATUREZA])
+    logger.info(f"{len(empresas)} entidade(s) da administração pública encontrada(s).")
+
+    # 2. Estabelecimentos ativos dessas entidades, com os contatos normalizados
+    registros = []
+    for caminho in arquivos_estabelecimentos:
+        logger.info(f"Lendo estabelecimentos de '{caminho.name}'...")
+        for linha in _linhas_csv(caminho):
+            if len(linha) <= ESTAB_EMAIL or linha[ESTAB_CNPJ_BASICO] not in empresas or linha[ESTAB_SITUACAO] != SITUACAO_ATIVA:
+                continue
+            email = normalizar_email(linha[ESTAB_EMAIL])
+            telefones = [normalizar_telefone(linha[ddd] + linha[numero])
+                         for ddd, numero in ((ESTAB_DDD1, ESTAB_TELEFONE1), (ESTAB_DDD2, ESTAB_TELEFONE2))]
+            telefones = list(dict.fromkeys(t for t in telefones if t))
+            if not email and not telefones:
+                continue # Sem contato, o estabelecimento não serve à consulta.
+            razao_social, natureza = empresas[linha[ESTAB_CNPJ_BASICO]]
+            registros.append((
+                linha[ESTAB_CNPJ_BASICO] + linha[ESTAB_CNPJ_ORDEM] + linha[ESTAB_CNPJ_DV],
+                razao_social, linha[ESTAB_NOME_FANTASIA].strip(), natureza, linha[ESTAB_UF],
+                email or '', ','.join(telefones)
+            ))
+
+    # 3. Gravação: registros empacotados e chaves ordenadas com os offsets
+    registros.sort()
+    destino.mkdir(parents=True, exist_ok=True)
+    with open(destino / (ARQUIVO_REGISTROS + '.tmp'), 'wb') as arq_registros, \
+            open(destino / (ARQUIVO_CHAVES + '.tmp'), 'wb') as arq_chaves:
+        offset = 0
+        for registro in registros:
+            dados = SEPARADOR.join(registro).encode('utf-8')
+            arq_registros.write(dados)
+            arq_chaves.write(ENTRADA.pack(registro[0].encode('ascii'), offset, len(dados)))
+            offset += len(dados)
+    for nome in (ARQUIVO_REGISTROS, ARQUIVO_CHAVES):
+        os.replace(destino / (nome + '.tmp'), destino / nome)
+    logger.info(f"Índice gravado em '{destino}' com {len(registros)} estabelecimento(s).")
+    return len(registros)
+
+class IndiceCNPJ:
+    """Consulta ao índice gerado por `importar`, por busca binária sobre os arquivos mapeados em memória."""
+
+    def __init__(self, diretorio: str = DIRETORIO_INDICE_PADRAO):
+        diretorio = Path(diretorio)
+        self._arquivos = [open(diretorio / ARQUIVO_CHAVES, 'rb'), open(diretorio / ARQUIVO_REGISTROS, 'rb')]
+        self._chaves, self._registros = (mmap.mmap(a.fileno(), 0, access=mmap.ACCESS_READ) for a in self._arquivos)
+        self._total = len(self._chaves) // ENTRADA.size
+
+    @classmethod
+    def abrir_se_existir(cls, diretorio: str = DIRETORIO_INDICE_PADRAO):
+        """Abre o índice ou retorna None se ele ainda não tiver sido importado."""
+        caminho = Path(diretorio)
+        if not (caminho / ARQUIVO_CHAVES).exists() or not (caminho / ARQUIVO_REGISTROS).exists():
+            return None
+        if (caminho / ARQUIVO_CHAVES).stat().st_size == 0:
+            return None # Importação sem nenhum órgão: não há o que mapear.
+        return cls(diretorio)
+
+    def __len__(self):
+        return self._total
+
+    def fechar(self):
+        for mapa in (self._chaves, self._registros):
+            mapa.close()
+        for arquivo in self._arquivos:
+            arquivo.close()
+
+    def buscar(self, cnpj) -> dict | None:
+        """Registro do estabelecimento com o CNPJ informado (com ou sem pontuação), ou None."""
+        digitos = re.sub(r'\D', '', str(cnpj or ''))
+        if len(digitos) != 14:
+            return None
+        chave = digitos.encode('ascii')
+        inicio, fim = 0, self._total
+        while inicio < fim:
+            meio = (inicio + fim) // 2
+            posicao = meio * ENTRADA.size
+            atual = self._chaves[posicao:posicao + 14]
+            if atual < chave:
+                inicio = meio + 1
+            elif atual > chave:
+                fim = meio
+            else:
+                _, offset, tamanho = ENTRADA.unpack_from(self._chaves, posicao)
+                campos = self._registros[offset:offset + tamanho].decode('utf-8').split(SEPARADOR)
+                registro = dict(zip(CAMPOS_REGISTRO, campos))
+                registro['telefones'] = [t for t in registro['telefones'].split(',') if t]
+                return registro
+        return None
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Importa os dados abertos do CNPJ (Receita Federal) para o índice local de órgãos públicos.")
+    parser.add_argument('--origem', required=True, help="Pasta com os arquivos de Empresas e Estabelecimentos (.zip ou extraídos).")
+    parser.add_argument('--destino', default=DIRETORIO_INDICE_PADRAO, help=f"Pasta do índice (padrão: {DIRETORIO_INDICE_PADRAO}).")
+    args = parser.parse_args()
+    importar(args.origem, args.destino)
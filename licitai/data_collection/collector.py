@@ -87,9 +87,11 @@ def run_collector(data_inicial_sync: str, data_final_sync: str, uf_list: List[st
                         "objetoCompra": resumo.get('objetoCompra'),
                         "modalidadeNome": resumo.get('modalidadeNome'),
                         "orgaoRazaoSocial": resumo.get('orgaoEntidade', {}).get('razaoSocial'),
+                        "orgaoCnpj": resumo.get('orgaoEntidade', {}).get('cnpj'),
                         "ufSigla": resumo.get('unidadeOrgao', {}).get('ufSigla'),
                         "municipioNome": resumo.get('unidadeOrgao', {}).get('municipioNome'),
                         "dataPublicacaoPncp": resumo.get('dataPublicacaoPncp', '').split('T')[0],
+                        "dataEncerramentoProposta": resumo.get('dataEncerramentoProposta'),
                         "linkEditalDocumentos": resumo.get('linkAvisoPublicacaoPncp') or resumo.get('linkSistemaOrigem'),
                         "dataSincronizacao": datetime.datetime.now(datetime.timezone.utc)
                     }
@@ -19,6 +19,13 @@ os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = os.path.join(os.getcwd(), "fireba
 from typing import List
 from google.cloud import firestore
 
+from licitai.processing.ai_metrics import relatorio_uso_ia
+from licitai.processing.regex_extractor import FAIXAS_LATENCIA
+from licitai.processing.analysis_cache import VERSAO_ANALISE, invalidar_cache_obsoleto
+from licitai.processing.contratacao_snapshot import CAMPO_SNAPSHOT, VERSAO_SNAPSHOT, atualizar_snapshots, montar_snapshot
+from licitai.processing.task_priority import calcular_prioridade
+from licitai.processing.task_retries import reenfileirar_por_status
+
 
 
 
@@ -89,10 +96,15 @@ PESQUISA_INICIAL = {
     ]
 }
 
+# Status finais de falha que `reenfileirar` devolve a cada etapa: a falha atual da análise
+# ('falha_api') e os status de erro de versões anteriores do worker voltam para 'pendente';
+# as falhas do enriquecimento voltam para 'analise_concluida'.
 STATUS_PARA_REPROCESSAR = [
-    'indefinido', 'analise_parcial_erro_validacao', 'erro_extracao_ia', 'erro_geral_adapter',
-    'falha_worker', 'erro_raspagem', 'analise_concluida', 'erro_formato_ia'
+    'falha_api', 'indefinido', 'analise_parcial_erro_validacao', 'erro_extracao_ia', 'erro_geral_adapter',
+    'falha_worker', 'erro_raspagem', 'erro_formato_ia'
 ]
+STATUS_PARA_REENRIQUECER = ['falha_enriquecimento']
+DESTINO_REENFILEIRAMENTO = {'analise': 'pendente', 'enriquecimento': 'analise_concluida'}
 
 STOP_WORDS = {'processo', 'contratação', 'edital', 'serviços', 'aquisição', 'fornecimento', 'preços', 'registro', 'futura', 'eventual', 'objetivo', 'municipal', 'prefeitura', 'secretaria', 'conforme', 'município', 'nº', 'n.º', 'para', 'de', 'do', 'da', 'dos', 'das', 'com', 'sem', 'sob', 'por', 'pelo', 'pela'}
 
@@ -230,7 +242,9 @@ def gerar_tarefas(db):
                         "clienteId": cliente_id,
                         "pesquisaId": pesquisa_id,
                         "status": "pendente",
-                        "data_criacao": datetime.datetime.now(datetime.timezone.utc)
+                        "data_criacao": datetime.datetime.now(datetime.timezone.utc),
+                        "prioridade": calcular_prioridade(contratacao_data),
+                        CAMPO_SNAPSHOT: montar_snapshot(contratacao_data)
                     }
                     nova_tarefa_ref = tarefas_ref.document()
                     batch.set(nova_tarefa_ref, dados_tarefa)
@@ -269,6 +283,52 @@ def verificar_fila(db):
         logger.error(f"Detalhes do erro: {e}")
         logger.error("Verifique o console do Google Cloud por avisos de 'Índice Necessário' para a coleção 'tarefasRaspagem'.")
 
+# --- Limpar Cache da IA ---
+def limpar_cache_ia(db):
+    logger.info(f"Removendo entradas do cache de análises anteriores à versão '{VERSAO_ANALISE}'...")
+    removidos = invalidar_cache_obsoleto(db)
+    logger.info(f"Limpeza do cache concluída. {removidos} entrada(s) obsoleta(s) removida(s).")
+
+# --- Atualizar Snapshots das Contratações ---
+def atualizar_snapshots_tarefas(db, forcar=False):
+    logger.info(f"Atualizando snapshots de contratação das tarefas (versão {VERSAO_SNAPSHOT})...")
+    atualizadas = atualizar_snapshots(db, TAREFAS_COLLECTION_NAME, forcar=forcar)
+    logger.info(f"Atualização concluída. {atualizadas} tarefa(s) com snapshot regravado.")
+
+# --- Reenfileirar Tarefas com Falha ---
+def reenfileirar(db, etapa='analise', status=None, manter_tentativas=False):
+    status_origem = status or (STATUS_PARA_REPROCESSAR if etapa == 'analise' else STATUS_PARA_REENRIQUECER)
+    destino = DESTINO_REENFILEIRAMENTO[etapa]
+    logger.info(f"Reenfileirando tarefas com status {status_origem} para '{destino}'...")
+    movidas = reenfileirar_por_status(db, TAREFAS_COLLECTION_NAME, status_origem, destino,
+                                      zerar_tentativas=not manter_tentativas)
+    logger.info(f"Reenfileiramento concluído. {movidas} tarefa(s) devolvida(s) para '{destino}'.")
+
+# --- Relatório de Uso da IA ---
+def _formatar_latencia(segundos):
+    if segundos is None:
+        return '-'
+    return f"<={segundos:.1f}s" if segundos != float('inf') else f">{FAIXAS_LATENCIA[-1]}s"
+
+def relatorio_ia(db, dias=7):
+    relatorio = relatorio_uso_ia(db, dias)
+    if not relatorio:
+        logger.info("Nenhuma métrica de uso da IA registrada ainda (coleção 'metricasIA' vazia).")
+        return
+    logger.info(f"--- Uso da IA nos últimos {len(relatorio)} dia(s) (custo estimado em US$) ---")
+    for dia in relatorio:
+        tokens_por_tarefa = f"{dia['tokensPorTarefa']:.0f}" if dia['tokensPorTarefa'] is not None else '-'
+        logger.info(f"{dia['data']}: {dia['tarefasIA']} tarefa(s) pela IA, {dia['tarefasCache']} pelo cache, "
+                    f"{dia['tarefasSimilaridade']} por similaridade | "
+                    f"tokens/tarefa: {tokens_por_tarefa} | custo: ${dia['custo']:.4f}")
+        for m in dia['modelos']:
+            latencia_media = f"{m['latenciaMediaSeg']:.2f}s" if m['latenciaMediaSeg'] is not None else '-'
+            logger.info(f"    {m['modelo']}: {m['chamadas']} chamada(s), {m['itens']} item(ns), "
+                        f"tokens {m['tokensPrompt']} entrada / {m['tokensResposta']} saída, "
+                        f"{m['retentativas']} retentativa(s), custo ${m['custo']:.4f} | latência média {latencia_media}, "
+                        f"p50 {_formatar_latencia(m['latenciaP50Seg'])}, p95 {_formatar_latencia(m['latenciaP95Seg'])}")
+    logger.info(f"Total do período: ${sum(dia['custo'] for dia in relatorio):.4f}")
+
 # --- Main ---
 def main():
     parser = argparse.ArgumentParser(description="Administração Unificada LicitAI")
@@ -278,6 +338,16 @@ def main():
     subparsers.add_parser('diagnostico', help='Executa diagnóstico do sistema.')
     subparsers.add_parser('gerar-tarefas', help='Gera tarefas de raspagem a partir das contratações e pesquisas.')
     subparsers.add_parser('verificar-fila', help='Verifica o número de tarefas pendentes.')
+    subparsers.add_parser('limpar-cache-ia', help='Remove entradas do cache de análises geradas por prompts/modelos antigos.')
+    parser_snapshots = subparsers.add_parser('atualizar-snapshots', help='Grava nas tarefas o snapshot atual dos dados da contratação e recalcula a prioridade.')
+    parser_snapshots.add_argument('--forcar', action='store_true', help='Regrava também os snapshots já atualizados (ex: após correções na contratação).')
+    parser_reenfileirar = subparsers.add_parser('reenfileirar', help='Devolve à fila as tarefas com status de falha.')
+    parser_reenfileirar.add_argument('--etapa', choices=list(DESTINO_REENFILEIRAMENTO), default='analise',
+                                     help="'analise' devolve para 'pendente'; 'enriquecimento' devolve para 'analise_concluida'.")
+    parser_reenfileirar.add_argument('--status', nargs='+', help='Status a reenfileirar (padrão: os status de falha da etapa).')
+    parser_reenfileirar.add_argument('--manter-tentativas', action='store_true', help='Não zera o contador de tentativas.')
+    parser_relatorio_ia = subparsers.add_parser('relatorio-ia', help='Mostra tokens por tarefa, custo por dia e percentis de latência por modelo.')
+    parser_relatorio_ia.add_argument('--dias', type=int, default=7, help='Número de dias (mais recentes) no relatório (padrão: 7).')
     args = parser.parse_args()
     db = get_firestore_client()
     if args.command == 'limpar-fila':
@@ -290,6 +360,14 @@ def main():
         gerar_tarefas(db)
     elif args.command == 'verificar-fila':
         verificar_fila(db)
+    elif args.command == 'limpar-cache-ia':
+        limpar_cache_ia(db)
+    elif args.command == 'atualizar-snapshots':
+        atualizar_snapshots_tarefas(db, forcar=args.forcar)
+    elif args.command == 'reenfileirar':
+        reenfileirar(db, etapa=args.etapa, status=args.status, manter_tentativas=args.manter_tentativas)
+    elif args.command == 'relatorio-ia':
+        relatorio_ia(db, dias=args.dias)
 
 if __name__ == "__main__":
     main()
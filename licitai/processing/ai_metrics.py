@@ -0,0 +1,144 @@
+# licitai/processing/ai_metrics.py
+"""
+Consolidação periódica do consumo da IA em 'metricasIA'.
+Os workers acumulam em memória (MetricasCascata) os tokens, a latência e as retentativas
+de cada chamada e, a cada INTERVALO_ROLLUP segundos, somam esses totais com incrementos
+atômicos no documento do dia (UTC). Cada documento diário guarda as tarefas concluídas
+por origem e, por modelo, chamadas, itens, tokens, retentativas e um histograma de
+latência, do qual o relatório do admin estima os percentis e o custo.
+"""
+import asyncio
+import datetime
+import logging
+import os
+from google.cloud import firestore
+
+from licitai.processing.regex_extractor import FAIXAS_LATENCIA
+
+logger = logging.getLogger(__name__)
+
+# --- Constantes ---
+METRICAS_COLLECTION_NAME = 'metricasIA'
+INTERVALO_ROLLUP = float(os.getenv("LICITAI_INTERVALO_METRICAS_IA", "60"))
+# Preço em US$ por milhão de tokens (entrada, saída), pelo prefixo do nome do modelo.
+# Ajuste conforme a tabela vigente do Gemini; o relatório é uma estimativa.
+PRECOS_POR_MILHAO_TOKENS = {
+    'gemini-1.5-flash': (0.075, 0.30),
+    'gemini-1.5-pro': (1.25, 5.00),
+}
+
+def _chave_modelo(modelo: str) -> str:
+    """
+    Nome do modelo como chave de mapa do Firestore (sem pontos, que separam caminhos).
+    A conversão não é reversível; o nome original é gravado no campo 'nome' da entrada.
+    """
+    return modelo.replace('.', '_')
+
+def preco_modelo(modelo: str) -> tuple:
+    """(preço de entrada, preço de saída) por milhão de tokens; (0, 0) para modelos sem preço conhecido."""
+    for prefixo, precos in PRECOS_POR_MILHAO_TOKENS.items():
+        if modelo.startswith(prefixo):
+            return precos
+    return (0.0, 0.0)
+
+def custo_estimado(modelo: str, tokens_prompt: int, tokens_resposta: int) -> float:
+    preco_entrada, preco_saida = preco_modelo(modelo)
+    return (tokens_prompt * preco_entrada + tokens_resposta * preco_saida) / 1_000_000
+
+def percentil_histograma(histograma: dict, p: float) -> float | None:
+    """
+    Percentil `p` (0 a 1) da latência, em segundos, a partir do histograma por faixas:
+    o limite superior da faixa em que o percentil cai (None se o histograma estiver vazio).
+    """
+    total = sum(histograma.values())
+    if not total:
+        return None
+    acumulado = 0
+    for limite in FAIXAS_LATENCIA:
+        acumulado += histograma.get(str(int(limite * 1000)), 0)
+        if acumulado >= p * total:
+            return float(limite)
+    return float('inf')
+
+class PublicadorMetricasIA:
+    """Publica periodicamente em 'metricasIA' os totais acumulados por `metricas_cascata`. `db` é um `firestore.AsyncClient`."""
+
+    def __init__(self, db, metricas_cascata, intervalo: float = INTERVALO_ROLLUP):
+        self._collection = db.collection(METRICAS_COLLECTION_NAME)
+        self._metricas = metricas_cascata
+        self._intervalo = intervalo
+
+    async def publicar(self):
+        """Soma ao documento do dia os totais acumulados desde a última publicação."""
+        modelos, tarefas = self._metricas.retirar_pendentes()
+        if not modelos and not tarefas:
+            return
+        agora = datetime.datetime.now(datetime.timezone.utc)
+        # Com merge=True um mapa vazio substituiria o existente, então só entram os mapas preenchidos.
+        dados = {'data': agora.strftime('%Y-%m-%d'), 'atualizadoEm': agora}
+        if tarefas:
+            dados['tarefas'] = {origem: firestore.Increment(qtd) for origem, qtd in tarefas.items()}
+        if modelos:
+            dados['modelos'] = {
+                _chave_modelo(modelo): {
+                    'nome': modelo,
+                    **{campo: firestore.Increment(valor) for campo, valor in totais.items() if campo != 'histogramaLatencia'},
+                    'histogramaLatencia': {faixa: firestore.Increment(qtd) for faixa, qtd in totais['histogramaLatencia'].items()}
+                }
+                for modelo, totais in modelos.items()
+            }
+        try:
+            await self._collection.document(dados['data']).set(dados, merge=True)
+        except Exception as e:
+            logger.warning(f"Falha ao publicar as métricas da IA (os totais deste intervalo foram descartados): {e}")
+
+    async def executar_periodicamente(self):
+        """Publica a cada intervalo até ser cancelada; ao encerrar, publica o que restou."""
+        try:
+            while True:
+                await asyncio.sleep(self._intervalo)
+                await self.publicar()
+        finally:
+            await self.publicar()
+
+def relatorio_uso_ia(db, dias: int = 7) -> list:
+    """
+    Resumo dos últimos `dias` documentos de 'metricasIA' (cliente síncrono), do mais recente
+    ao mais antigo: por dia, tarefas por origem, tokens por tarefa analisada pela IA e custo
+    estimado; por modelo, chamadas, tokens, retentativas, custo e latência média/p50/p95.
+    """
+    query = db.collection(METRICAS_COLLECTION_NAME).order_by('data', direction=firestore.Query.DESCENDING).limit(dias)
+    relatorio = []
+    for doc in query.stream():
+        dados = doc.to_dict()
+        tarefas = dados.get('tarefas', {})
+        modelos = []
+        for chave, totais in sorted(dados.get('modelos', {}).items()):
+            chamadas = totais.get('chamadas', 0)
+            histograma = totais.get('histogramaLatencia', {})
+            # Documentos anteriores ao campo 'nome' só têm a chave; o melhor palpite é desfazer a troca dos pontos.
+            modelo = totais.get('nome') or chave.replace('_', '.')
+            modelos.append({
+                'modelo': modelo,
+                'chamadas': chamadas,
+                'itens': totais.get('itens', 0),
+                'tokensPrompt': totais.get('tokensPrompt', 0),
+                'tokensResposta': totais.get('tokensResposta', 0),
+                'retentativas': totais.get('retentativas', 0),
+                'custo': custo_estimado(modelo, totais.get('tokensPrompt', 0), totais.get('tokensResposta', 0)),
+                'latenciaMediaSeg': totais.get('latenciaSomaSeg', 0.0) / chamadas if chamadas else None,
+                'latenciaP50Seg': percentil_histograma(histograma, 0.50),
+                'latenciaP95Seg': percentil_histograma(histograma, 0.95)
+            })
+        tarefas_ia = tarefas.get('ia', 0)
+        tokens = sum(m['tokensPrompt'] + m['tokensResposta'] for m in modelos)
+        relatorio.append({
+            'data': dados.get('data', doc.id),
+            'tarefasIA': tarefas_ia,
+            'tarefasCache': tarefas.get('cache', 0),
+            'tarefasSimilaridade': tarefas.get('similaridade', 0),
+            'tokensPorTarefa': tokens / tarefas_ia if tarefas_ia else None,
+            'custo': sum(m['custo'] for m in modelos),
+            'modelos': modelos
+        })
+    return relatorio
@@ -1,6 +1,8 @@
 
+import argparse
 import asyncio
 import logging
+import signal
 from google.cloud import firestore
 import os
 import datetime
@@ -13,7 +15,18 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 # 2. Importa o módulo de análise após a configuração do path.
-from licitai.processing.regex_extractor import analisar_objeto_com_ia
+from licitai.processing.regex_extractor import analisar_objeto_com_ia, analisar_objetos_em_lote, limitador, metricas_cascata
+from licitai.processing.analysis_cache import CacheAnalises
+from licitai.processing.worker_pool import WorkerPool
+from licitai.processing.task_listener import OuvinteTarefas
+from licitai.processing.task_leases import GerenciadorLeases, campos_liberacao
+from licitai.processing.rate_limiter import ErroQuotaIA
+from licitai.processing.write_coalescer import AgrupadorEscritas, gravar_atualizacao
+from licitai.processing.contratacao_snapshot import carregar_contratacao_async
+from licitai.processing.task_priority import EscalonadorJusto
+from licitai.processing.task_retries import STATUS_REAGENDADA_ANALISE, campos_falha, campos_sucesso
+from licitai.processing.ai_metrics import PublicadorMetricasIA
+from licitai.processing.similarity_index import IndiceSimilaridade
 
 # 3. Configuração do logging para um output claro e informativo.
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -22,8 +35,9 @@ logger = logging.getLogger(__name__)
 # 4. Carregamento de Segredos a partir de Variáveis de Ambiente (MELHOR PRÁTICA)
 #    O código nunca armazena chaves de API. Ele espera que o ambiente de execução
 #    (seja local, Docker ou um servidor na nuvem) forneça a chave.
+#    Com o backend de LLM falso (LICITAI_LLM_BACKEND=falso, ver llm_backends.py) a chave não é usada.
 API_TOKEN = os.getenv("GEMINI_API_KEY")
-if not API_TOKEN:
+if not API_TOKEN and os.getenv("LICITAI_LLM_BACKEND", "gemini").lower() != 'falso':
     logger.error("CRÍTICO: A variável de ambiente GEMINI_API_KEY não está definida.")
     sys.exit(1) # O script para se a configuração de segurança não estiver presente.
 
@@ -36,21 +50,60 @@ if not API_TOKEN:
 TAREFAS_COLLECTION_NAME = 'tarefasRaspagem'
 CONTRATACOES_COLLECTION_NAME = 'contratacoes'
 PROJECT_ID = "pncp-insights-jewpf" # É seguro manter o ID do projeto no código.
+TAMANHO_LOTE = 5 # Tarefas analisadas numa única requisição em lote à IA.
+CONCORRENCIA_PADRAO = 4 # Consumidores processando lotes simultaneamente.
+STATUS_PENDENTE = 'pendente'
+STATUS_ANALISANDO = 'analisando'
+STATUS_FALHA = 'falha_api' # Fila de "dead letter": tentativas esgotadas ou falha permanente.
 
 def get_firestore_client():
-    """Inicializa e retorna o cliente do Firestore de forma segura."""
+    """
+    Inicializa e retorna o cliente assíncrono do Firestore, compartilhado por todo o worker
+    (leases, cache, escritas e leituras), sem passar pelo pool de threads.
+    """
     try:
-        db = firestore.Client(project=PROJECT_ID)
+        db = firestore.AsyncClient(project=PROJECT_ID)
         logger.info("Cliente do Firestore inicializado com sucesso.")
         return db
     except Exception as e:
         logger.error(f"Falha ao inicializar o cliente do Firestore. Verifique se as credenciais do ambiente (ADC) estão configuradas. Erro: {e}", exc_info=True)
         raise
 
-async def processar_tarefa(db, tarefa_doc):
+async def _registrar_falha(tarefa_ref, task_id, erro, escritas=None, tentativas_anteriores=0, transitoria=True):
+    """
+    Registra a falha da tarefa: reagenda uma nova tentativa com backoff ou, esgotadas as
+    tentativas (ou se a falha for permanente), marca-a como 'falha_api' para revisão.
     """
-    Orquestra o processamento de uma única tarefa: busca dados, chama a IA,
-    e atualiza o status no Firestore, com tratamento de erros robusto.
+    try:
+        dados_erro = {
+            **campos_falha(tentativas_anteriores, f"Erro: {type(erro).__name__} - {erro}",
+                           STATUS_REAGENDADA_ANALISE, STATUS_FALHA, transitoria=transitoria),
+            'fimAnalise': datetime.datetime.now(datetime.timezone.utc),
+            **campos_liberacao()
+        }
+        await gravar_atualizacao(tarefa_ref, dados_erro, escritas)
+        if dados_erro['status'] == STATUS_REAGENDADA_ANALISE:
+            logger.warning(f"Tarefa {task_id} reagendada (tentativa {dados_erro['attempts']}) para {dados_erro['nextAttemptAt']:%H:%M:%S}.")
+    except Exception as update_e:
+        logger.error(f"Falha ao tentar atualizar o status de erro da tarefa {task_id}: {update_e}")
+
+async def _devolver_para_fila(tarefa_ref, task_id, erro, escritas=None):
+    """Devolve a tarefa para 'pendente' (sem marcá-la como falha) quando a IA está sem cota."""
+    logger.warning(f"Tarefa {task_id} devolvida para a fila por limite de cota da IA: {erro}")
+    try:
+        await gravar_atualizacao(tarefa_ref, {
+            'status': STATUS_PENDENTE,
+            'logErro': f"Cota: {erro}",
+            **campos_liberacao()
+        }, escritas)
+    except Exception as update_e:
+        logger.error(f"Falha ao devolver a tarefa {task_id} para a fila: {update_e}")
+
+async def _preparar_tarefa(db, tarefa_doc, escritas=None):
+    """
+    Obtém o objeto da compra de uma tarefa já reivindicada (o lease gravou o status 'analisando'),
+    pelo snapshot da contratação gravado na tarefa ou, em tarefas antigas, lendo a contratação.
+    Retorna (tarefa_ref, objeto_compra) ou None se a tarefa não puder ser analisada.
     """
     task_id = tarefa_doc.id
     tarefa_data = tarefa_doc.to_dict()
@@ -59,89 +112,275 @@ async def processar_tarefa(db, tarefa_doc):
 
     if not pncp_number:
         logger.error(f"Tarefa {task_id} sem 'numeroControlePNCP'. Marcando como falha.")
-        await asyncio.to_thread(tarefa_ref.update, {'status': 'falha_dados_insuficientes', 'fimAnalise': datetime.datetime.now(datetime.timezone.utc)})
-        return
+        await gravar_atualizacao(tarefa_ref, {
+            'status': 'falha_dados_insuficientes',
+            'fimAnalise': datetime.datetime.now(datetime.timezone.utc),
+            **campos_liberacao()
+        }, escritas)
+        return None
 
     try:
         logger.info(f"--- Iniciando Análise | Tarefa: {task_id} | PNCP: {pncp_number} ---")
-        await asyncio.to_thread(tarefa_ref.update, {
-            'status': 'analisando',
-            'inicioAnalise': datetime.datetime.now(datetime.timezone.utc),
-            'workerVersion': '3.0-portfolio'
-        })
 
-        # Etapa 1: Buscar dados da licitação original
-        contratacao_ref = db.collection(CONTRATACOES_COLLECTION_NAME).document(pncp_number)
-        contratacao_doc = await asyncio.to_thread(contratacao_ref.get)
-        if not contratacao_doc.exists:
+        # Dados da licitação original (snapshot na tarefa ou leitura da contratação)
+        contratacao_data = await carregar_contratacao_async(db, tarefa_data)
+        if contratacao_data is None:
             raise FileNotFoundError(f"Documento de contratação {pncp_number} não encontrado.")
-        
-        objeto_compra = contratacao_doc.to_dict().get("objetoCompra")
+
+        objeto_compra = contratacao_data.get("objetoCompra")
         if not objeto_compra:
             raise ValueError(f"Campo 'objetoCompra' vazio para a contratação {pncp_number}.")
 
-        # Etapa 2: Chamar a IA para análise
-        logger.info(f"Enviando objeto para análise da IA: '{objeto_compra[:100]}...'")
-        resultado_analise = await analisar_objeto_com_ia(objeto_compra, API_TOKEN)
+        return tarefa_ref, objeto_compra
 
-        # Etapa 3: Estruturar e salvar o resultado
-        dados_resultado = {
-            'palavrasChave': resultado_analise.get("palavrasChave", []),
-            'gatilhoVenda': resultado_analise.get("gatilhoVenda", "Não informado")
-        }
+    except Exception as e:
+        logger.error(f"ERRO CRÍTICO no processamento da tarefa {task_id}: {e}", exc_info=True)
+        # Contratação ausente ou sem objeto não se resolve com novas tentativas.
+        permanente = isinstance(e, (FileNotFoundError, ValueError))
+        await _registrar_falha(tarefa_ref, task_id, e, escritas, tarefa_data.get('attempts', 0), transitoria=not permanente)
+        return None
 
-        dados_atualizacao = {
-            'status': 'analise_concluida',
-            'fimAnalise': datetime.datetime.now(datetime.timezone.utc),
-            'resultado': dados_resultado
-        }
-        
-        await asyncio.to_thread(tarefa_ref.update, dados_atualizacao)
-        logger.info(f"Tarefa {task_id} concluída com sucesso. Gatilho: {dados_resultado['gatilhoVenda']}")
+async def _salvar_resultado(tarefa_ref, task_id, resultado_analise, origem='ia', escritas=None, similar=None,
+                            tentativas_anteriores=0):
+    """
+    Estrutura e salva o resultado da análise na tarefa, registrando sua origem ('ia', 'cache' ou
+    'similaridade') e, nas análises feitas pela IA, o consumo da chamada (tokens, latência e
+    retentativas) em 'usoIA'. Resultados reaproveitados de um objeto similar recebem `similar`,
+    o par (similaridade, objeto de referência). Como o contador `attempts` é apagado na conclusão,
+    o total de tentativas da análise fica em 'tentativasAnalise'.
+    """
+    dados_resultado = {
+        'palavrasChave': resultado_analise.get("palavrasChave", []),
+        'gatilhoVenda': resultado_analise.get("gatilhoVenda", "Não informado"),
+        'confianca': resultado_analise.get("confianca"),
+        'modeloIA': resultado_analise.get("modelo")
+    }
+
+    dados_atualizacao = {
+        'status': 'analise_concluida',
+        'fimAnalise': datetime.datetime.now(datetime.timezone.utc),
+        'resultado': dados_resultado,
+        'origemAnalise': origem,
+        'tentativasAnalise': tentativas_anteriores + 1,
+        **campos_sucesso(),
+        **campos_liberacao()
+    }
+    if origem == 'ia' and resultado_analise.get("uso"):
+        dados_atualizacao['usoIA'] = {**resultado_analise["uso"], 'modeloIA': resultado_analise.get("modelo")}
+    if similar is not None:
+        similaridade, objeto_referencia = similar
+        dados_atualizacao['similaridade'] = {'valor': round(similaridade, 4), 'objetoReferencia': objeto_referencia}
+
+    await gravar_atualizacao(tarefa_ref, dados_atualizacao, escritas)
+    metricas_cascata.registrar_tarefa(origem)
+    logger.info(f"Tarefa {task_id} concluída com sucesso ({origem}). Gatilho: {dados_resultado['gatilhoVenda']}")
+
+async def processar_tarefa(db, tarefa_doc, cache=None, escritas=None, indice=None):
+    """
+    Orquestra o processamento de uma única tarefa: busca dados, consulta o cache e o índice de
+    similaridade, chama a IA se necessário e atualiza o status no Firestore, com tratamento de erros robusto.
+    """
+    task_id = tarefa_doc.id
+    preparada = await _preparar_tarefa(db, tarefa_doc, escritas)
+    if preparada is None:
+        return
+    tarefa_ref, objeto_compra = preparada
+    tentativas_anteriores = tarefa_doc.to_dict().get('attempts', 0)
+
+    try:
+        if cache is not None:
+            resultado_cache = await cache.obter(objeto_compra)
+            if resultado_cache is not None:
+                await _salvar_resultado(tarefa_ref, task_id, resultado_cache, origem='cache', escritas=escritas,
+                                        tentativas_anteriores=tentativas_anteriores)
+                return
+
+        if indice is not None:
+            similar = indice.buscar_varios({task_id: objeto_compra}).get(task_id)
+            if similar is not None:
+                resultado_similar, similaridade, objeto_referencia = similar
+                await _salvar_resultado(tarefa_ref, task_id, resultado_similar, origem='similaridade', escritas=escritas,
+                                        similar=(similaridade, objeto_referencia), tentativas_anteriores=tentativas_anteriores)
+                return
+
+        logger.info(f"Enviando objeto para análise da IA: '{objeto_compra[:100]}...'")
+        resultado_analise = await analisar_objeto_com_ia(objeto_compra, API_TOKEN)
+        await _salvar_resultado(tarefa_ref, task_id, resultado_analise, escritas=escritas,
+                                tentativas_anteriores=tentativas_anteriores)
+        if cache is not None:
+            await cache.salvar(objeto_compra, resultado_analise)
+        if indice is not None:
+            indice.adicionar_varios({task_id: resultado_analise}, {task_id: objeto_compra})
+            indice.salvar_se_necessario()
 
+    except ErroQuotaIA as e:
+        await _devolver_para_fila(tarefa_ref, task_id, e, escritas)
     except Exception as e:
-        # Tratamento de erro que marca a tarefa com falha para revisão posterior
         logger.error(f"ERRO CRÍTICO no processamento da tarefa {task_id}: {e}", exc_info=True)
+        await _registrar_falha(tarefa_ref, task_id, e, escritas, tentativas_anteriores)
+
+async def processar_lote(db, tarefa_docs, cache=None, escritas=None, indice=None):
+    """
+    Processa várias tarefas com uma única chamada em lote à IA.
+    Cada tarefa é preparada e salva individualmente (pelo agrupador de escritas, se informado);
+    objetos já presentes no cache, ou com um objeto similar o bastante no índice de
+    similaridade, não são enviados à IA.
+    """
+    preparadas = await asyncio.gather(*(_preparar_tarefa(db, doc, escritas) for doc in tarefa_docs))
+    tarefas = {doc.id: p for doc, p in zip(tarefa_docs, preparadas) if p is not None}
+    if not tarefas:
+        return
+    tentativas = {doc.id: doc.to_dict().get('attempts', 0) for doc in tarefa_docs}
+
+    objetos = {task_id: objeto_compra for task_id, (_, objeto_compra) in tarefas.items()}
+    resultados_cache = {}
+    if cache is not None:
+        try:
+            resultados_cache = await cache.obter_varios(objetos)
+        except Exception as e:
+            logger.warning(f"Falha ao consultar o cache de análises, seguindo sem cache: {e}")
+
+    sem_cache = {task_id: objeto for task_id, objeto in objetos.items() if task_id not in resultados_cache}
+    similares = {}
+    if indice is not None:
+        # Resultados do cache também vieram da IA: alimentam o índice de quem ainda não os conhecia.
+        indice.adicionar_varios(resultados_cache, objetos)
+        similares = indice.buscar_varios(sem_cache)
+
+    objetos_ia = {task_id: objeto for task_id, objeto in sem_cache.items() if task_id not in similares}
+    resultados = {}
+    erros_ia = {} # Itens cuja chamada em lote falhou (os demais lotes seguem normalmente).
+    if objetos_ia:
+        logger.info(f"Enviando lote de {len(objetos_ia)} objeto(s) para análise da IA ({len(resultados_cache)} resolvido(s) "
+                    f"pelo cache, {len(similares)} por similaridade)...")
         try:
-            dados_erro = {
-                'status': 'falha_api',
-                'logErro': f"Erro: {type(e).__name__} - {e}",
-                'fimAnalise': datetime.datetime.now(datetime.timezone.utc)
-            }
-            await asyncio.to_thread(tarefa_ref.update, dados_erro)
-        except Exception as update_e:
-            logger.error(f"Falha ao tentar atualizar o status de erro da tarefa {task_id}: {update_e}")
-
-async def main():
-    """Função principal do worker que opera em loop, buscando e processando tarefas."""
+            resultados = await analisar_objetos_em_lote(objetos_ia, API_TOKEN, erros=erros_ia)
+        except ErroQuotaIA as e:
+            resultados = None
+            await asyncio.gather(*(_devolver_para_fila(tarefas[task_id][0], task_id, e, escritas) for task_id in objetos_ia))
+        except Exception as e:
+            logger.error(f"ERRO CRÍTICO na análise em lote de {len(objetos_ia)} tarefa(s): {e}", exc_info=True)
+            resultados = None
+            falhas = [_registrar_falha(tarefas[task_id][0], task_id, e, escritas, tentativas[task_id]) for task_id in objetos_ia]
+            await asyncio.gather(*falhas)
+
+        if cache is not None and resultados:
+            try:
+                await cache.salvar_varios(resultados, objetos_ia)
+            except Exception as e:
+                logger.warning(f"Falha ao gravar resultados no cache de análises: {e}")
+        if indice is not None and resultados:
+            indice.adicionar_varios(resultados, objetos_ia)
+    if indice is not None:
+        indice.salvar_se_necessario()
+
+    operacoes = []
+    for task_id, (tarefa_ref, _) in tarefas.items():
+        if task_id in resultados_cache:
+            operacoes.append(_salvar_resultado(tarefa_ref, task_id, resultados_cache[task_id], origem='cache', escritas=escritas,
+                                               tentativas_anteriores=tentativas[task_id]))
+        elif task_id in similares:
+            resultado_similar, similaridade, objeto_referencia = similares[task_id]
+            operacoes.append(_salvar_resultado(tarefa_ref, task_id, resultado_similar, origem='similaridade', escritas=escritas,
+                                               similar=(similaridade, objeto_referencia), tentativas_anteriores=tentativas[task_id]))
+        elif resultados is None:
+            continue
+        elif task_id in resultados:
+            operacoes.append(_salvar_resultado(tarefa_ref, task_id, resultados[task_id], escritas=escritas,
+                                               tentativas_anteriores=tentativas[task_id]))
+        elif isinstance(erros_ia.get(task_id), ErroQuotaIA):
+            operacoes.append(_devolver_para_fila(tarefa_ref, task_id, erros_ia[task_id], escritas))
+        else:
+            erro = erros_ia.get(task_id) or ValueError("A IA não retornou uma análise válida para o objeto após as retentativas do lote.")
+            operacoes.append(_registrar_falha(tarefa_ref, task_id, erro, escritas, tentativas[task_id]))
+    await asyncio.gather(*operacoes)
+
+def montar_worker(db, concorrencia: int = CONCORRENCIA_PADRAO, tamanho_lote: int = TAMANHO_LOTE,
+                  indice: IndiceSimilaridade | None = None) -> WorkerPool:
+    """
+    Monta o WorkerPool do worker de IA: o prefetcher reivindica tarefas pendentes (com lease)
+    para a fila interna e `concorrencia` consumidores as processam continuamente, em lotes.
+    O status 'analisando' é gravado pela própria reivindicação, e os resultados de todos os
+    consumidores são gravados juntos pelo agrupador de escritas. Com `indice`, objetos quase
+    idênticos a outros já analisados reaproveitam o resultado sem chamar a IA.
+    """
+    cache = CacheAnalises(db)
+    escritas = AgrupadorEscritas(db)
+    leases = GerenciadorLeases(db, TAREFAS_COLLECTION_NAME, STATUS_PENDENTE, STATUS_ANALISANDO,
+                               status_reagendado=STATUS_REAGENDADA_ANALISE, escalonador=EscalonadorJusto(db),
+                               status_falha=STATUS_FALHA)
+    logger.info(f"Identificador deste worker: {leases.worker_id}")
+
+    async def buscar_tarefas(limite):
+        return await leases.reivindicar(limite, campos_extras={
+            'inicioAnalise': datetime.datetime.now(datetime.timezone.utc),
+            'workerVersion': '3.0-portfolio'
+        })
+
+    async def processar_tarefas(docs):
+        async with leases.renovando([doc.reference for doc in docs]) as renovador:
+            # Resultados de tarefas cujo lease foi perdido não sobrescrevem o do novo dono.
+            await processar_lote(db, docs, cache, renovador.escritas(escritas), indice)
+        cache.registrar_metricas()
+        logger.info(f"Limitador da IA: {limitador.metricas()} | Cascata: {metricas_cascata.resumo()} | Escritas: {escritas.metricas()}")
+        if indice is not None:
+            logger.info(f"Índice de similaridade: {indice.metricas()}")
+
+    return WorkerPool(buscar_tarefas, processar_tarefas, concorrencia=concorrencia,
+                      tamanho_lote=tamanho_lote, nome='ai_worker')
+
+async def main(concorrencia: int = CONCORRENCIA_PADRAO, tamanho_lote: int = TAMANHO_LOTE, modo: str = 'listener',
+               similaridade: bool = True):
+    """
+    Função principal do worker. No modo 'listener', novas tarefas acordam o prefetcher na hora;
+    no modo 'polling', ele apenas consulta a fila periodicamente.
+    """
     logger.info("--- Worker de Análise de Licitações v3.0 (Portfolio Edition) Iniciado ---")
     db = get_firestore_client()
-    
-    while True:
-        try:
-            logger.info("Buscando lote de tarefas pendentes...")
-            tarefas_ref = db.collection(TAREFAS_COLLECTION_NAME).where('status', '==', 'pendente').limit(5)
-            tarefas_pendentes = list(await asyncio.to_thread(tarefas_ref.stream))
+    indice = IndiceSimilaridade() if similaridade else None
+    pool = montar_worker(db, concorrencia=concorrencia, tamanho_lote=tamanho_lote, indice=indice)
+    publicador = asyncio.create_task(PublicadorMetricasIA(db, metricas_cascata).executar_periodicamente())
 
-            if not tarefas_pendentes:
-                logger.info("Nenhuma tarefa pendente encontrada. Aguardando 60 segundos...")
-                await asyncio.sleep(60)
-                continue
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sinal, pool.parar)
+        except NotImplementedError:
+            pass # Windows: a interrupção cai no KeyboardInterrupt tratado abaixo.
 
-            tasks_to_process = [processar_tarefa(db, doc) for doc in tarefas_pendentes]
-            await asyncio.gather(*tasks_to_process)
-            
-            logger.info("Lote de tarefas processado. Buscando o próximo...")
-            await asyncio.sleep(5)
+    supervisor = None
+    if modo == 'listener':
+        # O AsyncClient não oferece on_snapshot: o listener usa um cliente síncrono próprio.
+        db_listener = firestore.Client(project=PROJECT_ID)
+        query_pendentes = db_listener.collection(TAREFAS_COLLECTION_NAME).where('status', '==', STATUS_PENDENTE)
+        supervisor = asyncio.create_task(OuvinteTarefas(query_pendentes, pool, nome='ai_worker').supervisionar())
 
-        except Exception as e:
-            logger.error(f"Erro inesperado no loop principal do worker: {e}", exc_info=True)
-            await asyncio.sleep(60) # Pausa antes de tentar novamente
+    try:
+        await pool.executar()
+    finally:
+        if supervisor is not None:
+            supervisor.cancel()
+        # Cancelada, a tarefa do publicador ainda grava os totais do último intervalo.
+        publicador.cancel()
+        await asyncio.gather(publicador, return_exceptions=True)
+        if indice is not None:
+            indice.salvar()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker de análise de licitações com IA.")
+    parser.add_argument('--concorrencia', type=int, default=CONCORRENCIA_PADRAO,
+                        help=f"Número de consumidores processando lotes em paralelo (padrão: {CONCORRENCIA_PADRAO}).")
+    parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE,
+                        help=f"Número máximo de tarefas por requisição à IA (padrão: {TAMANHO_LOTE}).")
+    parser.add_argument('--modo', choices=['listener', 'polling'], default='listener',
+                        help="'listener' reage a novas tarefas em tempo real (com polling de segurança); 'polling' apenas consulta periodicamente.")
+    parser.add_argument('--sem-similaridade', action='store_true',
+                        help="Não reaproveita resultados de objetos similares já analisados (só o cache exato).")
+    args = parser.parse_args()
     try:
-        asyncio.run(main())
+        asyncio.run(main(concorrencia=args.concorrencia, tamanho_lote=args.tamanho_lote, modo=args.modo,
+                         similaridade=not args.sem_similaridade))
     except KeyboardInterrupt:
         logger.info("Worker interrompido pelo usuário.")
     except Exception as e:
-        logger.critical(f"Erro fatal que impediu a inicialização do worker: {e}", exc_info=True)
\ No newline at end of file
+        logger.critical(f"Erro fatal que impediu a inicialização do worker: {e}", exc_info=True)
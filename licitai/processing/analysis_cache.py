@@ -0,0 +1,168 @@
+# licitai/processing/analysis_cache.py
+"""
+Cache endereçado por conteúdo dos resultados da análise de IA.
+A chave é o hash do objeto da compra normalizado mais a versão da análise
+(prompts + cascata de modelos), de modo que objetos repetidos sejam resolvidos com uma
+leitura no Firestore em vez de uma nova chamada ao Gemini.
+"""
+import datetime
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+from collections import OrderedDict
+
+from licitai.processing.regex_extractor import (
+    ESQUEMA_ANALISE_LOTE, LIMIAR_CONFIANCA, MODELOS_CASCATA, PROMPT_ANALISE_LICITACAO, PROMPT_ANALISE_LOTE,
+    SISTEMA_ANALISE
+)
+
+logger = logging.getLogger(__name__)
+
+# --- Constantes ---
+CACHE_COLLECTION_NAME = 'cacheAnalises'
+CAPACIDADE_MEMORIA_PADRAO = 5000
+
+# Qualquer alteração nos prompts, no esquema da resposta, na cascata de modelos ou no limiar gera uma nova versão e, portanto, novas chaves.
+VERSAO_ANALISE = hashlib.sha256(
+    "\n".join([
+        ",".join(MODELOS_CASCATA), str(LIMIAR_CONFIANCA), SISTEMA_ANALISE,
+        PROMPT_ANALISE_LICITACAO, PROMPT_ANALISE_LOTE, json.dumps(ESQUEMA_ANALISE_LOTE, sort_keys=True)
+    ]).encode('utf-8')
+).hexdigest()[:12]
+
+def normalizar_objeto(objeto_compra: str) -> str:
+    """Remove acentos, pontuação, caixa e espaços redundantes do objeto da compra."""
+    texto = unicodedata.normalize('NFKD', objeto_compra or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    texto = re.sub(r'[^\w\s]', ' ', texto)
+    return re.sub(r'\s+', ' ', texto).strip()
+
+def chave_cache(objeto_compra: str) -> str:
+    """Chave do cache: hash do texto normalizado combinado com a versão da análise."""
+    conteudo = f"{VERSAO_ANALISE}|{normalizar_objeto(objeto_compra)}"
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+class CacheAnalises:
+    """
+    Cache em duas camadas: um LRU em memória na frente da coleção 'cacheAnalises'.
+    Mantém contadores de acertos para acompanhar a taxa de aproveitamento.
+    `db` é um `firestore.AsyncClient` (o mesmo do worker).
+    """
+
+    def __init__(self, db, capacidade_memoria: int = CAPACIDADE_MEMORIA_PADRAO):
+        self._db = db
+        self._collection = db.collection(CACHE_COLLECTION_NAME)
+        self._memoria = OrderedDict()
+        self._capacidade_memoria = capacidade_memoria
+        self.acertos_memoria = 0
+        self.acertos_firestore = 0
+        self.falhas = 0
+
+    def _lembrar(self, chave, resultado):
+        self._memoria[chave] = resultado
+        self._memoria.move_to_end(chave)
+        if len(self._memoria) > self._capacidade_memoria:
+            self._memoria.popitem(last=False)
+
+    async def obter_varios(self, objetos: dict) -> dict:
+        """
+        Consulta o cache para vários objetos de uma vez ({id: objeto_compra}).
+        Retorna {id: resultado} apenas para os ids encontrados.
+        """
+        chaves = {item_id: chave_cache(objeto) for item_id, objeto in objetos.items()}
+        encontrados = {}
+        ausentes = {}
+        for item_id, chave in chaves.items():
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                encontrados[item_id] = self._memoria[chave]
+                self.acertos_memoria += 1
+            else:
+                ausentes.setdefault(chave, []).append(item_id)
+
+        if ausentes:
+            refs = [self._collection.document(chave) for chave in ausentes]
+            async for snapshot in self._db.get_all(refs):
+                if not snapshot.exists:
+                    continue
+                dados = snapshot.to_dict()
+                if dados.get('versaoAnalise') != VERSAO_ANALISE:
+                    continue
+                resultado = dados.get('resultado', {})
+                self._lembrar(snapshot.id, resultado)
+                for item_id in ausentes.pop(snapshot.id, []):
+                    encontrados[item_id] = resultado
+                    self.acertos_firestore += 1
+            self.falhas += sum(len(ids) for ids in ausentes.values())
+
+        return encontrados
+
+    async def obter(self, objeto_compra: str) -> dict | None:
+        """Consulta o cache para um único objeto da compra."""
+        encontrados = await self.obter_varios({'_': objeto_compra})
+        return encontrados.get('_')
+
+    async def salvar_varios(self, resultados: dict, objetos: dict):
+        """Grava no cache os resultados ({id: resultado}) dos objetos ({id: objeto_compra}) informados."""
+        if not resultados:
+            return
+        agora = datetime.datetime.now(datetime.timezone.utc)
+        batch = self._db.batch()
+        for item_id, resultado in resultados.items():
+            objeto_compra = objetos[item_id]
+            chave = chave_cache(objeto_compra)
+            # O consumo de tokens e a latência são da chamada original, não de quem reaproveita o cache.
+            resultado = {campo: valor for campo, valor in resultado.items() if campo != 'uso'}
+            self._lembrar(chave, resultado)
+            batch.set(self._collection.document(chave), {
+                'resultado': resultado,
+                'versaoAnalise': VERSAO_ANALISE,
+                'objetoNormalizado': normalizar_objeto(objeto_compra)[:500],
+                'criadoEm': agora
+            })
+        await batch.commit()
+
+    async def salvar(self, objeto_compra: str, resultado: dict):
+        """Grava no cache o resultado de um único objeto."""
+        await self.salvar_varios({'_': resultado}, {'_': objeto_compra})
+
+    def metricas(self) -> dict:
+        """Retorna os contadores de uso e a taxa de acerto acumulada."""
+        acertos = self.acertos_memoria + self.acertos_firestore
+        total = acertos + self.falhas
+        return {
+            'acertosMemoria': self.acertos_memoria,
+            'acertosFirestore': self.acertos_firestore,
+            'falhas': self.falhas,
+            'taxaAcerto': acertos / total if total else 0.0
+        }
+
+    def registrar_metricas(self):
+        """Escreve as métricas do cache no log."""
+        m = self.metricas()
+        logger.info(
+            f"Cache de análises: taxa de acerto {m['taxaAcerto']:.1%} "
+            f"(memória: {m['acertosMemoria']}, Firestore: {m['acertosFirestore']}, falhas: {m['falhas']})"
+        )
+
+def invalidar_cache_obsoleto(db, tamanho_lote: int = 200) -> int:
+    """Remove do Firestore as entradas geradas por versões anteriores da análise (cliente síncrono, usado pelo admin)."""
+    collection_ref = db.collection(CACHE_COLLECTION_NAME)
+    removidos = 0
+    batch = db.batch()
+    pendentes_no_lote = 0
+    for doc in collection_ref.stream():
+        if doc.to_dict().get('versaoAnalise') == VERSAO_ANALISE:
+            continue
+        batch.delete(doc.reference)
+        pendentes_no_lote += 1
+        removidos += 1
+        if pendentes_no_lote >= tamanho_lote:
+            batch.commit()
+            batch = db.batch()
+            pendentes_no_lote = 0
+    if pendentes_no_lote:
+        batch.commit()
+    return removidos
@@ -0,0 +1,213 @@
+# licitai/processing/contact_extractor.py
+"""
+Extração de contatos (e-mails e telefones) de páginas HTML, textos e PDFs.
+Os padrões são compilados uma única vez; o texto visível é desofuscado ("fulano [at]
+prefeitura [ponto] gov [ponto] br", "fulano arroba gmail ponto com"), os telefones são
+normalizados para E.164 (+55...) e cada contato recebe a indicação do departamento mais
+próximo no texto. O texto dos PDFs é extraído com o pdfminer.six. Páginas grandes e PDFs
+são processados num pool de processos, para não bloquear o event loop dos workers.
+As funções de normalização também servem aos scripts do `crm` (ver crm/higienizar_contatos.py).
+"""
+import asyncio
+import html
+import io
+import logging
+import re
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# --- Padrões ---
+_RE_SCRIPT_ESTILO = re.compile(r'<(script|style|noscript)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_RE_MAILTO = re.compile(r'mailto:([^"\'?>\s]+)', re.IGNORECASE)
+_RE_TELLINK = re.compile(r'tel:([^"\'>]+)', re.IGNORECASE)
+_RE_TAG = re.compile(r'<[^>]+>')
+_RE_ESPACOS = re.compile(r'\s+')
+_RE_ARROBA = re.compile(r'\s*[\[\(\{<]\s*(?:at|arroba)\s*[\]\)\}>]\s*|\s+arroba\s+', re.IGNORECASE)
+_RE_PONTO = re.compile(r'\s*[\[\(\{<]\s*(?:dot|ponto)\s*[\]\)\}>]\s*', re.IGNORECASE)
+# " ponto "/" dot " sem colchetes só vira "." dentro de um endereço (junto ao "@"), não no texto corrido.
+_RE_PONTO_SOLTO = re.compile(r'\s+(?:dot|ponto)\s+', re.IGNORECASE)
+_RE_DOMINIO_OFUSCADO = re.compile(r'(?<=@)[\w-]+(?:\s+(?:dot|ponto)\s+[\w-]+)+', re.IGNORECASE)
+_RE_USUARIO_OFUSCADO = re.compile(r'[\w-]+(?:\s+(?:dot|ponto)\s+[\w-]+)+(?=@)', re.IGNORECASE)
+_RE_EMAIL = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9-]+(?:\.[a-zA-Z0-9-]+)*\.[a-zA-Z]{2,}')
+_RE_TELEFONE = re.compile(
+    r'(?<![\d/])(?:\+?55[\s.-]?)?(?:\(\s*0?(\d{2})\s*\)|0?(\d{2}))[\s.-]?(9?\d{4})[\s.-]?(\d{4})(?![\d/])'
+)
+_EXTENSOES_ARQUIVO = ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.svg', '.css', '.js')
+
+# DDDs válidos no Brasil.
+DDDS = frozenset({
+    11, 12, 13, 14, 15, 16, 17, 18, 19, 21, 22, 24, 27, 28, 31, 32, 33, 34, 35, 37, 38, 41, 42, 43, 44, 45, 46,
+    47, 48, 49, 51, 53, 54, 55, 61, 62, 63, 64, 65, 66, 67, 68, 69, 71, 73, 74, 75, 77, 79, 81, 82, 83, 84, 85,
+    86, 87, 88, 89, 91, 92, 93, 94, 95, 96, 97, 98, 99
+})
+
+# Termos (sem acentos, em minúsculas) que indicam o departamento de um contato.
+DEPARTAMENTOS = {
+    'TI': ('tecnologia da informacao', 'informatica', 'cpd', 'departamento de ti', 'setor de ti', 'diretoria de ti'),
+    'Licitações': ('licitacao', 'licitacoes', 'pregao', 'pregoeiro', 'cpl', 'comissao permanente'),
+    'Compras': ('compras', 'suprimentos', 'aquisicoes', 'almoxarifado'),
+    'Administração': ('administracao', 'secretaria de administracao', 'recursos humanos'),
+    'Gabinete': ('gabinete', 'prefeito', 'ouvidoria'),
+}
+JANELA_DEPARTAMENTO = 200 # Caracteres antes do contato examinados em busca do departamento.
+MARGEM_TRECHO = 80
+
+# Textos a partir deste tamanho vão para o pool de processos; os menores são extraídos no próprio loop.
+# PDFs vão sempre para o pool.
+LIMIAR_POOL_CARACTERES = 50_000
+MAX_PAGINAS_PDF = 50 # Páginas lidas de cada PDF (listas de contatos ficam no início).
+
+def _sem_acentos(texto: str) -> str:
+    texto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+def texto_visivel(conteudo: str) -> str:
+    """
+    Texto legível de uma página HTML (ou de um texto simples): sem scripts e tags, com as
+    entidades decodificadas; os endereços de links mailto:/tel: são preservados no texto.
+    """
+    conteudo = _RE_SCRIPT_ESTILO.sub(' ', conteudo or '')
+    links = ' '.join(_RE_MAILTO.findall(conteudo) + _RE_TELLINK.findall(conteudo))
+    texto = html.unescape(_RE_TAG.sub(' ', conteudo) + ' ' + links)
+    return _RE_ESPACOS.sub(' ', texto).strip()
+
+def texto_de_pdf(conteudo: bytes) -> str:
+    """Texto das MAX_PAGINAS_PDF primeiras páginas de um PDF (vazio se o arquivo for inválido)."""
+    from pdfminer.high_level import extract_text
+
+    try:
+        return extract_text(io.BytesIO(conteudo), maxpages=MAX_PAGINAS_PDF)
+    except Exception as e:
+        logger.debug(f"PDF ilegível: {e}")
+        return ''
+
+def _juntar_pontos(match) -> str:
+    return _RE_PONTO_SOLTO.sub('.', match.group(0))
+
+def desofuscar(texto: str) -> str:
+    """
+    Desfaz as ofuscações comuns de e-mail: "[at]", "(arroba)", " arroba ", "[dot]", "(ponto)"
+    e, junto ao "@", " ponto "/" dot " sem colchetes ("joao arroba gmail ponto com").
+    """
+    texto = _RE_PONTO.sub('.', _RE_ARROBA.sub('@', texto))
+    texto = _RE_DOMINIO_OFUSCADO.sub(_juntar_pontos, texto)
+    return _RE_USUARIO_OFUSCADO.sub(_juntar_pontos, texto)
+
+def normalizar_email(email: str) -> str | None:
+    """E-mail em minúsculas, sem pontuação nas pontas, ou None se não for um endereço válido."""
+    email = (email or '').strip().strip('.,;:').lower()
+    if not _RE_EMAIL.fullmatch(email) or email.endswith(_EXTENSOES_ARQUIVO):
+        return None
+    return email
+
+def _e164(ddd: str, prefixo: str, sufixo: str) -> str | None:
+    if not ddd or int(ddd) not in DDDS:
+        return None
+    if len(prefixo) == 5 and prefixo[0] != '9':
+        return None # Só celulares têm 9 dígitos.
+    if len(prefixo) == 4 and prefixo[0] not in '2345':
+        return None # Fixos começam de 2 a 5.
+    return f"+55{ddd}{prefixo}{sufixo}"
+
+def normalizar_telefone(telefone) -> str | None:
+    """Telefone brasileiro no formato E.164 (+55DDNNNNNNNN[N]) ou None se não for válido."""
+    digitos = re.sub(r'\D', '', str(telefone or ''))
+    if digitos.startswith('55') and len(digitos) in (12, 13):
+        digitos = digitos[2:]
+    elif digitos.startswith('0') and len(digitos) in (11, 12):
+        digitos = digitos[1:]
+    if len(digitos) not in (10, 11):
+        return None
+    return _e164(digitos[:2], digitos[2:-4], digitos[-4:])
+
+def _departamento(texto_minusculo: str, posicao: int) -> str | None:
+    """Departamento cujo termo aparece mais perto (antes) da posição do contato."""
+    janela = texto_minusculo[max(0, posicao - JANELA_DEPARTAMENTO):posicao]
+    melhor, melhor_posicao = None, -1
+    for departamento, termos in DEPARTAMENTOS.items():
+        for termo in termos:
+            encontrado = janela.rfind(termo)
+            if encontrado > melhor_posicao:
+                melhor, melhor_posicao = departamento, encontrado
+    return melhor
+
+def _trecho(texto: str, inicio: int, fim: int) -> str:
+    return texto[max(0, inicio - MARGEM_TRECHO):fim + MARGEM_TRECHO].strip()
+
+def extrair_contatos(conteudo: str, fonte: str | None = None, eh_html: bool = True) -> list:
+    """
+    Extrai os e-mails e telefones de uma página (ou texto simples, com `eh_html=False`), sem repetições.
+    Cada contato é um dicionário com "email" ou "telefone", "departamento", "trecho" e "fonte".
+    """
+    texto = desofuscar(texto_visivel(conteudo) if eh_html else _RE_ESPACOS.sub(' ', conteudo or ''))
+    # A normalização NFKD pode mudar o tamanho do texto; só a remove se ele continuar alinhado.
+    minusculo = _sem_acentos(texto)
+    if len(minusculo) != len(texto):
+        minusculo = texto.lower()
+
+    contatos = []
+    vistos = set()
+    for match in _RE_EMAIL.finditer(texto):
+        email = normalizar_email(match.group(0))
+        if email and email not in vistos:
+            vistos.add(email)
+            contatos.append({'email': email, 'departamento': _departamento(minusculo, match.start()),
+                             'trecho': _trecho(texto, match.start(), match.end()), 'fonte': fonte})
+    for match in _RE_TELEFONE.finditer(texto):
+        telefone = _e164(match.group(1) or match.group(2), match.group(3), match.group(4))
+        if telefone and telefone not in vistos:
+            vistos.add(telefone)
+            contatos.append({'telefone': telefone, 'departamento': _departamento(minusculo, match.start()),
+                             'trecho': _trecho(texto, match.start(), match.end()), 'fonte': fonte})
+    return contatos
+
+def extrair_de_documentos(documentos: list) -> list:
+    """
+    Extrai os contatos de vários documentos [(fonte, conteúdo)], sem repetir contatos entre eles.
+    O conteúdo é HTML ou texto (str) ou os bytes de um PDF.
+    """
+    contatos = []
+    vistos = set()
+    for fonte, conteudo in documentos:
+        if isinstance(conteudo, bytes):
+            encontrados = extrair_contatos(texto_de_pdf(conteudo), fonte, eh_html=False)
+        else:
+            encontrados = extrair_contatos(conteudo, fonte)
+        for contato in encontrados:
+            chave = contato.get('email') or contato.get('telefone')
+            if chave not in vistos:
+                vistos.add(chave)
+                contatos.append(contato)
+    return contatos
+
+class ExtratorContatos:
+    """
+    Executa a extração num pool de processos compartilhado quando o volume de texto é grande.
+    Use como gerenciador de contexto (`with ExtratorContatos() as extrator:`) para encerrar o pool.
+    """
+
+    def __init__(self, max_processos: int | None = None):
+        self._max_processos = max_processos
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.encerrar()
+
+    def encerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    async def extrair(self, documentos: list) -> list:
+        """Versão assíncrona de extrair_de_documentos, fora do event loop para textos grandes e PDFs."""
+        tem_pdf = any(isinstance(conteudo, bytes) for _, conteudo in documentos)
+        if not tem_pdf and sum(len(conteudo or '') for _, conteudo in documentos) < LIMIAR_POOL_CARACTERES:
+            return extrair_de_documentos(documentos)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self._max_processos)
+        return await asyncio.get_running_loop().run_in_executor(self._pool, extrair_de_documentos, documentos)
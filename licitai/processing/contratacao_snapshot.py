@@ -0,0 +1,104 @@
+# licitai/processing/contratacao_snapshot.py
+"""
+Cópia compacta dos dados da contratação gravada na própria tarefa (`snapshotContratacao`).
+Com ela, o worker de IA, o enriquecedor e o consolidador não precisam ler o documento
+da contratação a cada tarefa. Tarefas antigas (sem snapshot ou com versão anterior)
+continuam funcionando pela leitura da contratação, e o comando `atualizar-snapshots`
+do admin regrava os snapshots obsoletos.
+"""
+import logging
+
+from licitai.processing.task_priority import calcular_prioridade
+from licitai.processing.task_retries import STATUS_REAGENDADA_ANALISE, STATUS_REAGENDADA_ENRIQUECIMENTO
+
+logger = logging.getLogger(__name__)
+
+# --- Constantes ---
+CAMPO_SNAPSHOT = 'snapshotContratacao'
+CONTRATACOES_COLLECTION_NAME = 'contratacoes'
+# Incremente ao mudar CAMPOS_SNAPSHOT para que `atualizar-snapshots` regrave as tarefas existentes.
+VERSAO_SNAPSHOT = 2
+CAMPOS_SNAPSHOT = (
+    'objetoCompra', 'orgaoRazaoSocial', 'orgaoCnpj', 'municipioNome', 'ufSigla', 'linkEditalDocumentos',
+    'dataPublicacaoPncp', 'dataEncerramentoProposta'
+)
+# Status em que a tarefa ainda aguarda numa fila (e a prioridade ainda decide a ordem de atendimento).
+STATUS_NA_FILA = frozenset({'pendente', STATUS_REAGENDADA_ANALISE, 'analise_concluida', STATUS_REAGENDADA_ENRIQUECIMENTO})
+
+def montar_snapshot(contratacao_data: dict) -> dict:
+    """Extrai da contratação os campos usados pelas etapas seguintes, com o marcador de versão."""
+    snapshot = {campo: contratacao_data[campo] for campo in CAMPOS_SNAPSHOT if contratacao_data.get(campo) is not None}
+    snapshot['versao'] = VERSAO_SNAPSHOT
+    return snapshot
+
+def obter_snapshot(tarefa_data: dict) -> dict | None:
+    """Retorna o snapshot da tarefa se ele existir e estiver na versão atual."""
+    snapshot = tarefa_data.get(CAMPO_SNAPSHOT)
+    if isinstance(snapshot, dict) and snapshot.get('versao') == VERSAO_SNAPSHOT:
+        return snapshot
+    return None
+
+def carregar_contratacao(db, tarefa_data: dict) -> dict | None:
+    """
+    Dados da contratação da tarefa: o snapshot, se houver, ou o documento lido do Firestore.
+    Retorna None se a contratação não existir.
+    """
+    snapshot = obter_snapshot(tarefa_data)
+    if snapshot is not None:
+        return snapshot
+    pncp_number = tarefa_data.get('numeroControlePNCP')
+    contratacao_doc = db.collection(CONTRATACOES_COLLECTION_NAME).document(pncp_number).get()
+    return contratacao_doc.to_dict() if contratacao_doc.exists else None
+
+async def carregar_contratacao_async(db, tarefa_data: dict) -> dict | None:
+    """Versão de carregar_contratacao para o `firestore.AsyncClient` dos workers."""
+    snapshot = obter_snapshot(tarefa_data)
+    if snapshot is not None:
+        return snapshot
+    pncp_number = tarefa_data.get('numeroControlePNCP')
+    contratacao_doc = await db.collection(CONTRATACOES_COLLECTION_NAME).document(pncp_number).get()
+    return contratacao_doc.to_dict() if contratacao_doc.exists else None
+
+def atualizar_snapshots(db, tarefas_collection_name: str, forcar: bool = False, tamanho_lote: int = 200) -> int:
+    """
+    Regrava o snapshot das tarefas sem snapshot ou com versão obsoleta (todas, se `forcar`);
+    a prioridade só é recalculada nas tarefas ainda na fila (STATUS_NA_FILA), sem mexer no
+    histórico das concluídas. As contratações são lidas em blocos com get_all.
+    Retorna o número de tarefas atualizadas.
+    """
+    contratacoes_ref = db.collection(CONTRATACOES_COLLECTION_NAME)
+    pendentes = {} # numeroControlePNCP -> [(ref da tarefa, ainda na fila)]
+    for tarefa_doc in db.collection(tarefas_collection_name).stream():
+        tarefa_data = tarefa_doc.to_dict()
+        pncp_number = tarefa_data.get('numeroControlePNCP')
+        if not pncp_number or (not forcar and obter_snapshot(tarefa_data) is not None):
+            continue
+        pendentes.setdefault(pncp_number, []).append((tarefa_doc.reference, tarefa_data.get('status') in STATUS_NA_FILA))
+    logger.info(f"{sum(len(refs) for refs in pendentes.values())} tarefa(s) de {len(pendentes)} contratação(ões) precisam de snapshot.")
+
+    atualizadas = 0
+    numeros = list(pendentes)
+    for inicio in range(0, len(numeros), tamanho_lote):
+        refs_contratacoes = [contratacoes_ref.document(numero) for numero in numeros[inicio:inicio + tamanho_lote]]
+        batch = db.batch()
+        escritas_no_lote = 0
+        for contratacao_doc in db.get_all(refs_contratacoes):
+            if not contratacao_doc.exists:
+                logger.warning(f"Contratação {contratacao_doc.id} não encontrada; snapshot não gerado.")
+                continue
+            contratacao_data = contratacao_doc.to_dict()
+            snapshot = montar_snapshot(contratacao_data)
+            prioridade = calcular_prioridade(contratacao_data)
+            for tarefa_ref, na_fila in pendentes[contratacao_doc.id]:
+                atualizacao = {CAMPO_SNAPSHOT: snapshot, 'prioridade': prioridade} if na_fila else {CAMPO_SNAPSHOT: snapshot}
+                batch.update(tarefa_ref, atualizacao)
+                escritas_no_lote += 1
+                if escritas_no_lote >= 450:
+                    batch.commit()
+                    atualizadas += escritas_no_lote
+                    batch = db.batch()
+                    escritas_no_lote = 0
+        if escritas_no_lote:
+            batch.commit()
+            atualizadas += escritas_no_lote
+    return atualizadas
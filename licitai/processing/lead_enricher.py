@@ -5,12 +5,26 @@ Busca contatos (e-mail, telefone) de departamentos-chave nos sites dos órgãos
 """
 import sys
 import os
+import argparse
 import logging
 import datetime
 import asyncio
-import re
+import signal
 from google.cloud import firestore
-from google_search import search # Importa a ferramenta de busca
+from google_search import ErroBuscaIncompleta, search_async, limitador_buscas # Importa a ferramenta de busca
+from licitai.processing.task_leases import GerenciadorLeases, campos_liberacao
+from licitai.processing.worker_pool import WorkerPool
+from licitai.processing.task_listener import OuvinteTarefas
+from licitai.processing.write_coalescer import AgrupadorEscritas, gravar_atualizacao
+from licitai.processing.contratacao_snapshot import carregar_contratacao_async
+from licitai.processing.task_priority import EscalonadorJusto
+from licitai.processing.task_retries import STATUS_REAGENDADA_ENRIQUECIMENTO, campos_falha, campos_sucesso
+from licitai.processing.orgao_directory import DiretorioOrgaos
+from licitai.processing.orgao_domains import descobrir_dominios, filtro_site, pertence_aos_dominios
+from licitai.processing.page_fetcher import BuscadorPaginas
+from licitai.processing.contact_extractor import ExtratorContatos, extrair_de_documentos
+from licitai.processing.search_backends import fechar_backend_busca
+from licitai.data_collection.cnpj_index import IndiceCNPJ
 
 # --- Configuração Inicial ---
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
@@ -23,22 +37,89 @@ logger = logging.getLogger(__name__)
 TAREFAS_COLLECTION_NAME = 'tarefasRaspagem'
 CONTRATACOES_COLLECTION_NAME = 'contratacoes'
 STATUS_TO_ENRICH = 'analise_concluida'
+STATUS_ENRICHING = 'enriquecendo'
 STATUS_SUCCESS = 'enriquecimento_concluido'
-STATUS_FAIL = 'falha_enriquecimento'
-EMAIL_REGEX = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
+STATUS_FAIL = 'falha_enriquecimento' # Fila de "dead letter" do enriquecimento.
+CONCORRENCIA_PADRAO = 20 # Tarefas enriquecidas simultaneamente (o ritmo das buscas é dado pelo limitador global).
+DEPARTAMENTOS_ALVO = ["departamento de TI", "secretaria de administração", "setor de compras", "licitações"]
+RESULTADOS_BUSCA_GENERICA = 5 # Por query, uma por departamento.
+RESULTADOS_BUSCA_DIRECIONADA = 10 # Na única query restrita aos domínios do órgão.
+
+PROJECT_ID = "pncp-insights-jewpf"
 
 def get_firestore_client():
-    """Inicializa e retorna o cliente do Firestore."""
+    """Inicializa e retorna o cliente assíncrono do Firestore, compartilhado por todo o worker."""
     try:
-        db = firestore.Client(project="pncp-insights-jewpf")
+        db = firestore.AsyncClient(project=PROJECT_ID)
         logger.info("Cliente do Firestore inicializado com sucesso.")
         return db
     except Exception as e:
         logger.error(f"Falha ao inicializar o cliente do Firestore: {e}", exc_info=True)
         raise
 
-async def enrich_task(db, task_doc):
-    """Processa uma única tarefa, buscando contatos para o órgão associado."""
+async def buscar_contatos_orgao(orgao_nome: str, paginas=None, extrator=None, dominios=None) -> list:
+    """
+    Executa as buscas de contato dos departamentos-chave do órgão e extrai os e-mails e
+    telefones encontrados nos snippets e, com `paginas` (um BuscadorPaginas), nas páginas
+    dos resultados (HTML, texto ou PDF). Com `extrator`, páginas grandes e PDFs são processados
+    fora do event loop.
+    Com os `dominios` oficiais do órgão, faz uma única busca restrita a eles (`site:`) e só
+    baixa as páginas desses domínios, além das suas páginas iniciais; se nada for encontrado
+    assim, recorre às buscas genéricas. Se alguma busca falhar e nenhum contato for encontrado,
+    lança ErroBuscaIncompleta, para que o resultado vazio não seja guardado no diretório.
+    """
+    if dominios:
+        departamentos = ' OR '.join(f'"{depto}"' for depto in DEPARTAMENTOS_ALVO)
+        queries = [f'{filtro_site(dominios)} email contato ({departamentos})']
+        num_results = RESULTADOS_BUSCA_DIRECIONADA
+    else:
+        queries = [f'email contato "{depto}" "{orgao_nome}"' for depto in DEPARTAMENTOS_ALVO]
+        num_results = RESULTADOS_BUSCA_GENERICA
+
+    logger.info(f"Executando {len(queries)} buscas para encontrar contatos...")
+    search_results = await search_async(queries, num_results=num_results)
+
+    # Documentos a examinar: (url de origem, conteúdo)
+    documentos = [(res.url, res.snippet) for result_set in search_results for res in (result_set.results or [])]
+    if paginas is not None:
+        urls = [url for url, _ in documentos]
+        if dominios:
+            urls = [f"https://{dominio}/" for dominio in dominios] + [url for url in urls if pertence_aos_dominios(url, dominios)]
+        documentos.extend((pagina.url, pagina.conteudo) for pagina in await paginas.obter_varias(urls))
+
+    if extrator is not None:
+        contatos = await extrator.extrair(documentos)
+    else:
+        contatos = extrair_de_documentos(documentos)
+    if dominios and not contatos:
+        logger.info(f"Nenhum contato nos domínios {dominios}; recorrendo às buscas genéricas.")
+        return await buscar_contatos_orgao(orgao_nome, paginas, extrator)
+    erros = [result_set.erro for result_set in search_results if result_set.erro]
+    if not contatos and erros:
+        raise ErroBuscaIncompleta(f"{len(erros)} de {len(search_results)} busca(s) falharam: {erros[0]}")
+    return contatos
+
+def contatos_do_cadastro_cnpj(indice_cnpj, orgao_cnpj) -> list:
+    """E-mail e telefones do órgão no cadastro CNPJ da Receita Federal (índice local), no formato dos contatos extraídos."""
+    registro = indice_cnpj.buscar(orgao_cnpj) if indice_cnpj is not None else None
+    if registro is None:
+        return []
+    trecho = f"Cadastro CNPJ da Receita Federal: {registro['razaoSocial']} ({registro['uf']})"
+    contatos = [{'telefone': telefone, 'departamento': None, 'trecho': trecho, 'fonte': 'cadastro-cnpj'}
+                for telefone in registro['telefones']]
+    if registro['email']:
+        contatos.insert(0, {'email': registro['email'], 'departamento': None, 'trecho': trecho, 'fonte': 'cadastro-cnpj'})
+    return contatos
+
+async def enrich_task(db, task_doc, escritas=None, diretorio=None, paginas=None, extrator=None, indice_cnpj=None):
+    """
+    Processa uma única tarefa já reivindicada (status 'enriquecendo'), buscando contatos para o órgão associado.
+    Com `diretorio`, cada órgão é buscado uma única vez por período de validade e seus domínios
+    oficiais, usados para direcionar as buscas, são descobertos uma única vez; com `paginas`,
+    as páginas dos resultados de busca também são baixadas e examinadas, e com `extrator` a
+    extração das páginas grandes roda num pool de processos. Com `indice_cnpj`, órgãos cujo
+    cadastro na Receita Federal já traz um e-mail são resolvidos sem nenhuma busca na web.
+    """
     task_id = task_doc.id
     task_data = task_doc.to_dict()
     task_ref = db.collection(TAREFAS_COLLECTION_NAME).document(task_id)
@@ -46,20 +127,17 @@ async def enrich_task(db, task_doc):
     pncp_number = task_data.get("numeroControlePNCP")
     if not pncp_number:
         logger.error(f"Tarefa {task_id} não possui 'numeroControlePNCP'. Marcando como falha.")
-        task_ref.update({'status': STATUS_FAIL, 'logErro': 'PNCP não encontrado na tarefa.'})
+        await gravar_atualizacao(task_ref, {'status': STATUS_FAIL, 'logErro': 'PNCP não encontrado na tarefa.', **campos_liberacao()}, escritas)
         return
 
     try:
         logger.info(f"--- Iniciando Enriquecimento | Tarefa ID: {task_id} | PNCP: {pncp_number} ---")
-        await asyncio.to_thread(task_ref.update, {'status': 'enriquecendo'})
 
-        # 1. Buscar dados da contratação original
-        contratacao_ref = db.collection(CONTRATACOES_COLLECTION_NAME).document(pncp_number)
-        contratacao_doc = await asyncio.to_thread(contratacao_ref.get)
-        if not contratacao_doc.exists:
+        # 1. Dados da contratação original (snapshot na tarefa ou leitura da contratação)
+        contratacao_data = await carregar_contratacao_async(db, task_data)
+        if contratacao_data is None:
             raise FileNotFoundError(f"Documento de contratação {pncp_number} não encontrado.")
-        
-        contratacao_data = contratacao_doc.to_dict()
+
         orgao_nome = contratacao_data.get("orgaoRazaoSocial", "")
         municipio_nome = contratacao_data.get("municipioNome", "")
         uf_sigla = contratacao_data.get("ufSigla", "")
@@ -69,84 +147,133 @@ async def enrich_task(db, task_doc):
 
         logger.info(f"Órgão alvo: {orgao_nome} - {municipio_nome}/{uf_sigla}")
 
-        # 2. Montar as queries de busca
-        departamentos_alvo = ["departamento de TI", "secretaria de administração", "setor de compras", "licitações"]
-        queries = [f'email contato "{depto}" "{orgao_nome}"' for depto in departamentos_alvo]
-        
-        # 3. Executar a busca e extrair contatos
-        logger.info(f"Executando {len(queries)} buscas para encontrar contatos...")
-        search_results = await asyncio.to_thread(search, queries=queries)
-        
-        found_contacts = []
-        seen_emails = set()
-
-        for result_set in search_results:
-            if result_set.results:
-                for res in result_set.results:
-                    # Extrai e-mails do snippet
-                    emails_in_snippet = re.findall(EMAIL_REGEX, res.snippet)
-                    for email in emails_in_snippet:
-                        if email.lower() not in seen_emails:
-                            contact_info = {
-                                "email": email.lower(),
-                                "fonte": res.url,
-                                "trecho": res.snippet
-                            }
-                            found_contacts.append(contact_info)
-                            seen_emails.add(email.lower())
-        
-        if found_contacts:
-            logger.info(f"Sucesso! {len(found_contacts)} contatos de e-mail encontrados.")
+        # 2. Contatos do órgão: do diretório de órgãos ou, se ausentes/expirados, por busca
+        #    restrita aos domínios oficiais do órgão (também guardados no diretório)
+        def descobrir():
+            return descobrir_dominios(orgao_nome, municipio_nome, uf_sigla)
+
+        async def buscar():
+            try:
+                if diretorio is not None:
+                    dominios = await diretorio.obter_dominios(orgao_nome, contratacao_data.get("orgaoCnpj"), descobrir)
+                else:
+                    dominios = await descobrir()
+            except ErroBuscaIncompleta as e:
+                # Sem os domínios (e sem guardá-los), segue com as buscas genéricas.
+                logger.warning(f"{e}. Seguindo com as buscas genéricas.")
+                dominios = None
+            return await buscar_contatos_orgao(orgao_nome, paginas, extrator, dominios)
+
+        contatos_cnpj = contatos_do_cadastro_cnpj(indice_cnpj, contratacao_data.get("orgaoCnpj"))
+        if any(contato.get('email') for contato in contatos_cnpj):
+            contatos, origem_contatos = contatos_cnpj, 'cadastro-cnpj'
         else:
-            logger.warning("Nenhum contato de e-mail encontrado para este órgão.")
+            if diretorio is not None:
+                contatos, origem_contatos = await diretorio.obter_contatos(orgao_nome, contratacao_data.get("orgaoCnpj"), buscar)
+            else:
+                contatos, origem_contatos = await buscar(), 'busca'
+            # Telefones do cadastro (sem e-mail) somam-se aos encontrados na busca.
+            vistos = {contato.get('telefone') for contato in contatos}
+            contatos = contatos + [c for c in contatos_cnpj if c['telefone'] not in vistos]
+        found_contacts = [contato for contato in contatos if contato.get('email')]
+        found_phones = [contato for contato in contatos if contato.get('telefone')]
 
-        # 4. Atualizar a tarefa com o resultado
+        if contatos:
+            logger.info(f"Sucesso! {len(found_contacts)} e-mail(s) e {len(found_phones)} telefone(s) encontrados ({origem_contatos}).")
+        else:
+            logger.warning(f"Nenhum contato encontrado para este órgão ({origem_contatos}).")
+
+        # 3. Atualizar a tarefa com o resultado
         dados_atualizacao = {
             'status': STATUS_SUCCESS,
             'dataEnriquecimento': datetime.datetime.now(datetime.timezone.utc),
-            'contatosEncontrados': found_contacts
+            'contatosEncontrados': found_contacts,
+            'telefonesEncontrados': found_phones,
+            'origemContatos': origem_contatos,
+            **campos_sucesso(),
+            **campos_liberacao()
         }
-        await asyncio.to_thread(task_ref.update, dados_atualizacao)
-        logger.info(f"Tarefa {task_id} enriquecida com {len(found_contacts)} contatos.")
+        await gravar_atualizacao(task_ref, dados_atualizacao, escritas)
+        logger.info(f"Tarefa {task_id} enriquecida com {len(contatos)} contatos.")
 
     except Exception as e:
         logger.error(f"ERRO CRÍTICO no enriquecimento da tarefa {task_id}: {e}", exc_info=True)
-        await asyncio.to_thread(task_ref.update, {'status': STATUS_FAIL, 'logErro': str(e)})
+        # Dados ausentes na contratação não se resolvem com novas tentativas; falhas da busca, sim.
+        permanente = isinstance(e, (FileNotFoundError, ValueError))
+        dados_falha = campos_falha(task_data.get('attempts', 0), str(e), STATUS_REAGENDADA_ENRIQUECIMENTO, STATUS_FAIL,
+                                   transitoria=not permanente)
+        await gravar_atualizacao(task_ref, {**dados_falha, **campos_liberacao()}, escritas)
+        if dados_falha['status'] == STATUS_REAGENDADA_ENRIQUECIMENTO:
+            logger.warning(f"Tarefa {task_id} reagendada (tentativa {dados_falha['attempts']}) para {dados_falha['nextAttemptAt']:%H:%M:%S}.")
 
-async def main():
-    """Função principal do worker que busca e enriquece tarefas."""
+async def main(concorrencia: int = CONCORRENCIA_PADRAO, modo: str = 'listener'):
+    """
+    Função principal do worker: reivindica tarefas analisadas (com lease) para a fila interna
+    e as enriquece continuamente com `concorrencia` consumidores.
+    """
     logger.info("--- Lead Enricher v1.0 (Busca Real) Iniciado ---")
     db = get_firestore_client()
-    
-    while True:
+    # Tarefas 'enriquecendo' com lease vencido (worker que caiu) voltam sozinhas para a fila,
+    # contando como tentativa falha (após MAX_TENTATIVAS, vão para STATUS_FAIL).
+    leases = GerenciadorLeases(db, TAREFAS_COLLECTION_NAME, STATUS_TO_ENRICH, STATUS_ENRICHING,
+                               status_reagendado=STATUS_REAGENDADA_ENRIQUECIMENTO, escalonador=EscalonadorJusto(db),
+                               status_falha=STATUS_FAIL)
+    logger.info(f"Identificador deste worker: {leases.worker_id}")
+    escritas = AgrupadorEscritas(db)
+    diretorio = DiretorioOrgaos(db)
+    paginas = BuscadorPaginas()
+    extrator = ExtratorContatos()
+    indice_cnpj = IndiceCNPJ.abrir_se_existir()
+    if indice_cnpj is None:
+        logger.info("Índice CNPJ não encontrado (comando 'importar-cnpj'); os contatos virão apenas das buscas.")
+    else:
+        logger.info(f"Índice CNPJ aberto com {len(indice_cnpj)} estabelecimento(s) públicos.")
+
+    async def buscar_tarefas(limite):
+        return await leases.reivindicar(limite)
+
+    async def processar_tarefas(docs):
+        async with leases.renovando([doc.reference for doc in docs]) as renovador:
+            # Resultados de tarefas cujo lease foi perdido não sobrescrevem o do novo dono.
+            escritas_lease = renovador.escritas(escritas)
+            await asyncio.gather(*(enrich_task(db, doc, escritas_lease, diretorio, paginas, extrator, indice_cnpj) for doc in docs))
+        logger.info(f"Diretório de órgãos: {diretorio.metricas()} | Buscas: {limitador_buscas.metricas()} | Páginas: {paginas.metricas()}")
+
+    pool = WorkerPool(buscar_tarefas, processar_tarefas, concorrencia=concorrencia, nome='lead_enricher')
+
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
         try:
-            # Resetar tarefas que estavam 'enriquecendo' caso o script tenha parado
-            reset_query = db.collection(TAREFAS_COLLECTION_NAME).where('status', '==', 'enriquecendo').limit(10)
-            for task in await asyncio.to_thread(reset_query.stream):
-                logger.warning(f"Resetando status da tarefa {task.id} de 'enriquecendo' para '{STATUS_TO_ENRICH}'.")
-                await asyncio.to_thread(task.reference.update, {'status': STATUS_TO_ENRICH})
-
-            logger.info(f"Buscando lote de tarefas com status '{STATUS_TO_ENRICH}'...")
-            tarefas_query = db.collection(TAREFAS_COLLECTION_NAME).where('status', '==', STATUS_TO_ENRICH).limit(5)
-            tarefas_pendentes = list(await asyncio.to_thread(tarefas_query.stream))
-
-            if not tarefas_pendentes:
-                logger.info("Nenhuma tarefa para enriquecer. Aguardando 60 segundos...")
-                await asyncio.sleep(60)
-                continue
-
-            tasks_to_process = [enrich_task(db, doc) for doc in tarefas_pendentes]
-            await asyncio.gather(*tasks_to_process)
-            
-            logger.info("Lote de enriquecimento processado. Buscando o próximo...")
-            await asyncio.sleep(5)
-
-        except Exception as e:
-            logger.error(f"Erro no loop principal do enricher: {e}", exc_info=True)
-            await asyncio.sleep(60)
+            loop.add_signal_handler(sinal, pool.parar)
+        except NotImplementedError:
+            pass
+
+    supervisor = None
+    if modo == 'listener':
+        # O AsyncClient não oferece on_snapshot: o listener usa um cliente síncrono próprio.
+        db_listener = firestore.Client(project=PROJECT_ID)
+        query_analisadas = db_listener.collection(TAREFAS_COLLECTION_NAME).where('status', '==', STATUS_TO_ENRICH)
+        supervisor = asyncio.create_task(OuvinteTarefas(query_analisadas, pool, nome='lead_enricher').supervisionar())
+
+    try:
+        with extrator:
+            async with paginas:
+                await pool.executar()
+    finally:
+        if supervisor is not None:
+            supervisor.cancel()
+        if indice_cnpj is not None:
+            indice_cnpj.fechar()
+        await fechar_backend_busca()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker de enriquecimento de leads.")
+    parser.add_argument('--concorrencia', type=int, default=CONCORRENCIA_PADRAO,
+                        help=f"Número de tarefas enriquecidas em paralelo (padrão: {CONCORRENCIA_PADRAO}).")
+    parser.add_argument('--modo', choices=['listener', 'polling'], default='listener',
+                        help="'listener' reage a novas tarefas em tempo real (com polling de segurança); 'polling' apenas consulta periodicamente.")
+    args = parser.parse_args()
     try:
-        asyncio.run(main())
+        asyncio.run(main(concorrencia=args.concorrencia, modo=args.modo))
     except KeyboardInterrupt:
-        logger.info("Enricher interrompido pelo usuário.")
\ No newline at end of file
+        logger.info("Enricher interrompido pelo usuário.")
@@ -0,0 +1,195 @@
+# licitai/processing/llm_backends.py
+"""
+Backends de LLM usados por regex_extractor.
+O backend padrão chama o Google Gemini; o backend falso responde localmente, com
+latência, erros, 429 e JSON malformado configuráveis, para testes e benchmarks
+sem consumir cota. A escolha é feita pela variável LICITAI_LLM_BACKEND ('gemini' ou 'falso').
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import re
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Resposta normalizada de qualquer backend.
+RespostaLLM = namedtuple('RespostaLLM', ['text', 'modelo', 'tokens_prompt', 'tokens_resposta'])
+
+class BackendLLM(ABC):
+    """
+    Interface dos backends: gera o texto de resposta de `nome_modelo` para `prompt`.
+    `sistema` é a instrução de sistema estática e `esquema`, quando informado, o esquema JSON da resposta.
+    """
+
+    @abstractmethod
+    async def gerar(self, nome_modelo: str, prompt: str, sistema: str | None = None, esquema: dict | None = None) -> RespostaLLM:
+        ...
+
+class BackendGemini(BackendLLM):
+    """Backend real: Google Gemini, com handles de modelo reutilizáveis."""
+
+    def __init__(self, api_key: str):
+        import google.generativeai as genai
+        self._genai = genai
+        self._genai.configure(api_key=api_key)
+        self.api_key = api_key
+        self._modelos = {}
+
+    def obter_modelo(self, nome_modelo: str, sistema: str | None = None):
+        """Retorna um GenerativeModel reutilizável para `nome_modelo` com a instrução de sistema `sistema`."""
+        chave = (nome_modelo, sistema)
+        if chave not in self._modelos:
+            self._modelos[chave] = self._genai.GenerativeModel(nome_modelo, system_instruction=sistema)
+        return self._modelos[chave]
+
+    async def gerar(self, nome_modelo: str, prompt: str, sistema: str | None = None, esquema: dict | None = None) -> RespostaLLM:
+        generation_config = None
+        if esquema is not None:
+            generation_config = self._genai.GenerationConfig(response_mime_type="application/json", response_schema=esquema)
+        response = await self.obter_modelo(nome_modelo, sistema).generate_content_async(prompt, generation_config=generation_config)
+        uso = getattr(response, 'usage_metadata', None)
+        return RespostaLLM(
+            text=response.text,
+            modelo=nome_modelo,
+            tokens_prompt=getattr(uso, 'prompt_token_count', None),
+            tokens_resposta=getattr(uso, 'candidates_token_count', None)
+        )
+
+class ErroQuotaSimulado(Exception):
+    """Erro 429 injetado pelo backend falso (reconhecido pelo limitador pelo `code`, como os da API)."""
+    code = 429
+
+class ErroAPISimulado(Exception):
+    """Erro genérico de API injetado pelo backend falso."""
+
+# Palavras que o backend falso usa para escolher um gatilho plausível.
+_GATILHOS_FALSOS = [
+    (('renovação', 'renovacao', 'subscrição', 'expiração', 'atualização'), 'Renovação/Expiração de Licença de Software'),
+    (('computador', 'notebook', 'servidor', 'desktop', 'microcomputador', 'equipamento'), 'Compra de Hardware'),
+    (('licença', 'licenca', 'software', 'office'), 'Nova Aquisição de Software'),
+    (('serviço', 'servico', 'suporte', 'consultoria', 'desenvolvimento', 'outsourcing'), 'Serviços de TI'),
+]
+
+class BackendFalso(BackendLLM):
+    """
+    Backend local que imita o Gemini sem chamadas externas.
+    A latência segue uma distribuição log-normal com a média e o desvio informados;
+    cada chamada pode falhar com erro genérico, 429 ou devolver JSON malformado.
+    """
+
+    def __init__(self, latencia_media: float = 1.0, latencia_desvio: float = 0.3, taxa_erro: float = 0.0,
+                 taxa_429: float = 0.0, taxa_json_malformado: float = 0.0, confianca_media: float = 0.85,
+                 semente: int | None = None):
+        self.latencia_media = latencia_media
+        self.latencia_desvio = latencia_desvio
+        self.taxa_erro = taxa_erro
+        self.taxa_429 = taxa_429
+        self.taxa_json_malformado = taxa_json_malformado
+        self.confianca_media = confianca_media
+        self._random = random.Random(semente)
+        self.chamadas = 0
+        self.erros_injetados = 0
+        self.throttles_injetados = 0
+        self.respostas_malformadas = 0
+
+    @classmethod
+    def do_ambiente(cls):
+        """Cria o backend a partir das variáveis LICITAI_FALSO_* (úteis para rodar o worker real offline)."""
+        return cls(
+            latencia_media=float(os.getenv("LICITAI_FALSO_LATENCIA_MEDIA", "1.0")),
+            latencia_desvio=float(os.getenv("LICITAI_FALSO_LATENCIA_DESVIO", "0.3")),
+            taxa_erro=float(os.getenv("LICITAI_FALSO_TAXA_ERRO", "0")),
+            taxa_429=float(os.getenv("LICITAI_FALSO_TAXA_429", "0")),
+            taxa_json_malformado=float(os.getenv("LICITAI_FALSO_TAXA_JSON_MALFORMADO", "0"))
+        )
+
+    def _latencia(self) -> float:
+        if self.latencia_media <= 0:
+            return 0.0
+        # Parâmetros da log-normal que reproduzem a média e o desvio pedidos.
+        sigma2 = math.log(1 + (self.latencia_desvio / self.latencia_media) ** 2)
+        mu = math.log(self.latencia_media) - sigma2 / 2
+        return self._random.lognormvariate(mu, math.sqrt(sigma2))
+
+    def _analisar(self, objeto: str) -> dict:
+        texto = objeto.lower()
+        gatilho = 'Outros'
+        for termos, categoria in _GATILHOS_FALSOS:
+            if any(termo in texto for termo in termos):
+                gatilho = categoria
+                break
+        palavras = re.findall(r'\w{5,}', texto)[:10]
+        confianca = min(1.0, max(0.0, self._random.gauss(self.confianca_media, 0.15)))
+        return {"palavrasChave": palavras, "gatilhoVenda": gatilho, "confianca": round(confianca, 2)}
+
+    @staticmethod
+    def _extrair_objetos(prompt: str):
+        """Recupera do prompt a lista em lote [{id, objeto}] ou o objeto único."""
+        marcador = prompt.find('**Objetos da Compra para Análise**')
+        if marcador >= 0:
+            inicio = prompt.find('[', marcador)
+            itens, _ = json.JSONDecoder().raw_decode(prompt, inicio)
+            return itens
+        match = re.search(r'\*\*Objeto da Compra para Análise\*\*:\s*"(.*?)"\s*\n', prompt, re.DOTALL)
+        return match.group(1) if match else ''
+
+    async def gerar(self, nome_modelo: str, prompt: str, sistema: str | None = None, esquema: dict | None = None) -> RespostaLLM:
+        self.chamadas += 1
+        await asyncio.sleep(self._latencia())
+
+        sorteio = self._random.random()
+        if sorteio < self.taxa_429:
+            self.throttles_injetados += 1
+            raise ErroQuotaSimulado("429 Resource has been exhausted (e.g. check quota). [simulado]")
+        if sorteio < self.taxa_429 + self.taxa_erro:
+            self.erros_injetados += 1
+            raise ErroAPISimulado("500 Internal error encountered. [simulado]")
+
+        objetos = self._extrair_objetos(prompt)
+        if isinstance(objetos, list):
+            corpo = [{"id": item["id"], **self._analisar(item["objeto"])} for item in objetos]
+        else:
+            corpo = self._analisar(objetos)
+        texto = json.dumps(corpo, ensure_ascii=False)
+
+        if self._random.random() < self.taxa_json_malformado:
+            self.respostas_malformadas += 1
+            texto = texto[:len(texto) // 2]
+
+        tokens_prompt = len((sistema or '') + prompt) // 4
+        return RespostaLLM(text=texto, modelo=nome_modelo, tokens_prompt=tokens_prompt, tokens_resposta=len(texto) // 4)
+
+    def metricas(self) -> dict:
+        return {
+            'chamadas': self.chamadas,
+            'errosInjetados': self.erros_injetados,
+            'throttlesInjetados': self.throttles_injetados,
+            'respostasMalformadas': self.respostas_malformadas
+        }
+
+# --- Seleção do backend ---
+_backend_atual = None
+
+def definir_backend(backend: BackendLLM | None):
+    """Substitui o backend usado pelo processo (None volta à escolha pela variável de ambiente)."""
+    global _backend_atual
+    _backend_atual = backend
+
+def obter_backend(api_key: str | None) -> BackendLLM:
+    """Retorna o backend em uso, criando-o conforme LICITAI_LLM_BACKEND na primeira chamada."""
+    global _backend_atual
+    if _backend_atual is None:
+        tipo = os.getenv("LICITAI_LLM_BACKEND", "gemini").lower()
+        if tipo == 'falso':
+            logger.warning("Usando o backend de LLM FALSO (LICITAI_LLM_BACKEND=falso). Nenhuma chamada real será feita.")
+            _backend_atual = BackendFalso.do_ambiente()
+        else:
+            _backend_atual = BackendGemini(api_key)
+    elif isinstance(_backend_atual, BackendGemini) and _backend_atual.api_key != api_key:
+        _backend_atual = BackendGemini(api_key)
+    return _backend_atual
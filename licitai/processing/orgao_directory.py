@@ -0,0 +1,165 @@
+# licitai/processing/orgao_directory.py
+"""
+Diretório de contatos por órgão (coleção 'orgaos').
+As buscas do enriquecimento dependem apenas do órgão, e a mesma prefeitura aparece em
+dezenas de tarefas. O diretório guarda os contatos encontrados para cada órgão, pela
+chave do CNPJ ou, sem ele, do nome normalizado, e só repete a busca depois do prazo de
+validade. Tarefas simultâneas do mesmo órgão compartilham uma única busca em andamento.
+O mesmo documento guarda os domínios oficiais do órgão (ver orgao_domains.py), com validade própria.
+"""
+import asyncio
+import datetime
+import hashlib
+import logging
+import os
+import re
+
+from licitai.processing.analysis_cache import normalizar_objeto
+
+logger = logging.getLogger(__name__)
+
+# --- Configuração (variáveis de ambiente) ---
+ORGAOS_COLLECTION_NAME = 'orgaos'
+VALIDADE_DIAS = float(os.getenv("LICITAI_VALIDADE_ORGAOS_DIAS", "30"))
+# Buscas sem nenhum contato são refeitas antes: o site do órgão pode ter mudado.
+VALIDADE_SEM_CONTATOS_DIAS = float(os.getenv("LICITAI_VALIDADE_ORGAOS_SEM_CONTATOS_DIAS", "7"))
+# Domínios oficiais mudam raramente; sem nenhum encontrado, a descoberta é refeita como as buscas vazias.
+VALIDADE_DOMINIOS_DIAS = float(os.getenv("LICITAI_VALIDADE_DOMINIOS_DIAS", "90"))
+
+def normalizar_cnpj(cnpj) -> str | None:
+    """Apenas os 14 dígitos do CNPJ, ou None se não houver um CNPJ válido."""
+    digitos = re.sub(r'\D', '', str(cnpj or ''))
+    return digitos if len(digitos) == 14 else None
+
+def chaves_orgao(orgao_nome: str, orgao_cnpj=None) -> list:
+    """IDs dos documentos do órgão, em ordem de preferência: pelo CNPJ e pelo nome normalizado."""
+    chaves = []
+    cnpj = normalizar_cnpj(orgao_cnpj)
+    if cnpj:
+        chaves.append(f"cnpj-{cnpj}")
+    nome = normalizar_objeto(orgao_nome)
+    if nome:
+        chaves.append(f"nome-{hashlib.sha256(nome.encode('utf-8')).hexdigest()[:24]}")
+    return chaves
+
+class DiretorioOrgaos:
+    """Consulta e alimenta a coleção 'orgaos'. `db` é um `firestore.AsyncClient`."""
+
+    def __init__(self, db):
+        self._db = db
+        self._collection = db.collection(ORGAOS_COLLECTION_NAME)
+        self._em_andamento = {} # chave -> Future da busca em andamento
+        self.acertos = 0
+        self.buscas = 0
+        self.dominios_acertos = 0
+        self.dominios_descobertos = 0
+        self.compartilhadas = 0 # Consultas que aguardaram a de outra tarefa do mesmo órgão (já contadas pela origem).
+
+    async def _consultar(self, chaves: list, campo: str, campo_expiracao: str):
+        """Valor de `campo` do primeiro documento em `chaves` com `campo_expiracao` no futuro, ou None."""
+        agora = datetime.datetime.now(datetime.timezone.utc)
+        documentos = {}
+        async for snapshot in self._db.get_all([self._collection.document(chave) for chave in chaves]):
+            if snapshot.exists:
+                documentos[snapshot.id] = snapshot.to_dict()
+        for chave in chaves:
+            dados = documentos.get(chave)
+            if dados and dados.get(campo_expiracao) and dados[campo_expiracao] > agora:
+                return dados.get(campo, [])
+        return None
+
+    async def _gravar(self, chaves: list, orgao_nome: str, orgao_cnpj, campos: dict):
+        # merge=True: contatos e domínios do mesmo órgão expiram e são gravados separadamente.
+        await self._collection.document(chaves[0]).set({
+            'orgaoRazaoSocial': orgao_nome,
+            'orgaoCnpj': normalizar_cnpj(orgao_cnpj),
+            'nomeNormalizado': normalizar_objeto(orgao_nome),
+            **campos
+        }, merge=True)
+
+    async def _obter(self, campo: str, campo_expiracao: str, validade, orgao_nome: str, orgao_cnpj, buscar) -> tuple:
+        """
+        Valor de `campo` do diretório, se ainda válido, ou de `buscar()`, gravado em seguida
+        com a validade `validade(valor)` em dias. Retorna (valor, veio_do_diretorio).
+        Tarefas simultâneas do mesmo órgão aguardam a mesma consulta/busca e recebem a mesma
+        origem (uma busca compartilhada continua contando como busca).
+        """
+        chaves = chaves_orgao(orgao_nome, orgao_cnpj)
+        if not chaves:
+            return await buscar(), False
+
+        # Outra tarefa do mesmo órgão já está consultando ou buscando: aguarda o mesmo resultado.
+        chave_andamento = (campo, chaves[0])
+        em_andamento = self._em_andamento.get(chave_andamento)
+        if em_andamento is not None:
+            self.compartilhadas += 1
+            return await asyncio.shield(em_andamento)
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._em_andamento[chave_andamento] = futuro
+        try:
+            valor = await self._consultar(chaves, campo, campo_expiracao)
+            do_diretorio = valor is not None
+            if not do_diretorio:
+                valor = await buscar()
+                agora = datetime.datetime.now(datetime.timezone.utc)
+                try:
+                    await self._gravar(chaves, orgao_nome, orgao_cnpj, {
+                        campo: valor,
+                        f'{campo}AtualizadoEm': agora,
+                        campo_expiracao: agora + datetime.timedelta(days=validade(valor))
+                    })
+                except Exception as e:
+                    logger.warning(f"Falha ao gravar '{campo}' de '{orgao_nome}' no diretório de órgãos: {e}")
+            futuro.set_result((valor, do_diretorio))
+            return valor, do_diretorio
+        except asyncio.CancelledError:
+            futuro.cancel()
+            raise
+        except Exception as e:
+            futuro.set_exception(e)
+            futuro.exception() # Marca a exceção como tratada quando ninguém mais aguarda a busca.
+            raise
+        finally:
+            del self._em_andamento[chave_andamento]
+
+    async def obter_contatos(self, orgao_nome: str, orgao_cnpj, buscar) -> tuple:
+        """
+        Contatos do órgão: do diretório, se ainda válidos, ou de `buscar()` (corrotina que
+        retorna a lista de contatos), gravados em seguida no diretório.
+        Retorna (contatos, origem), com origem 'diretorio' ou 'busca'.
+        Erros da busca são propagados e nada é gravado.
+        """
+        contatos, do_diretorio = await self._obter(
+            'contatos', 'expiraEm', lambda contatos: VALIDADE_DIAS if contatos else VALIDADE_SEM_CONTATOS_DIAS,
+            orgao_nome, orgao_cnpj, buscar)
+        if do_diretorio:
+            self.acertos += 1
+        else:
+            self.buscas += 1
+        return contatos, 'diretorio' if do_diretorio else 'busca'
+
+    async def obter_dominios(self, orgao_nome: str, orgao_cnpj, descobrir) -> list:
+        """
+        Domínios oficiais do órgão: do diretório, se ainda válidos, ou de `descobrir()`
+        (corrotina que retorna a lista de domínios, ver orgao_domains.descobrir_dominios).
+        """
+        dominios, do_diretorio = await self._obter(
+            'dominios', 'dominiosExpiraEm', lambda dominios: VALIDADE_DOMINIOS_DIAS if dominios else VALIDADE_SEM_CONTATOS_DIAS,
+            orgao_nome, orgao_cnpj, descobrir)
+        if do_diretorio:
+            self.dominios_acertos += 1
+        else:
+            self.dominios_descobertos += 1
+        return dominios
+
+    def metricas(self) -> dict:
+        consultas = self.acertos + self.buscas
+        return {
+            'acertos': self.acertos,
+            'buscas': self.buscas,
+            'taxaAcerto': self.acertos / consultas if consultas else 0.0,
+            'dominiosAcertos': self.dominios_acertos,
+            'dominiosDescobertos': self.dominios_descobertos,
+            'compartilhadas': self.compartilhadas
+        }
@@ -0,0 +1,113 @@
+# licitai/processing/orgao_domains.py
+"""
+Descoberta dos domínios oficiais de um órgão (ex: "itu.sp.gov.br", "camaraitu.sp.leg.br").
+Com os domínios conhecidos, o enriquecimento troca as buscas genéricas por uma única
+busca restrita ao site do órgão (`site:`), e só baixa páginas desses domínios.
+A descoberta custa uma busca pelo nome do órgão e o resultado fica guardado no diretório
+de órgãos (ver orgao_directory.py), com validade longa.
+"""
+import logging
+from collections import Counter
+from urllib.parse import urlsplit
+
+from google_search import ErroBuscaIncompleta, search_async
+from licitai.processing.analysis_cache import normalizar_objeto
+
+logger = logging.getLogger(__name__)
+
+# --- Constantes ---
+MAX_DOMINIOS = 2
+SUFIXOS_OFICIAIS = ('.gov.br', '.leg.br', '.jus.br', '.mp.br', '.def.br', '.mil.br')
+# Portais que publicam dados de muitos órgãos: nunca são o site de um órgão específico.
+DOMINIOS_GENERICOS = frozenset({
+    'gov.br', 'pncp.gov.br', 'portaldatransparencia.gov.br', 'comprasnet.gov.br', 'compras.gov.br',
+    'ibge.gov.br', 'cidades.ibge.gov.br', 'in.gov.br', 'planalto.gov.br', 'transparencia.gov.br',
+})
+UFS = frozenset({
+    'ac', 'al', 'ap', 'am', 'ba', 'ce', 'df', 'es', 'go', 'ma', 'mt', 'ms', 'mg', 'pa',
+    'pb', 'pr', 'pe', 'pi', 'rj', 'rn', 'rs', 'ro', 'rr', 'sc', 'sp', 'se', 'to',
+})
+PALAVRAS_IGNORADAS = frozenset({'de', 'da', 'do', 'das', 'dos', 'e'})
+# Palavras que costumam ficar de fora das siglas (ex: "Tribunal de Justiça do Estado de São Paulo" -> "tjsp").
+PALAVRAS_FORA_DA_SIGLA = frozenset({'estado', 'municipal', 'municipio'})
+TAMANHO_MINIMO_SIGLA = 3
+
+def dominio_de_url(url: str) -> str | None:
+    """Host da URL em minúsculas, sem o prefixo 'www.'."""
+    host = (urlsplit(url).hostname or '').lower().rstrip('.')
+    return host.removeprefix('www.') or None
+
+def _palavras(texto: str) -> list:
+    return [p for p in normalizar_objeto(texto).split() if p not in PALAVRAS_IGNORADAS]
+
+def _slug(texto: str) -> str:
+    return ''.join(_palavras(texto))
+
+def _siglas(orgao_nome: str) -> set:
+    """Siglas plausíveis do órgão, com e sem as palavras que costumam ficar de fora (ex: {"tcesp", "tcsp"})."""
+    palavras = _palavras(orgao_nome)
+    siglas = {''.join(p[0] for p in palavras),
+              ''.join(p[0] for p in palavras if p not in PALAVRAS_FORA_DA_SIGLA)}
+    return {sigla for sigla in siglas if len(sigla) >= TAMANHO_MINIMO_SIGLA}
+
+def _rotulos_oficiais(dominio: str) -> list | None:
+    """Rótulos do host antes do sufixo oficial, sem hífens ("camara-itu.sp.leg.br" -> ["camaraitu", "sp"]); None se não for oficial."""
+    for sufixo in SUFIXOS_OFICIAIS:
+        if dominio.endswith(sufixo):
+            return [rotulo.replace('-', '') for rotulo in dominio[:-len(sufixo)].split('.') if rotulo]
+    return None
+
+def eh_dominio_do_orgao(dominio: str, municipio_nome: str = '', orgao_nome: str = '', uf_sigla: str = '') -> bool:
+    """
+    Indica se o domínio pode ser o site oficial do órgão. Domínios de governo (.gov.br,
+    .leg.br, ...) precisam identificar o órgão: um rótulo que seja o nome do município ou
+    termine nele (ex: "itu.sp.gov.br", "camaraitu.sp.leg.br") ou a sigla do órgão (ex:
+    "tjsp.jus.br"), e, se tiverem um rótulo de UF, ele deve ser o do órgão. Assim, sites
+    estaduais ("sp.gov.br", "tce.sp.gov.br") e de municípios vizinhos ("itupeva.sp.gov.br")
+    não são tomados pelo site de uma prefeitura. Fora deles, só um site com o nome do
+    município no host (ex: "prefeituradeitu.com.br").
+    """
+    if not dominio or dominio in DOMINIOS_GENERICOS:
+        return False
+    municipio = _slug(municipio_nome)
+    rotulos = _rotulos_oficiais(dominio)
+    if rotulos is None:
+        return len(municipio) >= 4 and municipio in dominio.replace('-', '').replace('.', '')
+    uf = normalizar_objeto(uf_sigla)
+    if uf and any(len(rotulo) == 2 and rotulo in UFS and rotulo != uf for rotulo in rotulos):
+        return False
+    if len(municipio) >= TAMANHO_MINIMO_SIGLA and any(rotulo.endswith(municipio) for rotulo in rotulos):
+        return True
+    siglas = _siglas(orgao_nome)
+    return bool(siglas) and (''.join(rotulos) in siglas or any(rotulo in siglas for rotulo in rotulos))
+
+def filtro_site(dominios: list) -> str:
+    """Operador de busca que restringe os resultados aos domínios: "site:a" ou "(site:a OR site:b)"."""
+    termos = [f"site:{dominio}" for dominio in dominios]
+    return termos[0] if len(termos) == 1 else f"({' OR '.join(termos)})"
+
+def pertence_aos_dominios(url: str, dominios: list) -> bool:
+    """Indica se a URL está em um dos domínios ou em seus subdomínios."""
+    host = dominio_de_url(url) or ''
+    return any(host == dominio or host.endswith('.' + dominio) for dominio in dominios)
+
+async def descobrir_dominios(orgao_nome: str, municipio_nome: str = '', uf_sigla: str = '') -> list:
+    """
+    Domínios oficiais do órgão, do mais provável ao menos provável (no máximo MAX_DOMINIOS):
+    os mais frequentes entre os resultados de uma busca pelo nome do órgão. Lista vazia se nada for encontrado;
+    se a busca falhar, lança ErroBuscaIncompleta (a lista vazia ficaria guardada no diretório de órgãos).
+    """
+    query = f'"{orgao_nome}" {municipio_nome} {uf_sigla} site oficial'.strip()
+    resultados = await search_async([query], num_results=10)
+    contagem = Counter()
+    for result_set in resultados:
+        for res in result_set.results or []:
+            dominio = dominio_de_url(res.url)
+            if eh_dominio_do_orgao(dominio, municipio_nome, orgao_nome, uf_sigla):
+                contagem[dominio] += 1
+    dominios = [dominio for dominio, _ in contagem.most_common(MAX_DOMINIOS)]
+    erros = [result_set.erro for result_set in resultados if result_set.erro]
+    if not dominios and erros:
+        raise ErroBuscaIncompleta(f"Falha na descoberta dos domínios de '{orgao_nome}': {erros[0]}")
+    logger.info(f"Domínios de '{orgao_nome}': {dominios or 'nenhum encontrado'}.")
+    return dominios
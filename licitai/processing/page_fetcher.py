@@ -0,0 +1,198 @@
+# licitai/processing/page_fetcher.py
+"""
+Download concorrente das páginas dos resultados de busca, para a extração de contatos.
+Uma única sessão aiohttp limita as conexões no total e por domínio, e cada domínio
+recebe no máximo uma requisição a cada `intervalo_dominio` segundos. As respostas são
+lidas em blocos, decodificadas de forma incremental e truncadas em `tamanho_maximo`;
+PDFs são mantidos em bytes (o texto é extraído com os contatos, ver contact_extractor.py)
+e descartados acima de TAMANHO_MAXIMO_PDF, já que um PDF truncado não pode ser lido.
+As páginas ficam num cache em disco: dentro da validade são usadas diretamente e,
+depois dela, revalidadas com ETag/Last-Modified (um 304 reaproveita o conteúdo).
+"""
+import asyncio
+import codecs
+import datetime
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# --- Configuração (variáveis de ambiente) ---
+DIRETORIO_CACHE_PADRAO = os.getenv("LICITAI_CACHE_PAGINAS", os.path.join("cache", "paginas"))
+LIMITE_CONEXOES = 20
+LIMITE_POR_DOMINIO = 2
+INTERVALO_DOMINIO = 1.0 # Segundos entre requisições ao mesmo domínio.
+TAMANHO_MAXIMO = 2 * 1024 * 1024 # Bytes lidos por página; o restante é descartado.
+TAMANHO_BLOCO = 64 * 1024
+TIMEOUT_SEGUNDOS = 20
+VALIDADE_CACHE_HORAS = float(os.getenv("LICITAI_VALIDADE_CACHE_PAGINAS_HORAS", "24"))
+TAMANHO_MAXIMO_PDF = 10 * 1024 * 1024
+TIPO_PDF = 'application/pdf'
+TIPOS_ACEITOS = ('text/html', 'application/xhtml+xml', 'text/plain', TIPO_PDF)
+USER_AGENT = "Mozilla/5.0 (compatible; LicitAI/1.0; +https://pncp.gov.br)"
+
+# Página obtida: URL final, conteúdo (texto decodificado ou, para PDFs, os bytes) e origem ('rede', 'cache' ou 'revalidada').
+PaginaObtida = namedtuple('PaginaObtida', ['url', 'conteudo', 'origem'])
+
+class BuscadorPaginas:
+    """
+    Baixa páginas com limites por domínio e cache em disco. Use como gerenciador de contexto
+    assíncrono (`async with BuscadorPaginas() as paginas:`), compartilhado por todo o worker.
+    """
+
+    def __init__(self, diretorio_cache: str = DIRETORIO_CACHE_PADRAO, limite_conexoes: int = LIMITE_CONEXOES,
+                 limite_por_dominio: int = LIMITE_POR_DOMINIO, intervalo_dominio: float = INTERVALO_DOMINIO,
+                 tamanho_maximo: int = TAMANHO_MAXIMO):
+        self._diretorio = Path(diretorio_cache)
+        self._limite_conexoes = limite_conexoes
+        self._limite_por_dominio = limite_por_dominio
+        self._intervalo_dominio = intervalo_dominio
+        self._tamanho_maximo = tamanho_maximo
+        self._sessao = None
+        self._travas_dominio = {}
+        self._ultimo_acesso = {}
+        self.contadores = {'rede': 0, 'cache': 0, 'revalidada': 0, 'falhas': 0, 'truncadas': 0}
+
+    async def __aenter__(self):
+        self._diretorio.mkdir(parents=True, exist_ok=True)
+        conector = aiohttp.TCPConnector(limit=self._limite_conexoes, limit_per_host=self._limite_por_dominio)
+        self._sessao = aiohttp.ClientSession(
+            connector=conector, timeout=aiohttp.ClientTimeout(total=TIMEOUT_SEGUNDOS),
+            headers={'User-Agent': USER_AGENT, 'Accept': 'text/html,application/xhtml+xml,text/plain;q=0.9,application/pdf;q=0.8'}
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._sessao.close()
+
+    # --- Cache em disco ---
+    def _caminhos(self, url: str) -> tuple:
+        nome = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return self._diretorio / f"{nome}.json", self._diretorio / f"{nome}.txt"
+
+    def _ler_cache(self, url: str):
+        caminho_meta, caminho_texto = self._caminhos(url)
+        try:
+            meta = json.loads(caminho_meta.read_text(encoding='utf-8'))
+            if meta.get('pdf'):
+                return meta, caminho_texto.read_bytes()
+            return meta, caminho_texto.read_text(encoding='utf-8')
+        except (OSError, ValueError):
+            return None, None
+
+    def _gravar_cache(self, url: str, meta: dict, conteudo: str | bytes | None = None):
+        caminho_meta, caminho_texto = self._caminhos(url)
+        if isinstance(conteudo, bytes):
+            caminho_texto.write_bytes(conteudo)
+        elif conteudo is not None:
+            caminho_texto.write_text(conteudo, encoding='utf-8')
+        caminho_meta.write_text(json.dumps(meta), encoding='utf-8')
+
+    # --- Rede ---
+    async def _aguardar_vez(self, dominio: str):
+        """Garante o intervalo mínimo entre requisições ao mesmo domínio."""
+        trava = self._travas_dominio.setdefault(dominio, asyncio.Lock())
+        async with trava:
+            espera = self._ultimo_acesso.get(dominio, 0.0) + self._intervalo_dominio - time.monotonic()
+            if espera > 0:
+                await asyncio.sleep(espera)
+            self._ultimo_acesso[dominio] = time.monotonic()
+
+    async def _ler_texto(self, resposta) -> str:
+        """Lê o corpo em blocos, decodificando de forma incremental até o tamanho máximo."""
+        charset = resposta.charset or 'utf-8'
+        try:
+            decodificador = codecs.getincrementaldecoder(charset)(errors='replace')
+        except LookupError:
+            decodificador = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        partes = []
+        lidos = 0
+        async for bloco in resposta.content.iter_chunked(TAMANHO_BLOCO):
+            restante = self._tamanho_maximo - lidos
+            partes.append(decodificador.decode(bloco[:restante]))
+            lidos += len(bloco)
+            if lidos >= self._tamanho_maximo:
+                self.contadores['truncadas'] += 1
+                break
+        partes.append(decodificador.decode(b'', final=True))
+        return ''.join(partes)
+
+    async def _ler_pdf(self, resposta) -> bytes | None:
+        """Lê o PDF inteiro em blocos; None se passar de TAMANHO_MAXIMO_PDF (um PDF truncado não pode ser lido)."""
+        partes = []
+        lidos = 0
+        async for bloco in resposta.content.iter_chunked(TAMANHO_BLOCO):
+            lidos += len(bloco)
+            if lidos > TAMANHO_MAXIMO_PDF:
+                self.contadores['truncadas'] += 1
+                return None
+            partes.append(bloco)
+        return b''.join(partes)
+
+    async def obter(self, url: str) -> PaginaObtida | None:
+        """Retorna a página (do cache ou da rede) ou None se não for possível obtê-la como texto ou PDF."""
+        meta, conteudo_cache = await asyncio.to_thread(self._ler_cache, url)
+        agora = datetime.datetime.now(datetime.timezone.utc)
+        if meta is not None:
+            obtida_em = datetime.datetime.fromisoformat(meta['obtidoEm'])
+            if agora - obtida_em < datetime.timedelta(hours=VALIDADE_CACHE_HORAS):
+                self.contadores['cache'] += 1
+                return PaginaObtida(meta.get('urlFinal', url), conteudo_cache, 'cache')
+
+        cabecalhos = {}
+        if meta is not None:
+            if meta.get('etag'):
+                cabecalhos['If-None-Match'] = meta['etag']
+            if meta.get('lastModified'):
+                cabecalhos['If-Modified-Since'] = meta['lastModified']
+
+        await self._aguardar_vez(urlsplit(url).hostname or '')
+        try:
+            async with self._sessao.get(url, headers=cabecalhos, allow_redirects=True) as resposta:
+                if resposta.status == 304 and meta is not None:
+                    meta['obtidoEm'] = agora.isoformat()
+                    await asyncio.to_thread(self._gravar_cache, url, meta)
+                    self.contadores['revalidada'] += 1
+                    return PaginaObtida(meta.get('urlFinal', url), conteudo_cache, 'revalidada')
+                if resposta.status != 200 or resposta.content_type not in TIPOS_ACEITOS:
+                    logger.debug(f"Página ignorada ({resposta.status}, {resposta.content_type}): {url}")
+                    self.contadores['falhas'] += 1
+                    return None
+                eh_pdf = resposta.content_type == TIPO_PDF
+                conteudo = await (self._ler_pdf(resposta) if eh_pdf else self._ler_texto(resposta))
+                if conteudo is None:
+                    logger.debug(f"PDF acima de {TAMANHO_MAXIMO_PDF} bytes ignorado: {url}")
+                    self.contadores['falhas'] += 1
+                    return None
+                meta = {
+                    'url': url,
+                    'urlFinal': str(resposta.url),
+                    'etag': resposta.headers.get('ETag'),
+                    'lastModified': resposta.headers.get('Last-Modified'),
+                    'obtidoEm': agora.isoformat(),
+                    'pdf': eh_pdf
+                }
+        except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeError) as e:
+            logger.debug(f"Falha ao baixar {url}: {e}")
+            self.contadores['falhas'] += 1
+            return None
+
+        await asyncio.to_thread(self._gravar_cache, url, meta, conteudo)
+        self.contadores['rede'] += 1
+        return PaginaObtida(meta['urlFinal'], conteudo, 'rede')
+
+    async def obter_varias(self, urls: list) -> list:
+        """Baixa as URLs concorrentemente; retorna apenas as páginas obtidas, na ordem das URLs."""
+        paginas = await asyncio.gather(*(self.obter(url) for url in dict.fromkeys(urls)))
+        return [pagina for pagina in paginas if pagina is not None]
+
+    def metricas(self) -> dict:
+        return dict(self.contadores)
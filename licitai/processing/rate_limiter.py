@@ -0,0 +1,187 @@
+# licitai/processing/rate_limiter.py
+"""
+Limitador de taxa adaptativo para as chamadas ao Gemini.
+Respeita as cotas de requisições/minuto e tokens/minuto no lado do cliente e
+ajusta o número de chamadas simultâneas por AIMD (aumento aditivo, redução
+multiplicativa) conforme os erros 429 e a latência observados. Cada chamada reserva
+a estimativa do prompt e, ao terminar, acerta a cota de tokens pelo uso real
+informado pela API (prompt e resposta).
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# --- Configuração (variáveis de ambiente) ---
+REQUISICOES_POR_MINUTO = int(os.getenv("GEMINI_RPM", "60"))
+TOKENS_POR_MINUTO = int(os.getenv("GEMINI_TPM", "1000000"))
+CONCORRENCIA_MAXIMA = int(os.getenv("GEMINI_CONCORRENCIA_MAXIMA", "16"))
+LATENCIA_ALVO_SEGUNDOS = float(os.getenv("GEMINI_LATENCIA_ALVO", "20"))
+MAX_TENTATIVAS_QUOTA = int(os.getenv("GEMINI_MAX_TENTATIVAS_QUOTA", "5"))
+
+class ErroQuotaIA(Exception):
+    """A cota da API continuou esgotada após todas as retentativas; a tarefa deve voltar para a fila."""
+
+def eh_erro_de_quota(erro: Exception) -> bool:
+    """
+    Identifica erros de cota/limite de taxa (HTTP 429 / RESOURCE_EXHAUSTED) pelo tipo da
+    exceção ou pelo código de status (`code`, `status_code` ou `status`), nunca pela mensagem.
+    """
+    try:
+        from google.api_core import exceptions as google_exceptions
+        if isinstance(erro, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)):
+            return True
+    except ImportError:
+        pass
+    return any(getattr(erro, atributo, None) == 429 for atributo in ('code', 'status_code', 'status'))
+
+def estimar_tokens(texto: str) -> int:
+    """Estimativa grosseira (≈4 caracteres por token), suficiente para o controle de cota."""
+    return max(1, len(texto) // 4)
+
+class _BaldeDeTokens:
+    """Balde de tokens com reabastecimento contínuo; a capacidade é a cota de um minuto."""
+
+    def __init__(self, capacidade_por_minuto: int):
+        self.capacidade = float(capacidade_por_minuto)
+        self._disponivel = float(capacidade_por_minuto)
+        self._taxa_por_segundo = capacidade_por_minuto / 60.0
+        self._ultimo = time.monotonic()
+
+    def _reabastecer(self):
+        agora = time.monotonic()
+        self._disponivel = min(self.capacidade, self._disponivel + (agora - self._ultimo) * self._taxa_por_segundo)
+        self._ultimo = agora
+
+    def espera_necessaria(self, quantidade: float) -> float:
+        """Segundos até haver `quantidade` disponível (0 se já houver)."""
+        self._reabastecer()
+        quantidade = min(quantidade, self.capacidade)
+        if self._disponivel >= quantidade:
+            return 0.0
+        return (quantidade - self._disponivel) / self._taxa_por_segundo
+
+    def consumir(self, quantidade: float):
+        self._reabastecer()
+        self._disponivel -= min(quantidade, self.capacidade)
+
+    def ajustar(self, diferenca: float):
+        """
+        Corrige um consumo já registrado: positivo quando se gastou mais que o reservado (o saldo
+        pode ficar negativo, atrasando as próximas reservas), negativo para devolver a sobra.
+        """
+        self._reabastecer()
+        self._disponivel = min(self.capacidade, self._disponivel - diferenca)
+
+class LimitadorAdaptativo:
+    """
+    Controla cota (RPM/TPM) e concorrência das chamadas à IA.
+    O limite de chamadas simultâneas cresce em +1/limite a cada sucesso rápido,
+    é multiplicado por 0,5 a cada 429 e por 0,9 quando a latência passa do alvo.
+    """
+
+    def __init__(self, requisicoes_por_minuto: int = REQUISICOES_POR_MINUTO, tokens_por_minuto: int = TOKENS_POR_MINUTO,
+                 concorrencia_inicial: float = 2, concorrencia_minima: float = 1,
+                 concorrencia_maxima: float = CONCORRENCIA_MAXIMA, latencia_alvo: float = LATENCIA_ALVO_SEGUNDOS):
+        self._requisicoes = _BaldeDeTokens(requisicoes_por_minuto)
+        self._tokens = _BaldeDeTokens(tokens_por_minuto)
+        self.limite = float(concorrencia_inicial)
+        self._minimo = float(concorrencia_minima)
+        self._maximo = float(concorrencia_maxima)
+        self._latencia_alvo = latencia_alvo
+        self.em_voo = 0
+        self._condicao = None
+        self.total_throttles = 0
+        self.total_sucessos = 0
+
+    def _obter_condicao(self) -> asyncio.Condition:
+        # Criada sob demanda para se associar ao event loop em execução.
+        if self._condicao is None:
+            self._condicao = asyncio.Condition()
+        return self._condicao
+
+    async def adquirir(self, tokens_estimados: int):
+        """Aguarda uma vaga de concorrência e cota suficiente de requisições e tokens."""
+        condicao = self._obter_condicao()
+        async with condicao:
+            while True:
+                await condicao.wait_for(lambda: self.em_voo < int(self.limite))
+                espera = max(self._requisicoes.espera_necessaria(1), self._tokens.espera_necessaria(tokens_estimados))
+                if espera <= 0:
+                    break
+                # Libera a condição enquanto espera a cota reabastecer.
+                condicao.release()
+                try:
+                    await asyncio.sleep(espera)
+                finally:
+                    await condicao.acquire()
+            self._requisicoes.consumir(1)
+            self._tokens.consumir(tokens_estimados)
+            self.em_voo += 1
+
+    async def liberar(self, latencia: float | None = None, throttled: bool = False):
+        """Devolve a vaga e ajusta o limite de concorrência (AIMD)."""
+        condicao = self._obter_condicao()
+        async with condicao:
+            self.em_voo -= 1
+            if throttled:
+                self.total_throttles += 1
+                self.limite = max(self._minimo, self.limite * 0.5)
+                logger.warning(f"Cota da IA atingida (429). Concorrência reduzida para {int(self.limite)}.")
+            elif latencia is not None:
+                self.total_sucessos += 1
+                if latencia > self._latencia_alvo:
+                    self.limite = max(self._minimo, self.limite * 0.9)
+                else:
+                    self.limite = min(self._maximo, self.limite + 1.0 / self.limite)
+            condicao.notify_all()
+
+    def acertar_tokens(self, tokens_reservados: int, tokens_usados: int):
+        """Acerta a cota de tokens/minuto pelo uso real de uma chamada que havia reservado `tokens_reservados`."""
+        self._tokens.ajustar(tokens_usados - tokens_reservados)
+
+    async def executar(self, fabrica_chamada, tokens_estimados: int, max_tentativas: int = MAX_TENTATIVAS_QUOTA,
+                       contar_tokens=None):
+        """
+        Executa `fabrica_chamada()` (que retorna uma corrotina) respeitando o limitador.
+        Erros de cota são retentados com backoff exponencial; esgotadas as tentativas,
+        lança ErroQuotaIA. Outros erros são propagados sem retentativa.
+        Com `contar_tokens(resultado)` (tokens de prompt e resposta efetivamente usados),
+        a reserva de `tokens_estimados` é acertada pelo uso real; chamadas que falham a devolvem.
+        """
+        for tentativa in range(1, max_tentativas + 1):
+            await self.adquirir(tokens_estimados)
+            inicio = time.monotonic()
+            try:
+                resultado = await fabrica_chamada()
+            except asyncio.CancelledError:
+                await self.liberar()
+                raise
+            except Exception as e:
+                # Chamada rejeitada: a reserva de tokens volta para o balde (a cota real não foi consumida).
+                self.acertar_tokens(tokens_estimados, 0)
+                if not eh_erro_de_quota(e):
+                    await self.liberar()
+                    raise
+                await self.liberar(throttled=True)
+                if tentativa == max_tentativas:
+                    raise ErroQuotaIA(f"Cota da IA esgotada após {max_tentativas} tentativas: {e}") from e
+                espera = min(60.0, 2 ** tentativa) * random.uniform(0.5, 1.5)
+                logger.info(f"Chamada limitada pela cota (tentativa {tentativa}/{max_tentativas}). Nova tentativa em {espera:.1f}s.")
+                await asyncio.sleep(espera)
+                continue
+            await self.liberar(latencia=time.monotonic() - inicio)
+            if contar_tokens is not None:
+                self.acertar_tokens(tokens_estimados, contar_tokens(resultado))
+            return resultado
+
+    def metricas(self) -> dict:
+        return {
+            'limiteConcorrencia': int(self.limite),
+            'emVoo': self.em_voo,
+            'sucessos': self.total_sucessos,
+            'throttles': self.total_throttles
+        }
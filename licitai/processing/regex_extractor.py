@@ -1,23 +1,29 @@
 # licitai/processing/regex_extractor.py (Versão Corrigida e Completa)
 
 import logging
-import google.generativeai as genai
 import json
+import os
 import re
+import time
+from collections import namedtuple
 
-logger = logging.getLogger(__name__)
-
-# PROMPT ATUALIZADO PARA INCLUIR A ANÁLISE DE GATILHO DE VENDA
-PROMPT_ANALISE_LICITACAO = """
-Você é um assistente de análise de licitações para uma empresa de tecnologia que vende software, como "Office Professional 2021".
+from licitai.processing.rate_limiter import LimitadorAdaptativo, estimar_tokens
+from licitai.processing.llm_backends import obter_backend
 
-Sua tarefa é analisar o "objeto da compra" de uma licitação e extrair duas informações cruciais:
-1.  **Palavras-chave Relevantes**: Identifique termos técnicos, nomes de software, hardware ou serviços de TI.
-2.  **Gatilho de Venda**: Com base no objeto, classifique a principal intenção da compra. Este é o ponto mais importante.
+logger = logging.getLogger(__name__)
 
-**Objeto da Compra para Análise**:
-"{objeto_compra}"
+# Categorias aceitas para o gatilho de venda (também usadas no esquema da resposta).
+GATILHOS_VENDA = [
+    "Compra de Hardware",
+    "Renovação/Expiração de Licença de Software",
+    "Nova Aquisição de Software",
+    "Serviços de TI",
+    "Outros",
+    "Não se aplica",
+]
 
+# Instruções comuns às análises individual e em lote.
+INSTRUCOES_ANALISE = """
 **Instruções Detalhadas**:
 1.  **Palavras-chave**: Extraia até 10 palavras-chave que descrevam tecnicamente a licitação. Foque em substantivos e termos específicos.
 2.  **Gatilho de Venda**: Analise o texto e escolha **UMA** das seguintes categorias que melhor representa a oportunidade de venda:
@@ -27,17 +33,147 @@ Sua tarefa é analisar o "objeto da compra" de uma licitação e extrair duas in
     * `Serviços de TI`: A licitação é para contratar serviços como consultoria, desenvolvimento, suporte técnico, outsourcing, etc.
     * `Outros`: A licitação não se encaixa em nenhuma das categorias acima (ex: compra de material de escritório, obras, etc.).
     * `Não se aplica`: O objeto da compra é muito vago, genérico ou não relacionado a TI.
+"""
+
+# Instrução de sistema: a parte estática da análise, configurada uma vez em cada handle de modelo
+# em vez de ser repetida no corpo de toda requisição.
+SISTEMA_ANALISE = """
+Você é um assistente de análise de licitações para uma empresa de tecnologia que vende software, como "Office Professional 2021".
+
+Sua tarefa é analisar o "objeto da compra" de licitações e extrair duas informações cruciais:
+1.  **Palavras-chave Relevantes**: Identifique termos técnicos, nomes de software, hardware ou serviços de TI.
+2.  **Gatilho de Venda**: Com base no objeto, classifique a principal intenção da compra. Este é o ponto mais importante.
+""" + INSTRUCOES_ANALISE + """
+3.  **Confiança**: Informe em "confianca" um número entre 0 e 1 indicando o quanto você tem certeza da classificação (use valores baixos para objetos ambíguos).
+
+Quando receber uma lista de objetos, analise cada um de forma independente e devolva exatamente um elemento por objeto, repetindo o mesmo "id".
+Responda **APENAS** com JSON válido, sem nenhum texto adicional antes ou depois.
+"""
+
+# Corpo da requisição individual: só o que muda a cada chamada.
+PROMPT_ANALISE_LICITACAO = """
+**Objeto da Compra para Análise**:
+"{objeto_compra}"
 
-**Formato da Resposta**:
-Responda **APENAS** com um objeto JSON válido, sem nenhum texto adicional antes ou depois. Use o seguinte formato:
-```json
-{{
-  "palavrasChave": ["palavra1", "palavra2", "palavra3"],
-  "gatilhoVenda": "Categoria Escolhida"
-}}
-```
+Formato: {{"palavrasChave": ["palavra1", "palavra2"], "gatilhoVenda": "Categoria Escolhida", "confianca": 0.9}}
 """
 
+# Variante em lote: vários objetos numa única requisição, cada um identificado por um "id".
+PROMPT_ANALISE_LOTE = """
+**Objetos da Compra para Análise** (lista JSON com "id" e "objeto"):
+{objetos_json}
+
+Formato: [{{"id": "1", "palavrasChave": ["palavra1"], "gatilhoVenda": "Categoria Escolhida", "confianca": 0.9}}]
+"""
+
+# Esquemas da resposta (subconjunto OpenAPI aceito pelo Gemini). Com eles o modelo devolve JSON
+# já no formato esperado; clean_json_response fica apenas como salvaguarda.
+_PROPRIEDADES_ANALISE = {
+    "palavrasChave": {"type": "ARRAY", "items": {"type": "STRING"}},
+    "gatilhoVenda": {"type": "STRING", "format": "enum", "enum": GATILHOS_VENDA},
+    "confianca": {"type": "NUMBER"},
+}
+ESQUEMA_ANALISE = {
+    "type": "OBJECT",
+    "properties": _PROPRIEDADES_ANALISE,
+    "required": ["palavrasChave", "gatilhoVenda", "confianca"],
+}
+ESQUEMA_ANALISE_LOTE = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {"id": {"type": "STRING"}, **_PROPRIEDADES_ANALISE},
+        "required": ["id", "palavrasChave", "gatilhoVenda", "confianca"],
+    },
+}
+
+# Cascata de modelos, do mais rápido/barato ao mais capaz. Respostas com confiança abaixo
+# do limiar (ou fora do esquema) sobem para o próximo modelo. Alterar a cascata ou o limiar
+# invalida o cache de análises (ver analysis_cache.py).
+MODELOS_CASCATA = [m.strip() for m in os.getenv("GEMINI_MODELOS_CASCATA", "gemini-1.5-flash-latest,gemini-1.5-pro-latest").split(",") if m.strip()]
+LIMIAR_CONFIANCA = float(os.getenv("GEMINI_LIMIAR_CONFIANCA", "0.7"))
+MODELO_IA = MODELOS_CASCATA[-1] # Modelo final da cascata.
+
+# Limitador compartilhado por todas as chamadas ao Gemini deste processo.
+limitador = LimitadorAdaptativo()
+
+# Quantidade máxima de objetos enviados numa mesma requisição em lote.
+TAMANHO_MAXIMO_LOTE = 10
+
+# Limites (em segundos) das faixas do histograma de latência publicado em 'metricasIA'.
+FAIXAS_LATENCIA = [0.5, 1, 2, 5, 10, 20, 40, 80]
+
+def faixa_latencia(latencia: float) -> str:
+    """Rótulo da faixa do histograma (limite superior em milissegundos, ou 'mais')."""
+    for limite in FAIXAS_LATENCIA:
+        if latencia <= limite:
+            return str(int(limite * 1000))
+    return 'mais'
+
+# --- Métricas da cascata ---
+class MetricasCascata:
+    """
+    Latência por camada da cascata e proporção de itens escalados para a camada seguinte.
+    Também acumula, desde a última publicação, os totais de tokens, latência e retentativas
+    por modelo e as tarefas concluídas por origem (ver ai_metrics.py).
+    """
+
+    def __init__(self, janela: int = 500):
+        self._janela = janela
+        self._camadas = {}
+        self._pendentes_modelos = {}
+        self._pendentes_tarefas = {}
+
+    def _camada(self, modelo: str) -> dict:
+        return self._camadas.setdefault(modelo, {'chamadas': 0, 'itens': 0, 'escalados': 0, 'latencias': []})
+
+    def registrar_chamada(self, modelo: str, latencia: float, itens: int, escalados: int,
+                          tokens_prompt: int = 0, tokens_resposta: int = 0, retentativas: int = 0):
+        camada = self._camada(modelo)
+        camada['chamadas'] += 1
+        camada['itens'] += itens
+        camada['escalados'] += escalados
+        camada['latencias'].append(latencia)
+        del camada['latencias'][:-self._janela]
+
+        pendente = self._pendentes_modelos.setdefault(modelo, {
+            'chamadas': 0, 'itens': 0, 'tokensPrompt': 0, 'tokensResposta': 0,
+            'retentativas': 0, 'latenciaSomaSeg': 0.0, 'histogramaLatencia': {}
+        })
+        pendente['chamadas'] += 1
+        pendente['itens'] += itens
+        pendente['tokensPrompt'] += tokens_prompt
+        pendente['tokensResposta'] += tokens_resposta
+        pendente['retentativas'] += retentativas
+        pendente['latenciaSomaSeg'] += latencia
+        faixa = faixa_latencia(latencia)
+        pendente['histogramaLatencia'][faixa] = pendente['histogramaLatencia'].get(faixa, 0) + 1
+
+    def registrar_tarefa(self, origem: str):
+        """Conta uma tarefa concluída pela IA ('ia') ou pelo cache ('cache')."""
+        self._pendentes_tarefas[origem] = self._pendentes_tarefas.get(origem, 0) + 1
+
+    def retirar_pendentes(self) -> tuple:
+        """Retorna (totais por modelo, tarefas por origem) acumulados desde a última chamada e zera os acumuladores."""
+        pendentes = (self._pendentes_modelos, self._pendentes_tarefas)
+        self._pendentes_modelos, self._pendentes_tarefas = {}, {}
+        return pendentes
+
+    def resumo(self) -> dict:
+        resumo = {}
+        for modelo, camada in self._camadas.items():
+            latencias = sorted(camada['latencias'])
+            resumo[modelo] = {
+                'chamadas': camada['chamadas'],
+                'itens': camada['itens'],
+                'taxaEscalonamento': camada['escalados'] / camada['itens'] if camada['itens'] else 0.0,
+                'latenciaMediaSeg': sum(latencias) / len(latencias) if latencias else 0.0,
+                'latenciaP95Seg': latencias[int(0.95 * (len(latencias) - 1))] if latencias else 0.0
+            }
+        return resumo
+
+metricas_cascata = MetricasCascata()
+
 def clean_json_response(text: str) -> str:
     """Tenta limpar a resposta da IA para extrair um JSON válido."""
     match = re.search(r'\{.*\}', text, re.DOTALL)
@@ -45,35 +181,253 @@ def clean_json_response(text: str) -> str:
         return match.group(0)
     return text  # Retorna o texto original se nenhum JSON for encontrado
 
+def clean_json_array_response(text: str) -> str:
+    """Tenta limpar a resposta da IA para extrair um array JSON válido."""
+    match = re.search(r'\[.*\]', text, re.DOTALL)
+    if match:
+        return match.group(0)
+    return text
+
+def _decodificar_json(texto: str, limpar):
+    """Decodifica a resposta estruturada; se vier com texto extra, recorre à função de limpeza."""
+    try:
+        return json.loads(texto)
+    except (json.JSONDecodeError, ValueError):
+        return json.loads(limpar(texto))
+
+def _validar_resultado(item) -> dict | None:
+    """Valida uma análise retornada pela IA. Retorna o resultado normalizado ou None."""
+    if not isinstance(item, dict):
+        return None
+    palavras_chave = item.get("palavrasChave")
+    gatilho_venda = item.get("gatilhoVenda")
+    if not isinstance(palavras_chave, list) or not all(isinstance(p, str) for p in palavras_chave):
+        return None
+    if not isinstance(gatilho_venda, str) or not gatilho_venda.strip():
+        return None
+    try:
+        confianca = min(1.0, max(0.0, float(item.get("confianca"))))
+    except (TypeError, ValueError):
+        confianca = None
+    return {"palavrasChave": palavras_chave, "gatilhoVenda": gatilho_venda.strip(), "confianca": confianca}
+
+def _aceitavel(resultado: dict | None, ultima_camada: bool) -> bool:
+    """Na última camada qualquer resposta válida é aceita; nas demais, só as confiantes."""
+    if resultado is None:
+        return False
+    if ultima_camada:
+        return True
+    return resultado["confianca"] is not None and resultado["confianca"] >= LIMIAR_CONFIANCA
+
+# Resultado de uma chamada ao modelo: a resposta, a latência da chamada bem-sucedida (sem as
+# esperas do limitador), as retentativas por cota e os tokens informados pela API (ou estimados).
+ChamadaIA = namedtuple('ChamadaIA', ['resposta', 'latencia', 'retentativas', 'tokens_prompt', 'tokens_resposta'])
+
+async def _gerar(nome_modelo: str, prompt: str, api_key: str, esquema: dict) -> ChamadaIA:
+    """Chama o modelo (pelo backend configurado) através do limitador."""
+    backend = obter_backend(api_key)
+    tokens_estimados = estimar_tokens(SISTEMA_ANALISE + prompt)
+    tentativas = 0
+    inicio_chamada = time.monotonic()
+
+    def chamar():
+        nonlocal tentativas, inicio_chamada
+        tentativas += 1
+        inicio_chamada = time.monotonic()
+        return backend.gerar(nome_modelo, prompt, sistema=SISTEMA_ANALISE, esquema=esquema)
+
+    def tokens_usados(response) -> tuple:
+        # Uso informado pela API (usage_metadata) ou, na falta dele, estimado.
+        return (getattr(response, 'tokens_prompt', None) or tokens_estimados,
+                getattr(response, 'tokens_resposta', None) or estimar_tokens(response.text))
+
+    response = await limitador.executar(chamar, tokens_estimados, contar_tokens=lambda r: sum(tokens_usados(r)))
+    latencia = time.monotonic() - inicio_chamada
+    tokens_prompt, tokens_resposta = tokens_usados(response)
+    return ChamadaIA(
+        resposta=response,
+        latencia=latencia,
+        retentativas=tentativas - 1,
+        tokens_prompt=tokens_prompt,
+        tokens_resposta=tokens_resposta
+    )
+
+def _novo_uso() -> dict:
+    return {'chamadasIA': 0, 'tokensPrompt': 0.0, 'tokensResposta': 0.0, 'latenciaIASeg': 0.0, 'retentativas': 0}
+
+def _somar_uso(uso: dict, chamada: ChamadaIA, itens_na_chamada: int = 1):
+    """Soma ao uso de um item a sua parte da chamada (tokens rateados entre os itens do lote)."""
+    uso['chamadasIA'] += 1
+    uso['tokensPrompt'] += chamada.tokens_prompt / itens_na_chamada
+    uso['tokensResposta'] += chamada.tokens_resposta / itens_na_chamada
+    uso['latenciaIASeg'] += chamada.latencia
+    uso['retentativas'] += chamada.retentativas
+
+def _finalizar_uso(uso: dict) -> dict:
+    return {**uso, 'tokensPrompt': round(uso['tokensPrompt']), 'tokensResposta': round(uso['tokensResposta']),
+            'latenciaIASeg': round(uso['latenciaIASeg'], 3)}
+
+def _registrar_metricas_chamada(nome_modelo: str, chamada: ChamadaIA, itens: int, escalados: int):
+    metricas_cascata.registrar_chamada(nome_modelo, chamada.latencia, itens=itens, escalados=escalados,
+                                       tokens_prompt=chamada.tokens_prompt, tokens_resposta=chamada.tokens_resposta,
+                                       retentativas=chamada.retentativas)
+
 async def analisar_objeto_com_ia(objeto_compra: str, api_key: str) -> dict:
     """
-    Usa a API do Google Gemini para analisar o objeto da compra.
-    Retorna um dicionário com as palavras-chave e o gatilho de venda.
+    Usa o LLM configurado (Google Gemini por padrão) para analisar o objeto da compra, percorrendo a cascata
+    de modelos até obter uma resposta confiante.
+    Retorna um dicionário com as palavras-chave, o gatilho de venda, a confiança, o modelo e,
+    em "uso", os tokens, a latência e as retentativas somados em todas as camadas percorridas.
     """
     if not objeto_compra:
         logger.warning("Objeto da compra está vazio. Retornando análise vazia.")
         return {"palavrasChave": [], "gatilhoVenda": "Não informado"}
 
+    prompt = PROMPT_ANALISE_LICITACAO.format(objeto_compra=objeto_compra)
+    uso = _novo_uso()
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-1.5-pro-latest')
-        
-        prompt = PROMPT_ANALISE_LICITACAO.format(objeto_compra=objeto_compra)
-        
-        response = await model.generate_content_async(prompt)
-        
-        cleaned_text = clean_json_response(response.text)
-        
-        analysis_result = json.loads(cleaned_text)
-        
-        if "palavrasChave" not in analysis_result:
-            analysis_result["palavrasChave"] = []
-        if "gatilhoVenda" not in analysis_result:
-            analysis_result["gatilhoVenda"] = "Não informado pela IA"
-            
-        return analysis_result
+        for indice, nome_modelo in enumerate(MODELOS_CASCATA):
+            ultima_camada = indice == len(MODELOS_CASCATA) - 1
+            chamada = await _gerar(nome_modelo, prompt, api_key, ESQUEMA_ANALISE)
+            _somar_uso(uso, chamada)
+
+            try:
+                analysis_result = _decodificar_json(chamada.resposta.text, clean_json_response)
+            except (json.JSONDecodeError, ValueError):
+                if ultima_camada:
+                    raise
+                analysis_result = None
+
+            resultado = _validar_resultado(analysis_result)
+            aceito = _aceitavel(resultado, ultima_camada)
+            _registrar_metricas_chamada(nome_modelo, chamada, itens=1, escalados=0 if aceito else 1)
+            if aceito:
+                return {**resultado, "modelo": nome_modelo, "uso": _finalizar_uso(uso)}
+
+            if ultima_camada:
+                # Resposta fora do esquema no último modelo: completa os campos ausentes
+                # (JSON válido que não seja um objeto, como uma lista ou string, é descartado).
+                if not isinstance(analysis_result, dict):
+                    logger.warning(f"Resposta de '{nome_modelo}' não é um objeto JSON; usando a análise vazia.")
+                    analysis_result = {}
+                if "palavrasChave" not in analysis_result:
+                    analysis_result["palavrasChave"] = []
+                if "gatilhoVenda" not in analysis_result:
+                    analysis_result["gatilhoVenda"] = "Não informado pela IA"
+                return {**analysis_result, "modelo": nome_modelo, "uso": _finalizar_uso(uso)}
+
+            logger.info(f"Resposta de '{nome_modelo}' com baixa confiança ou inválida. Escalando para o próximo modelo.")
 
     except Exception as e:
         logger.error(f"Erro ao chamar a API da IA: {e}", exc_info=False) # exc_info=False para não poluir o log
         # Relança a exceção para que o worker possa tratá-la adequadamente
         raise e
+
+async def _analisar_lote_unico(nome_modelo: str, api_key: str, objetos: dict, ultima_camada: bool, uso_por_item: dict) -> dict:
+    """
+    Envia um único lote (até TAMANHO_MAXIMO_LOTE objetos) ao modelo e soma a parte de cada item
+    da chamada em `uso_por_item`.
+    Retorna {id: resultado} apenas para os itens com resposta válida e aceitável nesta camada.
+    """
+    # IDs curtos no prompt economizam tokens; o mapeamento é desfeito na volta.
+    ids_prompt = {str(i): chave for i, chave in enumerate(objetos, start=1)}
+    entrada = [{"id": id_prompt, "objeto": objetos[chave]} for id_prompt, chave in ids_prompt.items()]
+    prompt = PROMPT_ANALISE_LOTE.format(objetos_json=json.dumps(entrada, ensure_ascii=False, indent=2))
+
+    chamada = await _gerar(nome_modelo, prompt, api_key, ESQUEMA_ANALISE_LOTE)
+    for chave in objetos:
+        _somar_uso(uso_por_item[chave], chamada, itens_na_chamada=len(objetos))
+
+    resultados = {}
+    try:
+        itens = _decodificar_json(chamada.resposta.text, clean_json_array_response)
+    except (json.JSONDecodeError, ValueError) as e:
+        logger.warning(f"Resposta em lote de '{nome_modelo}' não pôde ser decodificada ({e}).")
+        itens = []
+
+    if not isinstance(itens, list):
+        logger.warning(f"Resposta em lote de '{nome_modelo}' não é um array JSON.")
+        itens = []
+
+    for item in itens:
+        id_prompt = str(item.get("id")) if isinstance(item, dict) else None
+        chave = ids_prompt.get(id_prompt)
+        if chave is None or chave in resultados:
+            continue
+        resultado = _validar_resultado(item)
+        if _aceitavel(resultado, ultima_camada):
+            resultados[chave] = {**resultado, "modelo": nome_modelo}
+
+    _registrar_metricas_chamada(nome_modelo, chamada, itens=len(objetos), escalados=len(objetos) - len(resultados))
+    return resultados
+
+async def _analisar_camada(nome_modelo: str, api_key: str, pendentes: dict, tentativas: int, ultima_camada: bool,
+                           uso_por_item: dict, erros: dict) -> dict:
+    """
+    Analisa os itens pendentes numa camada da cascata, reenviando apenas os que falharem.
+    Se a chamada de um lote falhar (ex: ErroQuotaIA), os resultados dos outros lotes são mantidos:
+    só os itens desse lote continuam pendentes, com a exceção registrada em `erros`.
+    """
+    resultados = {}
+    for tentativa in range(1, tentativas + 1):
+        chaves = [chave for chave in pendentes if chave not in resultados]
+        if not chaves:
+            break
+        if tentativa > 1:
+            logger.warning(f"Tentativa {tentativa}/{tentativas} em '{nome_modelo}': {len(chaves)} item(ns) sem resposta válida no lote.")
+        for inicio in range(0, len(chaves), TAMANHO_MAXIMO_LOTE):
+            lote = {chave: pendentes[chave] for chave in chaves[inicio:inicio + TAMANHO_MAXIMO_LOTE]}
+            try:
+                resultados_lote = await _analisar_lote_unico(nome_modelo, api_key, lote, ultima_camada, uso_por_item)
+            except Exception as e:
+                logger.error(f"Falha na chamada em lote de '{nome_modelo}' com {len(lote)} item(ns): {e}", exc_info=False)
+                erros.update(dict.fromkeys(lote, e))
+                continue
+            resultados.update(resultados_lote)
+            for chave in resultados_lote:
+                erros.pop(chave, None)
+    return resultados
+
+async def analisar_objetos_em_lote(objetos: dict, api_key: str, max_tentativas: int = 3, erros: dict | None = None) -> dict:
+    """
+    Analisa vários objetos de compra com uma requisição ao Gemini por lote, percorrendo a cascata.
+    `objetos` mapeia um identificador (ex: o ID da tarefa) ao texto do objeto.
+    Nas camadas intermediárias cada item tem uma tentativa e, se a resposta vier inválida ou com
+    baixa confiança, sobe de modelo; na última, os itens sem resposta válida voltam a ser enviados,
+    reagrupados em novos lotes com os demais pendentes, até `max_tentativas`.
+    Retorna {id: resultado}; ids que continuarem sem resposta válida ficam de fora. Cada resultado
+    analisado pela IA traz em "uso" a sua parte dos tokens (rateados no lote), a latência e as retentativas.
+    A falha da chamada de um lote não descarta os demais: com `erros`, recebe {id: exceção} dos ids
+    que ficaram de fora porque a última chamada que os incluía falhou.
+    """
+    erros = {} if erros is None else erros
+    resultados = {}
+    pendentes = {}
+    for chave, objeto_compra in objetos.items():
+        if objeto_compra:
+            pendentes[chave] = objeto_compra
+        else:
+            logger.warning(f"Objeto da compra do item '{chave}' está vazio. Retornando análise vazia.")
+            resultados[chave] = {"palavrasChave": [], "gatilhoVenda": "Não informado"}
+
+    uso_por_item = {chave: _novo_uso() for chave in pendentes}
+    try:
+        for indice, nome_modelo in enumerate(MODELOS_CASCATA):
+            if not pendentes:
+                break
+            ultima_camada = indice == len(MODELOS_CASCATA) - 1
+            tentativas = max_tentativas if ultima_camada else 1
+            resultados_camada = await _analisar_camada(nome_modelo, api_key, pendentes, tentativas, ultima_camada,
+                                                       uso_por_item, erros)
+            for chave, resultado in resultados_camada.items():
+                resultados[chave] = {**resultado, "uso": _finalizar_uso(uso_por_item[chave])}
+            for chave in resultados_camada:
+                pendentes.pop(chave, None)
+            if pendentes and not ultima_camada:
+                logger.info(f"{len(pendentes)} item(ns) escalado(s) de '{nome_modelo}' para o próximo modelo.")
+
+    except Exception as e:
+        logger.error(f"Erro ao chamar a API da IA em lote: {e}", exc_info=False)
+        raise e
+
+    return resultados
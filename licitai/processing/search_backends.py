@@ -0,0 +1,251 @@
+# licitai/processing/search_backends.py
+"""
+Backends de busca na web usados por google_search (e, por ele, pelo enriquecimento).
+O backend padrão faz scraping do Google com a biblioteca 'googlesearch-python'; o backend
+'api' usa a Custom Search JSON API do Google (com chave e ID do mecanismo de busca) e o
+backend falso responde localmente, com latência, bloqueios e contatos configuráveis ou
+com resultados fixos lidos de um arquivo JSON, para testes e benchmarks sem tocar a rede.
+A escolha é feita pela variável LICITAI_BUSCA_BACKEND ('google', 'api' ou 'falso').
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Estruturas de dados para os resultados
+SearchResult = namedtuple('SearchResult', ['url', 'title', 'snippet'])
+# `erro`: mensagem da falha, se a busca não pôde ser feita (os resultados vazios não significam "nada encontrado").
+QueryResultSet = namedtuple('QueryResultSet', ['query', 'results', 'erro'], defaults=(None,))
+
+class BackendBusca(ABC):
+    """
+    Interface dos backends: `buscar` retorna a lista de SearchResult de uma query.
+    A versão assíncrona padrão executa a síncrona numa thread; backends com cliente
+    assíncrono próprio a sobrescrevem. Erros HTTP devem trazer o código em `status` (ou em
+    `response.status_code`), para que google_search.eh_bloqueio reconheça os 429/503.
+    """
+
+    @abstractmethod
+    def buscar(self, query: str, num_results: int, lang: str) -> list:
+        ...
+
+    async def buscar_async(self, query: str, num_results: int, lang: str) -> list:
+        return await asyncio.to_thread(self.buscar, query, num_results, lang)
+
+    async def fechar(self):
+        """Libera as conexões do backend (chamado ao encerrar o worker)."""
+
+class BackendGoogleScraping(BackendBusca):
+    """Backend real: scraping da página de resultados do Google ('googlesearch-python')."""
+
+    def __init__(self):
+        from googlesearch import search as google_search_lib
+        self._google_search_lib = google_search_lib
+
+    def buscar(self, query: str, num_results: int, lang: str) -> list:
+        # A biblioteca retorna um gerador, então o convertemos para uma lista.
+        # O snippet não é fornecido por esta biblioteca, então passamos um texto padrão.
+        # O mais importante é a URL, que será usada para extrair o conteúdo da página.
+        return [
+            SearchResult(url=url, title="N/A", snippet="Snippet não disponível")
+            for url in self._google_search_lib(query, num_results=num_results, lang=lang)
+        ]
+
+class ErroAPIBusca(Exception):
+    """Resposta de erro da Custom Search JSON API, com o código HTTP em `status`."""
+
+    def __init__(self, status: int, mensagem: str = ''):
+        super().__init__(f"{status} {mensagem}".strip())
+        self.status = status
+
+class BackendCustomSearch(BackendBusca):
+    """
+    Backend pela Custom Search JSON API do Google: sem scraping e com título e snippet
+    reais, mas sujeito à cota diária da chave. No máximo 10 resultados por query.
+    """
+
+    URL_API = "https://www.googleapis.com/customsearch/v1"
+    MAX_RESULTADOS = 10
+    TIMEOUT_SEGUNDOS = 15
+
+    def __init__(self, api_key: str, id_mecanismo: str):
+        if not api_key or not id_mecanismo:
+            raise ValueError("O backend 'api' requer LICITAI_BUSCA_API_KEY e LICITAI_BUSCA_CX.")
+        self._api_key = api_key
+        self._id_mecanismo = id_mecanismo
+        self._sessao = None
+
+    @classmethod
+    def do_ambiente(cls):
+        return cls(os.getenv("LICITAI_BUSCA_API_KEY"), os.getenv("LICITAI_BUSCA_CX"))
+
+    def _parametros(self, query: str, num_results: int, lang: str) -> dict:
+        return {
+            'key': self._api_key, 'cx': self._id_mecanismo, 'q': query,
+            'num': max(1, min(num_results, self.MAX_RESULTADOS)), 'hl': lang, 'gl': 'br'
+        }
+
+    @staticmethod
+    def _resultados(status: int, corpo: dict) -> list:
+        if status != 200:
+            mensagem = (corpo.get('error') or {}).get('message', '') if isinstance(corpo, dict) else ''
+            raise ErroAPIBusca(status, mensagem)
+        return [
+            SearchResult(url=item['link'], title=item.get('title', ''), snippet=item.get('snippet', ''))
+            for item in corpo.get('items', [])
+        ]
+
+    def buscar(self, query: str, num_results: int, lang: str) -> list:
+        import requests
+        resposta = requests.get(self.URL_API, params=self._parametros(query, num_results, lang), timeout=self.TIMEOUT_SEGUNDOS)
+        try:
+            corpo = resposta.json()
+        except ValueError:
+            corpo = {}
+        return self._resultados(resposta.status_code, corpo)
+
+    async def buscar_async(self, query: str, num_results: int, lang: str) -> list:
+        import aiohttp
+        if self._sessao is None or self._sessao.closed:
+            self._sessao = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.TIMEOUT_SEGUNDOS))
+        async with self._sessao.get(self.URL_API, params=self._parametros(query, num_results, lang)) as resposta:
+            corpo = await resposta.json(content_type=None)
+            return self._resultados(resposta.status, corpo or {})
+
+    async def fechar(self):
+        if self._sessao is not None:
+            await self._sessao.close()
+            self._sessao = None
+
+class ErroBloqueioSimulado(Exception):
+    """Bloqueio (429) injetado pelo backend falso."""
+    status = 429
+
+_RE_ASPAS = re.compile(r'"([^"]+)"')
+_RE_SITE = re.compile(r'site:([\w.-]+)')
+_DEPARTAMENTOS_FALSOS = ('ti', 'administracao', 'compras', 'licitacoes')
+
+class BackendBuscaFalso(BackendBusca):
+    """
+    Backend local que imita o Google sem chamadas externas.
+    Com `resultados_fixos` ({query: [{"url", "title", "snippet"}]}), responde exatamente com
+    eles (lista vazia para as demais queries). Sem eles, gera resultados plausíveis: o site do
+    órgão da query (o domínio do `site:` ou um domínio .gov.br derivado do nome entre aspas)
+    e páginas de terceiros, com e-mails e telefones no snippet em `taxa_contatos` dos casos.
+    A latência segue uma log-normal com a média e o desvio informados; cada busca pode
+    falhar com um bloqueio simulado.
+    """
+
+    def __init__(self, latencia_media: float = 0.5, latencia_desvio: float = 0.2, taxa_bloqueio: float = 0.0,
+                 taxa_contatos: float = 0.5, resultados_fixos: dict | None = None, semente: int | None = None):
+        self.latencia_media = latencia_media
+        self.latencia_desvio = latencia_desvio
+        self.taxa_bloqueio = taxa_bloqueio
+        self.taxa_contatos = taxa_contatos
+        self.resultados_fixos = resultados_fixos
+        self._random = random.Random(semente)
+        self.buscas = 0
+        self.bloqueios_injetados = 0
+
+    @classmethod
+    def do_ambiente(cls):
+        """Cria o backend a partir das variáveis LICITAI_BUSCA_FALSO_* (úteis para rodar o enriquecedor real offline)."""
+        resultados_fixos = None
+        caminho = os.getenv("LICITAI_BUSCA_FALSO_ARQUIVO")
+        if caminho:
+            with open(caminho, encoding='utf-8') as arquivo:
+                resultados_fixos = json.load(arquivo)
+        return cls(
+            latencia_media=float(os.getenv("LICITAI_BUSCA_FALSO_LATENCIA_MEDIA", "0.5")),
+            latencia_desvio=float(os.getenv("LICITAI_BUSCA_FALSO_LATENCIA_DESVIO", "0.2")),
+            taxa_bloqueio=float(os.getenv("LICITAI_BUSCA_FALSO_TAXA_BLOQUEIO", "0")),
+            taxa_contatos=float(os.getenv("LICITAI_BUSCA_FALSO_TAXA_CONTATOS", "0.5")),
+            resultados_fixos=resultados_fixos
+        )
+
+    def _latencia(self) -> float:
+        if self.latencia_media <= 0:
+            return 0.0
+        # Parâmetros da log-normal que reproduzem a média e o desvio pedidos.
+        sigma2 = math.log(1 + (self.latencia_desvio / self.latencia_media) ** 2)
+        mu = math.log(self.latencia_media) - sigma2 / 2
+        return self._random.lognormvariate(mu, math.sqrt(sigma2))
+
+    def _snippet(self, dominio: str) -> str:
+        if self._random.random() >= self.taxa_contatos:
+            return "Página institucional sem informações de contato."
+        departamento = self._random.choice(_DEPARTAMENTOS_FALSOS)
+        telefone = f"({self._random.choice((11, 19, 21, 31, 61))}) 3{self._random.randint(100, 999)}-{self._random.randint(1000, 9999)}"
+        return f"Setor de {departamento}: {departamento}@{dominio} - Telefone: {telefone}"
+
+    def _gerar(self, query: str, num_results: int) -> list:
+        site = _RE_SITE.search(query)
+        if site:
+            dominio = site.group(1)
+        else:
+            aspas = _RE_ASPAS.findall(query)
+            nome = aspas[-1] if aspas else query
+            dominio = re.sub(r'[^a-z0-9]', '', nome.lower())[:40] + '.gov.br'
+        resultados = []
+        for i in range(num_results):
+            # Com `site:`, todos os resultados são do órgão; sem ele, metade são de terceiros.
+            dominio_resultado = dominio if site or i % 2 == 0 else f"portal-noticias-{self._random.randint(1, 50)}.com.br"
+            resultados.append(SearchResult(url=f"https://{dominio_resultado}/pagina-{i}", title=f"Resultado {i + 1}",
+                                           snippet=self._snippet(dominio_resultado)))
+        return resultados
+
+    def _responder(self, query: str, num_results: int) -> list:
+        self.buscas += 1
+        if self._random.random() < self.taxa_bloqueio:
+            self.bloqueios_injetados += 1
+            raise ErroBloqueioSimulado("429 Too Many Requests [simulado]")
+        if self.resultados_fixos is not None:
+            return [SearchResult(r['url'], r.get('title', ''), r.get('snippet', ''))
+                    for r in self.resultados_fixos.get(query, [])[:num_results]]
+        return self._gerar(query, num_results)
+
+    def buscar(self, query: str, num_results: int, lang: str) -> list:
+        time.sleep(self._latencia())
+        return self._responder(query, num_results)
+
+    async def buscar_async(self, query: str, num_results: int, lang: str) -> list:
+        await asyncio.sleep(self._latencia())
+        return self._responder(query, num_results)
+
+    def metricas(self) -> dict:
+        return {'buscas': self.buscas, 'bloqueiosInjetados': self.bloqueios_injetados}
+
+# --- Seleção do backend ---
+_backend_atual = None
+
+def definir_backend_busca(backend: BackendBusca | None):
+    """Substitui o backend usado pelo processo (None volta à escolha pela variável de ambiente)."""
+    global _backend_atual
+    _backend_atual = backend
+
+def obter_backend_busca() -> BackendBusca:
+    """Retorna o backend em uso, criando-o conforme LICITAI_BUSCA_BACKEND na primeira chamada."""
+    global _backend_atual
+    if _backend_atual is None:
+        tipo = os.getenv("LICITAI_BUSCA_BACKEND", "google").lower()
+        if tipo == 'falso':
+            logger.warning("Usando o backend de busca FALSO (LICITAI_BUSCA_BACKEND=falso). Nenhuma busca real será feita.")
+            _backend_atual = BackendBuscaFalso.do_ambiente()
+        elif tipo == 'api':
+            _backend_atual = BackendCustomSearch.do_ambiente()
+        else:
+            _backend_atual = BackendGoogleScraping()
+    return _backend_atual
+
+async def fechar_backend_busca():
+    """Fecha as conexões do backend em uso, se algum já tiver sido criado."""
+    if _backend_atual is not None:
+        await _backend_atual.fechar()
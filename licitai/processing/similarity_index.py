@@ -0,0 +1,214 @@
+# licitai/processing/similarity_index.py
+"""
+Índice local de similaridade dos objetos já analisados pela IA.
+Muitos objetos de compra diferem apenas em quantidades, datas ou no nome do órgão; o
+cache de análises só resolve repetições exatas. Aqui cada objeto vira um vetor de
+n-gramas com hashing (palavras e trigramas de caracteres, sem dígitos), normalizado,
+e o vizinho mais próximo por similaridade de cosseno empresta o seu resultado quando
+a similaridade passa do limiar. Como "aquisição" e "renovação" da mesma licença são
+quase idênticas em n-gramas e têm gatilhos diferentes, só são vizinhos os objetos com a
+mesma assinatura de termos discriminantes (ver `assinatura_gatilho`). Os vetores ficam
+num arquivo .npz local, descartado quando a versão da análise muda.
+"""
+import json
+import logging
+import os
+import re
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from licitai.processing.analysis_cache import VERSAO_ANALISE, chave_cache, normalizar_objeto
+from licitai.processing.task_priority import TERMOS_GATILHO
+
+logger = logging.getLogger(__name__)
+
+# --- Configuração (variáveis de ambiente) ---
+CAMINHO_INDICE_PADRAO = os.getenv("LICITAI_INDICE_SIMILARIDADE", os.path.join("cache", "indice_similaridade.npz"))
+# Pares reais de aquisição x renovação ou fornecimento x manutenção ficam entre 0.88 e 0.91.
+LIMIAR_SIMILARIDADE = float(os.getenv("LICITAI_LIMIAR_SIMILARIDADE", "0.95")) # Acima de 1 desativa o reaproveitamento.
+CAPACIDADE_PADRAO = int(os.getenv("LICITAI_CAPACIDADE_INDICE", "20000"))
+DIMENSAO = 1024
+ALTERACOES_POR_GRAVACAO = 100 # Objetos novos entre gravações do arquivo.
+
+# Termos (normalizados, casados pelo início da palavra) que mudam o gatilho de venda de um
+# objeto: objetos só se reaproveitam se tiverem os mesmos grupos e a mesma categoria de TERMOS_GATILHO.
+GRUPOS_DISCRIMINANTES = (
+    ('aquisic', 'compra', 'fornecimento'),
+    ('renovac', 'subscric', 'expirac', 'atualizac'),
+    ('manutenc', 'suporte', 'assistencia tecnica'),
+    ('locac', 'aluguel', 'comodato', 'outsourcing'),
+    ('desenvolvimento', 'implantac', 'consultoria'),
+)
+
+# Campos do resultado que podem ser reaproveitados de um vizinho.
+CAMPOS_REAPROVEITADOS = ('palavrasChave', 'gatilhoVenda', 'confianca', 'modelo')
+
+def _termos(objeto_compra: str) -> list:
+    """Palavras (com 2+ letras) e trigramas de caracteres do objeto normalizado, ignorando números."""
+    texto = re.sub(r'\d+', ' ', normalizar_objeto(objeto_compra))
+    palavras = [p for p in texto.split() if len(p) > 1]
+    termos = [f"p:{p}" for p in palavras]
+    for palavra in palavras:
+        marcada = f" {palavra} "
+        termos.extend(f"c:{marcada[i:i + 3]}" for i in range(len(marcada) - 2))
+    return termos
+
+def _contem(texto: str, termos) -> bool:
+    return any(re.search(r'\b' + re.escape(termo), texto) for termo in termos)
+
+_CATEGORIAS_GATILHO = [tuple(normalizar_objeto(termo) for termo in termos) for termos, _ in TERMOS_GATILHO]
+
+def assinatura_gatilho(objeto_compra: str) -> str:
+    """
+    Grupos discriminantes presentes no objeto e a categoria de TERMOS_GATILHO em que ele
+    cai (a primeira que casar), ex: "0,2|c1". Objetos com assinaturas diferentes nunca
+    reaproveitam a análise um do outro.
+    """
+    texto = normalizar_objeto(objeto_compra)
+    grupos = ','.join(str(i) for i, termos in enumerate(GRUPOS_DISCRIMINANTES) if _contem(texto, termos))
+    categoria = next((i for i, termos in enumerate(_CATEGORIAS_GATILHO) if _contem(texto, termos)), -1)
+    return f"{grupos}|c{categoria}"
+
+def vetorizar(objeto_compra: str, dimensao: int = DIMENSAO) -> np.ndarray:
+    """
+    Vetor de n-gramas com hashing (sinal aleatório por termo para compensar colisões,
+    frequência amortecida por log) com norma 1. O hash é estável entre processos.
+    """
+    vetor = np.zeros(dimensao, dtype=np.float32)
+    for termo in _termos(objeto_compra):
+        h = zlib.crc32(termo.encode('utf-8'))
+        vetor[h % dimensao] += 1.0 if h & 0x80000000 else -1.0
+    vetor = np.sign(vetor) * np.log1p(np.abs(vetor))
+    norma = np.linalg.norm(vetor)
+    return vetor / norma if norma else vetor
+
+class IndiceSimilaridade:
+    """
+    Vizinhos mais próximos (cosseno) entre os objetos já analisados, mantidos em memória
+    como uma matriz NumPy e persistidos em `caminho`. Ao atingir a capacidade, os objetos
+    mais antigos dão lugar aos novos.
+    """
+
+    def __init__(self, caminho: str = CAMINHO_INDICE_PADRAO, limiar: float = LIMIAR_SIMILARIDADE,
+                 capacidade: int = CAPACIDADE_PADRAO):
+        self._caminho = Path(caminho)
+        self.limiar = limiar
+        self._capacidade = capacidade
+        self._vetores = np.zeros((0, DIMENSAO), dtype=np.float32)
+        self._resultados = [] # Resultado reaproveitável de cada linha de `_vetores`.
+        self._objetos = [] # Objeto normalizado de cada linha, gravado na tarefa que o reaproveitar.
+        self._chaves = [] # Chave de cache de cada linha, para não indexar duas vezes o mesmo objeto.
+        self._chaves_indexadas = set()
+        self._assinaturas = [] # assinatura_gatilho de cada linha (recalculada a partir de `_objetos` ao carregar).
+        self._alteracoes = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.carregar()
+
+    def __len__(self):
+        return len(self._resultados)
+
+    def carregar(self):
+        """Lê o índice do disco, se existir e tiver sido gerado pela versão atual da análise."""
+        if not self._caminho.exists():
+            return
+        try:
+            with np.load(self._caminho, allow_pickle=False) as dados:
+                if str(dados['versao']) != VERSAO_ANALISE or dados['vetores'].shape[1] != DIMENSAO:
+                    logger.info(f"Índice de similaridade em '{self._caminho}' é de outra versão da análise; começando vazio.")
+                    return
+                self._vetores = dados['vetores'].astype(np.float32)
+                self._resultados = json.loads(str(dados['resultados']))
+                self._objetos = [str(o) for o in dados['objetos']]
+                self._chaves = [str(c) for c in dados['chaves']]
+        except Exception as e:
+            logger.warning(f"Falha ao ler o índice de similaridade '{self._caminho}', começando vazio: {e}")
+            return
+        self._chaves_indexadas = set(self._chaves)
+        self._assinaturas = [assinatura_gatilho(objeto) for objeto in self._objetos]
+        logger.info(f"Índice de similaridade carregado com {len(self)} objeto(s).")
+
+    def salvar(self):
+        """Grava o índice no disco (num arquivo temporário renomeado ao final, para não corromper o atual)."""
+        self._caminho.parent.mkdir(parents=True, exist_ok=True)
+        temporario = self._caminho.with_name(self._caminho.name + '.tmp')
+        with open(temporario, 'wb') as arquivo:
+            np.savez_compressed(
+                arquivo, versao=np.array(VERSAO_ANALISE), vetores=self._vetores,
+                resultados=np.array(json.dumps(self._resultados, ensure_ascii=False)),
+                objetos=np.array(self._objetos, dtype=str), chaves=np.array(self._chaves, dtype=str)
+            )
+        os.replace(temporario, self._caminho)
+        self._alteracoes = 0
+
+    def salvar_se_necessario(self):
+        if self._alteracoes >= ALTERACOES_POR_GRAVACAO:
+            try:
+                self.salvar()
+            except Exception as e:
+                logger.warning(f"Falha ao gravar o índice de similaridade: {e}")
+
+    def buscar_varios(self, objetos: dict) -> dict:
+        """
+        Para cada objeto ({id: objeto_compra}), procura o vizinho mais similar entre os de
+        mesma assinatura de gatilho. Retorna {id: (resultado, similaridade, objeto_vizinho)}
+        apenas para os ids cujo vizinho atingiu o limiar; os demais seguem para a cascata.
+        """
+        if not objetos or not len(self) or self.limiar > 1:
+            return {}
+        ids = list(objetos)
+        consultas = np.stack([vetorizar(objetos[item_id]) for item_id in ids])
+        similaridades = consultas @ self._vetores.T
+        assinaturas = np.array(self._assinaturas)
+        encontrados = {}
+        for linha, item_id in enumerate(ids):
+            compativeis = assinaturas == assinatura_gatilho(objetos[item_id])
+            if not compativeis.any():
+                continue
+            candidatas = np.where(compativeis, similaridades[linha], -1.0)
+            indice = int(candidatas.argmax())
+            similaridade = float(candidatas[indice])
+            if similaridade >= self.limiar:
+                encontrados[item_id] = (dict(self._resultados[indice]), similaridade, self._objetos[indice])
+        self.acertos += len(encontrados)
+        self.falhas += len(ids) - len(encontrados)
+        return encontrados
+
+    def adicionar_varios(self, resultados: dict, objetos: dict):
+        """Indexa os resultados ({id: resultado}) dos objetos ({id: objeto_compra}) analisados pela IA."""
+        novos_vetores = []
+        for item_id, resultado in resultados.items():
+            objeto_compra = objetos.get(item_id)
+            chave = chave_cache(objeto_compra) if objeto_compra else None
+            if chave is None or chave in self._chaves_indexadas or not resultado.get('gatilhoVenda'):
+                continue
+            self._chaves.append(chave)
+            self._chaves_indexadas.add(chave)
+            novos_vetores.append(vetorizar(objeto_compra))
+            self._resultados.append({campo: resultado.get(campo) for campo in CAMPOS_REAPROVEITADOS})
+            self._objetos.append(normalizar_objeto(objeto_compra)[:500])
+            self._assinaturas.append(assinatura_gatilho(objeto_compra))
+        if not novos_vetores:
+            return
+        self._vetores = np.concatenate([self._vetores, np.stack(novos_vetores)])
+        self._alteracoes += len(novos_vetores)
+
+        excesso = len(self) - self._capacidade
+        if excesso > 0:
+            self._vetores = self._vetores[excesso:]
+            del self._resultados[:excesso]
+            del self._objetos[:excesso]
+            del self._assinaturas[:excesso]
+            self._chaves_indexadas.difference_update(self._chaves[:excesso])
+            del self._chaves[:excesso]
+
+    def metricas(self) -> dict:
+        consultas = self.acertos + self.falhas
+        return {
+            'objetosIndexados': len(self),
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'taxaAcerto': self.acertos / consultas if consultas else 0.0
+        }
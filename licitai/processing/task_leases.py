@@ -0,0 +1,310 @@
+# licitai/processing/task_leases.py
+"""
+Reivindicação atômica de tarefas com lease, compartilhada pelos workers.
+Cada tarefa é tomada numa transação que grava `workerId` e `leaseExpiresAt`;
+o lease é renovado durante chamadas longas e, se o worker morrer, as tarefas
+com lease vencido voltam automaticamente para a fila. As escritas de um worker que
+perdeu o lease de uma tarefa (ver `RenovadorLease.escritas`) são descartadas, para não
+sobrescrever o resultado do worker que a assumiu.
+"""
+import asyncio
+import datetime
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from google.cloud import firestore
+
+from licitai.processing.task_retries import MAX_TENTATIVAS_PADRAO, campos_falha
+from licitai.processing.write_coalescer import gravar_atualizacao
+
+logger = logging.getLogger(__name__)
+
+# --- Constantes ---
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+DURACAO_LEASE_PADRAO = 300 # Segundos; cobre a espera na fila interna e o processamento.
+INTERVALO_RECLAMACAO_PADRAO = 60 # Segundos entre varreduras de leases vencidos.
+FATOR_CANDIDATOS = 3 # Candidatos consultados por tarefa desejada, para reduzir a disputa entre réplicas.
+
+def _agora():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+def _lease_vencido(dados: dict, agora) -> bool:
+    """Um lease ausente (tarefas anteriores a este mecanismo) é tratado como vencido."""
+    expira_em = dados.get('leaseExpiresAt')
+    return expira_em is None or expira_em <= agora
+
+def _tentativa_liberada(dados: dict, agora) -> bool:
+    """Uma tarefa reagendada só pode ser retomada depois do seu `nextAttemptAt`."""
+    proxima = dados.get('nextAttemptAt')
+    return proxima is None or proxima <= agora
+
+class TarefaReivindicada:
+    """Documento de tarefa após a reivindicação, com a mesma interface usada pelos workers (id, reference, to_dict)."""
+
+    def __init__(self, reference, dados: dict):
+        self.id = reference.id
+        self.reference = reference
+        self._dados = dados
+
+    def to_dict(self) -> dict:
+        return dict(self._dados)
+
+def campos_liberacao() -> dict:
+    """Campos a incluir na atualização final de uma tarefa para encerrar o lease."""
+    return {'leaseExpiresAt': firestore.DELETE_FIELD}
+
+class EscritasDoLease:
+    """
+    Intermediário das escritas das tarefas de um RenovadorLease, com a interface do
+    AgrupadorEscritas (`atualizar`): grava pelo agrupador `escritas` (ou diretamente),
+    mas descarta as escritas das tarefas cujo lease este worker já não detém.
+    """
+
+    def __init__(self, renovador, escritas=None):
+        self._renovador = renovador
+        self._escritas = escritas
+
+    async def atualizar(self, ref, dados: dict):
+        if not await self._renovador.ainda_pertence(ref):
+            logger.warning(f"Escrita na tarefa {ref.id} descartada: o lease foi perdido para outro worker.")
+            self._renovador.escritas_descartadas += 1
+            return
+        await gravar_atualizacao(ref, dados, self._escritas)
+
+class RenovadorLease:
+    """
+    Context manager assíncrono que renova periodicamente o lease das tarefas informadas.
+    Se outro worker assumir alguma delas, `perdidas` passa a conter seus IDs e as escritas
+    feitas por `escritas()` nessas tarefas são descartadas.
+    """
+
+    def __init__(self, gerenciador, refs):
+        self._gerenciador = gerenciador
+        self._refs = list(refs)
+        self._tarefa = None
+        self._renovado_em = {ref.id: time.monotonic() for ref in self._refs} # Última confirmação do lease.
+        self.perdidas = set()
+        self.escritas_descartadas = 0
+
+    def escritas(self, escritas=None) -> EscritasDoLease:
+        """Escritas (pelo agrupador `escritas`, se houver) condicionadas a este worker ainda deter o lease."""
+        return EscritasDoLease(self, escritas)
+
+    async def _confirmar(self, ref) -> bool:
+        """Renova o lease de `ref`; registra a tarefa como perdida se ela tiver sido assumida por outro worker."""
+        renovado = await self._gerenciador.renovar(ref)
+        if renovado:
+            self._renovado_em[ref.id] = time.monotonic()
+        else:
+            logger.warning(f"Lease da tarefa {ref.id} foi perdido para outro worker.")
+            self.perdidas.add(ref.id)
+        return renovado
+
+    async def ainda_pertence(self, ref) -> bool:
+        """
+        Indica se este worker ainda detém o lease de `ref`. Dentro da validade da última
+        renovação, não há leitura; depois dela (ex: renovações falhando), o lease é
+        confirmado numa transação antes de responder. Na dúvida (erro), responde que não:
+        a tarefa volta à fila pelo lease vencido em vez de arriscar sobrescrever outro worker.
+        """
+        if ref.id in self.perdidas:
+            return False
+        if time.monotonic() - self._renovado_em.get(ref.id, 0.0) < self._gerenciador.duracao * 0.8:
+            return True
+        try:
+            return await self._confirmar(ref)
+        except Exception as e:
+            logger.warning(f"Não foi possível confirmar o lease da tarefa {ref.id}: {e}")
+            return False
+
+    async def _renovar_periodicamente(self):
+        intervalo = self._gerenciador.duracao / 3
+        while True:
+            await asyncio.sleep(intervalo)
+            for ref in self._refs:
+                if ref.id in self.perdidas:
+                    continue
+                try:
+                    await self._confirmar(ref)
+                except Exception as e:
+                    logger.warning(f"Falha ao renovar o lease da tarefa {ref.id}: {e}")
+
+    async def __aenter__(self):
+        self._tarefa = asyncio.create_task(self._renovar_periodicamente())
+        return self
+
+    async def __aexit__(self, *exc):
+        self._tarefa.cancel()
+        try:
+            await self._tarefa
+        except asyncio.CancelledError:
+            pass
+        return False
+
+class GerenciadorLeases:
+    """
+    Reivindica tarefas de `status_origem` movendo-as para `status_em_andamento` sob lease.
+    Tarefas em andamento com lease vencido contam como uma tentativa falha (um worker
+    que morre na mesma tarefa repetidamente não a reprocessa para sempre): são devolvidas
+    à fila (a `status_reagendado`, com backoff, se informado) e, esgotadas as tentativas,
+    movidas para `status_falha`.
+    Se `status_reagendado` for informado, tarefas nesse status também são reivindicadas,
+    mas só depois do seu `nextAttemptAt` (ver task_retries.py). Com um `escalonador`
+    (ver task_priority.py), os candidatos são escolhidos por prioridade e justiça entre
+    clientes; sem ele, em ordem aleatória. `db` é um `firestore.AsyncClient`.
+    """
+
+    def __init__(self, db, collection_name: str, status_origem: str, status_em_andamento: str,
+                 worker_id: str = WORKER_ID, duracao: float = DURACAO_LEASE_PADRAO,
+                 intervalo_reclamacao: float = INTERVALO_RECLAMACAO_PADRAO, status_reagendado: str | None = None,
+                 escalonador=None, status_falha: str | None = None, max_tentativas: int = MAX_TENTATIVAS_PADRAO):
+        self._db = db
+        self._collection = db.collection(collection_name)
+        self.status_origem = status_origem
+        self.status_em_andamento = status_em_andamento
+        self.status_reagendado = status_reagendado
+        self.status_falha = status_falha
+        self.max_tentativas = max_tentativas
+        self.escalonador = escalonador
+        self.worker_id = worker_id
+        self.duracao = duracao
+        self._intervalo_reclamacao = intervalo_reclamacao
+        self._ultima_reclamacao = 0.0
+
+    async def _reivindicar_uma(self, ref, campos_extras: dict):
+        """Transação: toma a tarefa se ela ainda estiver disponível. Retorna os dados atualizados ou None."""
+        @firestore.async_transactional
+        async def _transacao(transaction):
+            snapshot = await ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return None
+            dados = snapshot.to_dict()
+            agora = _agora()
+            disponivel = dados.get('status') == self.status_origem or (
+                dados.get('status') == self.status_em_andamento and _lease_vencido(dados, agora)
+            ) or (
+                self.status_reagendado is not None and dados.get('status') == self.status_reagendado
+                and _tentativa_liberada(dados, agora)
+            )
+            if not disponivel:
+                return None
+            atualizacao = {
+                'status': self.status_em_andamento,
+                'workerId': self.worker_id,
+                'leaseExpiresAt': agora + datetime.timedelta(seconds=self.duracao),
+                **campos_extras
+            }
+            transaction.update(ref, atualizacao)
+            dados.update(atualizacao)
+            return dados
+
+        return await _transacao(self._db.transaction())
+
+    async def _buscar_candidatos(self, limite: int) -> list:
+        if self.escalonador is not None:
+            candidatos = await self.escalonador.buscar_candidatos(self._collection, self.status_origem, limite * FATOR_CANDIDATOS)
+        else:
+            query = self._collection.where('status', '==', self.status_origem).limit(limite * FATOR_CANDIDATOS)
+            candidatos = [doc async for doc in query.stream()]
+        if self.status_reagendado is not None:
+            # Requer o índice composto (status, nextAttemptAt) na coleção de tarefas.
+            query_reagendadas = (self._collection.where('status', '==', self.status_reagendado)
+                                 .where('nextAttemptAt', '<=', _agora()).limit(limite * FATOR_CANDIDATOS))
+            candidatos.extend([doc async for doc in query_reagendadas.stream()])
+        return candidatos
+
+    async def reivindicar(self, limite: int, campos_extras: dict | None = None) -> list:
+        """Reivindica até `limite` tarefas; antes, devolve à fila as de leases vencidos (no máximo a cada intervalo)."""
+        if time.monotonic() - self._ultima_reclamacao >= self._intervalo_reclamacao:
+            try:
+                await self.reclamar_expirados()
+            except Exception as e:
+                logger.warning(f"Falha ao reclamar leases vencidos: {e}")
+
+        candidatos = await self._buscar_candidatos(limite)
+        if self.escalonador is not None:
+            candidatos = self.escalonador.ordenar(candidatos)
+        else:
+            # Ordem aleatória para que réplicas concorrentes não disputem sempre os mesmos documentos.
+            random.shuffle(candidatos)
+        reivindicadas = []
+        for candidato in candidatos:
+            if len(reivindicadas) >= limite:
+                break
+            try:
+                dados = await self._reivindicar_uma(candidato.reference, campos_extras or {})
+            except Exception as e:
+                logger.debug(f"Disputa ao reivindicar a tarefa {candidato.id}: {e}")
+                continue
+            if dados is not None:
+                reivindicadas.append(TarefaReivindicada(candidato.reference, dados))
+        if self.escalonador is not None:
+            self.escalonador.registrar_servico(reivindicadas)
+        return reivindicadas
+
+    async def renovar(self, ref) -> bool:
+        """Transação: estende o lease se a tarefa ainda pertencer a este worker."""
+        @firestore.async_transactional
+        async def _transacao(transaction):
+            snapshot = await ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return False
+            dados = snapshot.to_dict()
+            if dados.get('status') != self.status_em_andamento or dados.get('workerId') != self.worker_id:
+                return False
+            transaction.update(ref, {'leaseExpiresAt': _agora() + datetime.timedelta(seconds=self.duracao)})
+            return True
+
+        return await _transacao(self._db.transaction())
+
+    def renovando(self, refs) -> RenovadorLease:
+        """Renova os leases das tarefas enquanto o bloco `async with` estiver em execução."""
+        return RenovadorLease(self, refs)
+
+    def _campos_expiracao(self, dados: dict) -> dict:
+        """Atualização de uma tarefa com lease vencido: a tentativa conta como falha."""
+        mensagem = f"Lease vencido em '{self.status_em_andamento}' (worker {dados.get('workerId')} não concluiu a tarefa)."
+        if self.status_falha is None:
+            return {'status': self.status_origem, 'attempts': dados.get('attempts', 0) + 1, 'logErro': mensagem}
+        return campos_falha(dados.get('attempts', 0), mensagem, self.status_reagendado or self.status_origem,
+                            self.status_falha, max_tentativas=self.max_tentativas)
+
+    async def reclamar_expirados(self) -> int:
+        """
+        Devolve à fila as tarefas em andamento cujo lease venceu (ex: worker que caiu),
+        incrementando `attempts` na mesma transação; esgotadas as tentativas, a tarefa vai para `status_falha`.
+        """
+        self._ultima_reclamacao = time.monotonic()
+
+        @firestore.async_transactional
+        async def _transacao(transaction, ref):
+            snapshot = await ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return False
+            dados = snapshot.to_dict()
+            if dados.get('status') != self.status_em_andamento or not _lease_vencido(dados, _agora()):
+                return False
+            atualizacao = {
+                **self._campos_expiracao(dados),
+                'workerId': firestore.DELETE_FIELD,
+                'leaseExpiresAt': firestore.DELETE_FIELD
+            }
+            transaction.update(ref, atualizacao)
+            return atualizacao['status']
+
+        agora = _agora()
+        reclamadas = 0
+        async for doc in self._collection.where('status', '==', self.status_em_andamento).stream():
+            if not _lease_vencido(doc.to_dict(), agora):
+                continue
+            try:
+                novo_status = await _transacao(self._db.transaction(), doc.reference)
+                if novo_status:
+                    reclamadas += 1
+                    logger.warning(f"Lease vencido: tarefa {doc.id} movida de '{self.status_em_andamento}' para '{novo_status}'.")
+            except Exception as e:
+                logger.debug(f"Disputa ao reclamar a tarefa {doc.id}: {e}")
+        return reclamadas
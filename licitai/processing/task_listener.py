@@ -0,0 +1,76 @@
+# licitai/processing/task_listener.py
+"""
+Modo listener dos workers: assina a query de tarefas disponíveis com `on_snapshot`
+e acorda o prefetcher do WorkerPool assim que uma tarefa nova aparece, em vez de
+esperar o próximo ciclo de polling. Se o stream cair, o worker volta ao polling
+normal enquanto a assinatura é refeita.
+"""
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_SUPERVISAO = 30 # Segundos entre verificações da saúde do stream.
+INTERVALO_POLLING_COM_LISTENER = 300 # Polling de segurança enquanto o stream está ativo.
+
+class OuvinteTarefas:
+    """
+    Mantém uma assinatura `on_snapshot` sobre `query` e acorda o `pool` a cada
+    documento adicionado ou modificado. Com o stream ativo, o polling do pool é
+    espaçado; com o stream inativo, o intervalo original do pool é restaurado.
+    """
+
+    def __init__(self, query, pool, nome: str = 'listener'):
+        self._query = query
+        self._pool = pool
+        self._nome = nome
+        self._watch = None
+        self._loop = None
+        self._intervalo_polling_original = pool.intervalo_ocioso
+
+    def _ao_receber(self, docs, changes, read_time):
+        # Executado na thread do Firestore: repassa o aviso ao event loop com segurança.
+        if any(change.type.name in ('ADDED', 'MODIFIED') for change in changes):
+            self._loop.call_soon_threadsafe(self._pool.acordar)
+
+    def _stream_ativo(self) -> bool:
+        if self._watch is None:
+            return False
+        if getattr(self._watch, '_closed', False):
+            return False
+        return getattr(self._watch, 'is_active', True)
+
+    def _assinar(self):
+        try:
+            self._watch = self._query.on_snapshot(self._ao_receber)
+            self._pool.intervalo_ocioso = INTERVALO_POLLING_COM_LISTENER
+            logger.info(f"[{self._nome}] Listener de tarefas ativo.")
+        except Exception as e:
+            self._watch = None
+            self._pool.intervalo_ocioso = self._intervalo_polling_original
+            logger.warning(f"[{self._nome}] Não foi possível assinar o listener ({e}). Usando polling.")
+
+    def _cancelar_assinatura(self):
+        if self._watch is not None:
+            try:
+                self._watch.unsubscribe()
+            except Exception:
+                pass
+            self._watch = None
+
+    async def supervisionar(self):
+        """Assina o listener e o refaz sempre que o stream cair, até ser cancelado."""
+        self._loop = asyncio.get_running_loop()
+        try:
+            while True:
+                if not self._stream_ativo():
+                    if self._watch is not None:
+                        logger.warning(f"[{self._nome}] Stream do listener caiu. Voltando ao polling e reassinando...")
+                        self._cancelar_assinatura()
+                        self._pool.intervalo_ocioso = self._intervalo_polling_original
+                        self._pool.acordar()
+                    await asyncio.to_thread(self._assinar)
+                await asyncio.sleep(INTERVALO_SUPERVISAO)
+        finally:
+            self._cancelar_assinatura()
+            self._pool.intervalo_ocioso = self._intervalo_polling_original
@@ -0,0 +1,192 @@
+# licitai/processing/task_priority.py
+"""
+Prioridade das tarefas e escalonamento justo entre clientes.
+A prioridade (0 a 100) é calculada na geração da tarefa a partir do prazo de
+encerramento das propostas, da data de publicação e da probabilidade de haver um
+gatilho de venda no objeto. Na reivindicação, as tarefas mais prioritárias de cada
+cliente são intercaladas por peso, para que uma pesquisa grande não monopolize a fila.
+"""
+import datetime
+import logging
+import time
+from google.cloud import firestore
+
+logger = logging.getLogger(__name__)
+
+# --- Constantes ---
+PESQUISAS_COLLECTION_NAME = 'pesquisas'
+PRIORIDADE_PADRAO = 50.0 # Tarefas geradas antes deste mecanismo (sem o campo 'prioridade').
+PESO_URGENCIA = 0.5
+PESO_RECENCIA = 0.2
+PESO_GATILHO = 0.3
+MEIA_VIDA_PRAZO_DIAS = 3 # Com 3 dias até o encerramento, a urgência vale metade da máxima.
+MEIA_VIDA_PUBLICACAO_DIAS = 7
+INTERVALO_ATUALIZACAO_CLIENTES = 300 # Segundos entre releituras dos clientes ativos e seus pesos.
+INTERVALO_CANDIDATOS = 30 # Segundos em que os candidatos consultados de um cliente são reaproveitados.
+MAX_CONSULTAS_CLIENTES = 10 # Consultas por cliente em cada busca de candidatos; os demais usam o cache.
+FUSO_PNCP = datetime.timezone(datetime.timedelta(hours=-3)) # Datas do PNCP vêm no horário de Brasília, sem fuso.
+
+# Termos do objeto que indicam gatilho de venda, com a probabilidade atribuída.
+TERMOS_GATILHO = [
+    (('renovação', 'renovacao', 'subscrição', 'expiração', 'software assurance', 'enterprise agreement'), 1.0),
+    (('computador', 'notebook', 'desktop', 'estações de trabalho', 'microcomputador', 'servidor'), 0.9),
+    (('licença', 'licenca', 'software', 'office', 'workspace', 'm365'), 0.8),
+    (('informática', 'informatica', 'tecnologia da informação', 'suporte técnico', 'backup', 'firewall'), 0.6),
+]
+PROBABILIDADE_GATILHO_PADRAO = 0.2
+
+def _data_pncp(valor):
+    """Converte as datas do PNCP ('AAAA-MM-DD' ou ISO com hora) para datetime com fuso. None se inválida."""
+    if not valor:
+        return None
+    if isinstance(valor, datetime.datetime):
+        return valor if valor.tzinfo else valor.replace(tzinfo=FUSO_PNCP)
+    try:
+        data = datetime.datetime.fromisoformat(str(valor))
+    except ValueError:
+        return None
+    return data if data.tzinfo else data.replace(tzinfo=FUSO_PNCP)
+
+def probabilidade_gatilho(objeto_compra: str) -> float:
+    """Estimativa barata (sem IA) da chance de o objeto conter um gatilho de venda."""
+    texto = (objeto_compra or '').lower()
+    for termos, probabilidade in TERMOS_GATILHO:
+        if any(termo in texto for termo in termos):
+            return probabilidade
+    return PROBABILIDADE_GATILHO_PADRAO
+
+def calcular_prioridade(contratacao_data: dict, agora: datetime.datetime | None = None) -> float:
+    """
+    Prioridade de 0 a 100: urgência do prazo de propostas (prazo vencido vale zero),
+    recência da publicação e probabilidade de gatilho de venda.
+    """
+    agora = agora or datetime.datetime.now(datetime.timezone.utc)
+
+    encerramento = _data_pncp(contratacao_data.get('dataEncerramentoProposta'))
+    if encerramento is None:
+        urgencia = 0.3
+    else:
+        dias_restantes = (encerramento - agora).total_seconds() / 86400
+        urgencia = 0.0 if dias_restantes < 0 else 1 / (1 + dias_restantes / MEIA_VIDA_PRAZO_DIAS)
+
+    publicacao = _data_pncp(contratacao_data.get('dataPublicacaoPncp'))
+    if publicacao is None:
+        recencia = 0.3
+    else:
+        dias_publicada = max(0.0, (agora - publicacao).total_seconds() / 86400)
+        recencia = 1 / (1 + dias_publicada / MEIA_VIDA_PUBLICACAO_DIAS)
+
+    gatilho = probabilidade_gatilho(contratacao_data.get('objetoCompra'))
+    return round(100 * (PESO_URGENCIA * urgencia + PESO_RECENCIA * recencia + PESO_GATILHO * gatilho), 2)
+
+def prioridade_da_tarefa(dados: dict) -> float:
+    valor = dados.get('prioridade')
+    return float(valor) if isinstance(valor, (int, float)) else PRIORIDADE_PADRAO
+
+class EscalonadorJusto:
+    """
+    Seleciona os candidatos à reivindicação com justiça ponderada entre clientes.
+    Busca as tarefas mais prioritárias de cada cliente ativo (pesquisas com `ativo == True`;
+    o peso vem do campo opcional `pesoEscalonamento` da pesquisa, padrão 1) e as intercala
+    de modo que cada cliente receba uma fatia proporcional ao seu peso. `db` é um `firestore.AsyncClient`.
+    Os candidatos de cada cliente ficam em cache por `intervalo_candidatos` segundos e cada busca
+    consulta no máximo `max_consultas` clientes, para que as leituras não cresçam com o número de clientes.
+    """
+
+    def __init__(self, db, intervalo_atualizacao: float = INTERVALO_ATUALIZACAO_CLIENTES,
+                 intervalo_candidatos: float = INTERVALO_CANDIDATOS, max_consultas: int = MAX_CONSULTAS_CLIENTES):
+        self._db = db
+        self._intervalo_atualizacao = intervalo_atualizacao
+        self._intervalo_candidatos = intervalo_candidatos
+        self._max_consultas = max_consultas
+        self._pesos = {}
+        self._atualizado_em = 0.0
+        # (status, clienteId) -> (momento da consulta, {id: documento}).
+        self._candidatos = {}
+        # Serviço acumulado por cliente (normalizado pelo peso) entre chamadas, para a justiça valer ao longo do tempo.
+        self._servido = {}
+
+    async def pesos_clientes(self) -> dict:
+        """Pesos dos clientes ativos, relidos no máximo a cada intervalo."""
+        if time.monotonic() - self._atualizado_em >= self._intervalo_atualizacao:
+            pesos = {}
+            async for pesquisa in self._db.collection(PESQUISAS_COLLECTION_NAME).where('ativo', '==', True).stream():
+                dados = pesquisa.to_dict()
+                cliente_id = dados.get('clienteId')
+                if cliente_id:
+                    pesos[cliente_id] = max(pesos.get(cliente_id, 0.0), float(dados.get('pesoEscalonamento', 1) or 1))
+            self._pesos = pesos
+            self._atualizado_em = time.monotonic()
+        return self._pesos
+
+    async def buscar_candidatos(self, collection_ref, status: str, limite: int) -> list:
+        """
+        Candidatos em `status`: os `limite` mais prioritários de cada cliente ativo e, como
+        alternativa para tarefas sem 'prioridade' (não aparecem em consultas ordenadas), uma
+        consulta sem ordenação. Requer o índice composto (status, clienteId, prioridade desc).
+        Só os clientes com cache vencido são consultados, no máximo `max_consultas` por chamada e
+        os menos servidos primeiro. Candidatos do cache podem já ter sido tomados por outra réplica;
+        a transação de reivindicação confere o status e os descarta.
+        """
+        pesos = await self.pesos_clientes()
+        agora = time.monotonic()
+        for chave in [c for c in self._candidatos if c[0] == status and c[1] not in pesos]:
+            del self._candidatos[chave]
+
+        vencidos = [c for c in pesos
+                    if (status, c) not in self._candidatos
+                    or agora - self._candidatos[(status, c)][0] >= self._intervalo_candidatos]
+        vencidos.sort(key=lambda c: self._servido.get(c, 0.0))
+        for cliente_id in vencidos[:self._max_consultas]:
+            query = (collection_ref.where('status', '==', status).where('clienteId', '==', cliente_id)
+                     .order_by('prioridade', direction=firestore.Query.DESCENDING).limit(limite))
+            try:
+                self._candidatos[(status, cliente_id)] = (agora, {doc.id: doc async for doc in query.stream()})
+            except Exception as e:
+                logger.warning(f"Consulta por prioridade do cliente '{cliente_id}' falhou ({e}). Verifique o índice composto.")
+
+        candidatos = {}
+        for (status_cache, _), (_, docs) in self._candidatos.items():
+            if status_cache == status:
+                candidatos.update(docs)
+        async for doc in collection_ref.where('status', '==', status).limit(limite).stream():
+            candidatos.setdefault(doc.id, doc)
+        return list(candidatos.values())
+
+    def ordenar(self, candidatos: list) -> list:
+        """
+        Intercala os candidatos: a cada passo escolhe o cliente com menor serviço acumulado
+        (dividido pelo peso) e dele a tarefa mais prioritária.
+        """
+        pesos = self._pesos
+        por_cliente = {}
+        for doc in candidatos:
+            por_cliente.setdefault(doc.to_dict().get('clienteId'), []).append(doc)
+        for docs in por_cliente.values():
+            docs.sort(key=lambda d: prioridade_da_tarefa(d.to_dict()), reverse=True)
+
+        # Clientes novos entram no nível do menos servido, sem "crédito" acumulado.
+        piso = min((self._servido[c] for c in por_cliente if c in self._servido), default=0.0)
+        servido = {c: max(self._servido.get(c, piso), piso) for c in por_cliente}
+        ordenados = []
+        while por_cliente:
+            cliente = min(por_cliente, key=lambda c: servido[c])
+            ordenados.append(por_cliente[cliente].pop(0))
+            servido[cliente] += 1 / pesos.get(cliente, 1.0)
+            if not por_cliente[cliente]:
+                del por_cliente[cliente]
+        return ordenados
+
+    def registrar_servico(self, docs):
+        """
+        Contabiliza as tarefas efetivamente reivindicadas de cada cliente e as retira do cache
+        de candidatos; um cliente cujo cache se esgota volta a ser consultado na próxima busca.
+        """
+        pesos = self._pesos
+        for doc in docs:
+            cliente = doc.to_dict().get('clienteId')
+            self._servido[cliente] = self._servido.get(cliente, 0.0) + 1 / pesos.get(cliente, 1.0)
+            for chave in [c for c in self._candidatos if c[1] == cliente]:
+                _, cache = self._candidatos[chave]
+                if cache.pop(doc.id, None) is not None and not cache:
+                    del self._candidatos[chave]
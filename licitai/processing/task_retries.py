@@ -0,0 +1,84 @@
+# licitai/processing/task_retries.py
+"""
+Reagendamento automático de tarefas que falharam.
+Cada falha incrementa `attempts` e, enquanto houver tentativas, a tarefa vai para o
+status de reagendamento da etapa com `nextAttemptAt` calculado por backoff exponencial;
+os workers só a reivindicam de novo depois desse horário (ver task_leases.py).
+Esgotadas as tentativas, ou em falhas permanentes, a tarefa vai para o status de
+falha da etapa (a fila de "dead letter"), de onde só sai pelo comando `reenfileirar`.
+"""
+import datetime
+import os
+import random
+from google.cloud import firestore
+
+# --- Configuração (variáveis de ambiente) ---
+MAX_TENTATIVAS_PADRAO = int(os.getenv("LICITAI_MAX_TENTATIVAS", "5"))
+BACKOFF_BASE_SEGUNDOS = float(os.getenv("LICITAI_BACKOFF_BASE", "60"))
+BACKOFF_MAXIMO_SEGUNDOS = float(os.getenv("LICITAI_BACKOFF_MAXIMO", str(6 * 3600)))
+
+# Status de reagendamento de cada etapa (aguardando `nextAttemptAt`).
+STATUS_REAGENDADA_ANALISE = 'reagendada_analise'
+STATUS_REAGENDADA_ENRIQUECIMENTO = 'reagendada_enriquecimento'
+
+def espera_backoff(tentativas: int) -> float:
+    """Segundos até a próxima tentativa após `tentativas` falhas (exponencial, com jitter e teto)."""
+    espera = min(BACKOFF_MAXIMO_SEGUNDOS, BACKOFF_BASE_SEGUNDOS * 2 ** max(0, tentativas - 1))
+    return espera * random.uniform(0.8, 1.2)
+
+def campos_falha(tentativas_anteriores: int, mensagem: str, status_reagendado: str, status_falha: str,
+                 transitoria: bool = True, max_tentativas: int = MAX_TENTATIVAS_PADRAO) -> dict:
+    """
+    Campos da atualização de uma tarefa que falhou: reagendada com backoff enquanto houver
+    tentativas (e a falha for transitória), ou movida para `status_falha`.
+    """
+    tentativas = tentativas_anteriores + 1
+    agora = datetime.datetime.now(datetime.timezone.utc)
+    if transitoria and tentativas < max_tentativas:
+        return {
+            'status': status_reagendado,
+            'attempts': tentativas,
+            'nextAttemptAt': agora + datetime.timedelta(seconds=espera_backoff(tentativas)),
+            'logErro': mensagem
+        }
+    return {
+        'status': status_falha,
+        'attempts': tentativas,
+        'nextAttemptAt': firestore.DELETE_FIELD,
+        'logErro': mensagem
+    }
+
+def campos_sucesso() -> dict:
+    """Campos a incluir na conclusão de uma etapa: a etapa seguinte começa com o contador zerado."""
+    return {'attempts': firestore.DELETE_FIELD, 'nextAttemptAt': firestore.DELETE_FIELD}
+
+def reenfileirar_por_status(db, collection_name: str, status_origem: list, status_destino: str,
+                            zerar_tentativas: bool = True, tamanho_lote: int = 400) -> int:
+    """Move em massa as tarefas com status em `status_origem` para `status_destino`. Retorna quantas foram movidas."""
+    atualizacao = {
+        'status': status_destino,
+        'nextAttemptAt': firestore.DELETE_FIELD,
+        'workerId': firestore.DELETE_FIELD,
+        'leaseExpiresAt': firestore.DELETE_FIELD
+    }
+    if zerar_tentativas:
+        atualizacao['attempts'] = 0
+
+    movidas = 0
+    collection_ref = db.collection(collection_name)
+    # O operador 'in' aceita no máximo 30 valores por consulta.
+    for inicio in range(0, len(status_origem), 30):
+        query = collection_ref.where('status', 'in', status_origem[inicio:inicio + 30])
+        batch = db.batch()
+        no_lote = 0
+        for doc in query.stream():
+            batch.update(doc.reference, atualizacao)
+            no_lote += 1
+            movidas += 1
+            if no_lote >= tamanho_lote:
+                batch.commit()
+                batch = db.batch()
+                no_lote = 0
+        if no_lote:
+            batch.commit()
+    return movidas
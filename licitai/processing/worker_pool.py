@@ -0,0 +1,140 @@
+# licitai/processing/worker_pool.py
+"""
+Laço contínuo de processamento para os workers (produtor/consumidor).
+Um prefetcher mantém uma asyncio.Queue abastecida com tarefas e N consumidores
+as processam continuamente, sem esperar o lote inteiro terminar.
+"""
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class WorkerPool:
+    """
+    Orquestra a busca e o processamento de tarefas.
+
+    - `buscar_tarefas(limite)`: corrotina que retorna até `limite` documentos de tarefa.
+    - `processar_tarefas(docs)`: corrotina que processa uma lista de até `tamanho_lote` documentos.
+
+    O prefetcher ignora documentos que já estão na fila ou em processamento, e o
+    encerramento (parar()) interrompe a busca mas deixa os consumidores esvaziarem a fila.
+    """
+
+    def __init__(self, buscar_tarefas, processar_tarefas, concorrencia: int = 4, tamanho_lote: int = 1,
+                 tamanho_fila: int | None = None, intervalo_ocioso: float = 60, intervalo_fila_cheia: float = 1,
+                 nome: str = 'worker'):
+        self._buscar_tarefas = buscar_tarefas
+        self._processar_tarefas = processar_tarefas
+        self.concorrencia = max(1, concorrencia)
+        self.tamanho_lote = max(1, tamanho_lote)
+        self._fila = asyncio.Queue(maxsize=tamanho_fila or self.concorrencia * self.tamanho_lote * 2)
+        self._semaforo = asyncio.Semaphore(self.concorrencia)
+        self.intervalo_ocioso = intervalo_ocioso
+        self._intervalo_fila_cheia = intervalo_fila_cheia
+        self._nome = nome
+        self._em_voo = set()
+        self._parar = asyncio.Event()
+        self._acordado = asyncio.Event()
+        self._consumidores = []
+        self._tarefa_prefetcher = None
+        self.processadas = 0
+
+    def parar(self):
+        """Solicita o encerramento gracioso; uma segunda chamada cancela o processamento em curso."""
+        if self._parar.is_set():
+            logger.warning(f"[{self._nome}] Segundo pedido de parada: cancelando o processamento em curso.")
+            for tarefa in [self._tarefa_prefetcher, *self._consumidores]:
+                if tarefa is not None:
+                    tarefa.cancel()
+            return
+        logger.info(f"[{self._nome}] Encerrando: a busca foi interrompida e a fila interna será esvaziada...")
+        self._parar.set()
+
+    def acordar(self):
+        """Interrompe a espera do prefetcher para que ele busque tarefas imediatamente (ex: aviso do listener)."""
+        self._acordado.set()
+
+    async def _aguardar(self, segundos: float):
+        """Dorme por `segundos`, acordando antes caso o encerramento seja solicitado ou acordar() seja chamado."""
+        esperas = [asyncio.ensure_future(self._parar.wait()), asyncio.ensure_future(self._acordado.wait())]
+        try:
+            await asyncio.wait(esperas, timeout=segundos, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for espera in esperas:
+                espera.cancel()
+        self._acordado.clear()
+
+    async def enfileirar(self, docs, ignorar=frozenset()) -> int:
+        """Adiciona documentos à fila interna, ignorando os que já estão em voo. Retorna quantos entraram."""
+        novos = 0
+        for doc in docs:
+            if doc.id in self._em_voo or doc.id in ignorar:
+                continue
+            self._em_voo.add(doc.id)
+            await self._fila.put(doc)
+            novos += 1
+        return novos
+
+    async def _prefetcher(self):
+        while not self._parar.is_set():
+            espaco = self._fila.maxsize - self._fila.qsize()
+            if espaco <= 0:
+                await self._aguardar(self._intervalo_fila_cheia)
+                continue
+            # Documentos em voo no início da consulta podem voltar nela com dados antigos,
+            # mesmo que terminem antes da resposta chegar.
+            em_voo_na_consulta = frozenset(self._em_voo)
+            try:
+                docs = await self._buscar_tarefas(espaco)
+            except Exception as e:
+                logger.error(f"[{self._nome}] Erro ao buscar tarefas: {e}", exc_info=True)
+                await self._aguardar(self.intervalo_ocioso)
+                continue
+
+            novos = await self.enfileirar(docs, ignorar=em_voo_na_consulta)
+            if novos:
+                logger.info(f"[{self._nome}] {novos} tarefa(s) adicionada(s) à fila interna ({self._fila.qsize()} aguardando).")
+                continue
+            if not self._em_voo:
+                logger.info(f"[{self._nome}] Nenhuma tarefa encontrada. Aguardando até {self.intervalo_ocioso} segundos...")
+            await self._aguardar(self.intervalo_ocioso)
+
+        # Sinaliza o fim para cada consumidor, depois dos itens que ainda estão na fila.
+        for _ in range(self.concorrencia):
+            await self._fila.put(None)
+
+    async def _consumidor(self, indice: int):
+        encerrar = False
+        while not encerrar:
+            primeiro = await self._fila.get()
+            if primeiro is None:
+                break
+            lote = [primeiro]
+            # Completa o lote com o que já estiver disponível, sem esperar.
+            while len(lote) < self.tamanho_lote and not self._fila.empty():
+                doc = self._fila.get_nowait()
+                if doc is None:
+                    encerrar = True
+                    break
+                lote.append(doc)
+
+            try:
+                async with self._semaforo:
+                    await self._processar_tarefas(lote)
+                self.processadas += len(lote)
+            except Exception as e:
+                logger.error(f"[{self._nome}] Consumidor {indice}: erro inesperado ao processar lote: {e}", exc_info=True)
+            finally:
+                for doc in lote:
+                    self._em_voo.discard(doc.id)
+
+    async def executar(self):
+        """Executa o prefetcher e os consumidores até o encerramento e o esvaziamento da fila."""
+        logger.info(f"[{self._nome}] Iniciando com {self.concorrencia} consumidor(es) e lotes de até {self.tamanho_lote} tarefa(s).")
+        self._consumidores = [asyncio.create_task(self._consumidor(i)) for i in range(self.concorrencia)]
+        self._tarefa_prefetcher = asyncio.create_task(self._prefetcher())
+        try:
+            await asyncio.gather(self._tarefa_prefetcher, *self._consumidores, return_exceptions=True)
+        finally:
+            self._tarefa_prefetcher.cancel()
+        logger.info(f"[{self._nome}] Encerrado. {self.processadas} tarefa(s) processada(s) nesta execução.")
@@ -0,0 +1,120 @@
+# licitai/processing/write_coalescer.py
+"""
+Agrupamento das atualizações de estado das tarefas num mesmo WriteBatch.
+Os consumidores de um worker terminam tarefas quase ao mesmo tempo; em vez de um
+`update` por tarefa (cada um numa ida e volta ao Firestore), as atualizações ficam
+num buffer e são gravadas juntas quando o buffer enche ou após um intervalo curto.
+"""
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# --- Constantes ---
+TAMANHO_MAXIMO_PADRAO = 200 # Escritas por commit (o Firestore aceita até 500 por batch).
+INTERVALO_PADRAO = 0.2 # Segundos que uma escrita pode esperar por companhia no buffer.
+
+class AgrupadorEscritas:
+    """
+    Buffer de atualizações (`ref.update`) gravadas em lote.
+    Atualizações do mesmo documento ainda não gravadas são mescladas numa só.
+    Se o commit do lote falhar (ex: um documento removido), cada escrita é
+    refeita individualmente para que uma falha não derrube as demais.
+    `db` é um `firestore.AsyncClient`.
+    """
+
+    def __init__(self, db, tamanho_maximo: int = TAMANHO_MAXIMO_PADRAO, intervalo: float = INTERVALO_PADRAO):
+        self._db = db
+        self.tamanho_maximo = tamanho_maximo
+        self.intervalo = intervalo
+        self._pendentes = {} # caminho do documento -> (ref, dados, [futures])
+        self._temporizador = None
+        self._descargas = set()
+        self.commits = 0
+        self.escritas = 0
+
+    def enfileirar(self, ref, dados: dict) -> asyncio.Future:
+        """Adiciona uma atualização ao buffer. Retorna um future resolvido quando ela for gravada."""
+        futuro = asyncio.get_running_loop().create_future()
+        if ref.path in self._pendentes:
+            _, dados_anteriores, futuros = self._pendentes[ref.path]
+            dados_anteriores.update(dados)
+            futuros.append(futuro)
+        else:
+            self._pendentes[ref.path] = (ref, dict(dados), [futuro])
+
+        if len(self._pendentes) >= self.tamanho_maximo:
+            self._disparar_descarga()
+        elif self._temporizador is None:
+            self._temporizador = asyncio.get_running_loop().call_later(self.intervalo, self._disparar_descarga)
+        return futuro
+
+    async def atualizar(self, ref, dados: dict):
+        """Enfileira a atualização e aguarda sua gravação (propaga o erro, como `ref.update`)."""
+        await self.enfileirar(ref, dados)
+
+    def _disparar_descarga(self):
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+            self._temporizador = None
+        if not self._pendentes:
+            return
+        escritas, self._pendentes = list(self._pendentes.values()), {}
+        tarefa = asyncio.create_task(self._gravar(escritas))
+        self._descargas.add(tarefa)
+        tarefa.add_done_callback(self._descargas.discard)
+
+    async def _commit_lote(self, escritas):
+        batch = self._db.batch()
+        for ref, dados, _ in escritas:
+            batch.update(ref, dados)
+        await batch.commit()
+
+    async def _gravar(self, escritas):
+        try:
+            await self._commit_lote(escritas)
+            self.commits += 1
+            self.escritas += len(escritas)
+            for _, _, futuros in escritas:
+                for futuro in futuros:
+                    if not futuro.done():
+                        futuro.set_result(None)
+            return
+        except Exception as e:
+            logger.warning(f"Falha no commit agrupado de {len(escritas)} escrita(s) ({e}). Gravando individualmente...")
+
+        for ref, dados, futuros in escritas:
+            try:
+                await ref.update(dados)
+                self.commits += 1
+                self.escritas += 1
+                erro = None
+            except Exception as e:
+                erro = e
+            for futuro in futuros:
+                if futuro.done():
+                    continue
+                if erro is None:
+                    futuro.set_result(None)
+                else:
+                    futuro.set_exception(erro)
+
+    async def descarregar(self):
+        """Grava imediatamente o que estiver no buffer e aguarda os commits em andamento."""
+        self._disparar_descarga()
+        if self._descargas:
+            await asyncio.gather(*self._descargas, return_exceptions=True)
+
+    def metricas(self) -> dict:
+        return {
+            'commits': self.commits,
+            'escritas': self.escritas,
+            'escritasPorCommit': self.escritas / self.commits if self.commits else 0.0
+        }
+
+async def gravar_atualizacao(ref, dados: dict, escritas: AgrupadorEscritas | None = None):
+    """Atualiza `ref` (referência do AsyncClient) pelo agrupador, se houver um, ou diretamente."""
+    if escritas is None:
+        await ref.update(dados)
+    else:
+        await escritas.atualizar(ref, dados)
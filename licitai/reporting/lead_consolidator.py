@@ -1,15 +1,20 @@
 # licitai/reporting/lead_consolidator.py (Versão Final com Leitura Direta do Firestore)
 """
 Consolida os resultados diretamente do Firestore, gerando um relatório
-final em Excel com os leads qualificados e enriquecidos.
+final em Excel (ou CSV/Parquet, com --formato) com os leads qualificados e enriquecidos.
+Os leads são gravados à medida que são lidos, sem montar o relatório inteiro em memória.
 """
+import argparse
 import datetime
-import pandas as pd
 import sys
 import os
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from google.cloud import firestore
+from licitai.processing.contratacao_snapshot import CAMPO_SNAPSHOT, CAMPOS_SNAPSHOT, obter_snapshot
+from licitai.reporting.report_writers import FORMATOS
 
 # --- Configuração Inicial ---
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = os.path.join(os.getcwd(), "firebase-admin.json")
@@ -19,6 +24,12 @@ logger = logging.getLogger(__name__)
 # --- Constantes ---
 TAREFAS_COLLECTION_NAME = 'tarefasRaspagem'
 CONTRATACOES_COLLECTION_NAME = 'contratacoes'
+TAMANHO_BLOCO_CONTRATACOES = 300 # Contratações por chamada get_all.
+BLOCOS_EM_PARALELO = 4
+# Campos das tarefas lidos pela query (projeção): o restante do documento não é transferido.
+CAMPOS_TAREFA = ['numeroControlePNCP', 'status', 'resultado', 'contatosEncontrados', CAMPO_SNAPSHOT]
+COLUNAS_RELATORIO = ['PNCP', 'Orgao', 'Municipio', 'Objeto da Compra', 'Link Edital', 'Gatilho de Venda',
+                     'Palavras-Chave IA', 'Status Final', 'Email Encontrado', 'Total Contatos']
 
 def get_firestore_client():
     """Inicializa e retorna o cliente do Firestore."""
@@ -28,80 +39,116 @@ def get_firestore_client():
         logger.error(f"Falha ao inicializar o cliente do Firestore: {e}", exc_info=True)
         sys.exit(1)
 
-def fetch_data_from_firestore(db):
-    """Busca e combina os dados das coleções 'tarefasRaspagem' e 'contratacoes'."""
+def _buscar_contratacoes(db, numeros: list) -> dict:
+    """Campos do snapshot das contratações `numeros`, lidos numa única chamada get_all."""
+    contratacoes_ref = db.collection(CONTRATACOES_COLLECTION_NAME)
+    refs = [contratacoes_ref.document(numero) for numero in numeros]
+    return {doc.id: doc.to_dict() for doc in db.get_all(refs, field_paths=list(CAMPOS_SNAPSHOT)) if doc.exists}
+
+def _linha(pncp_number: str, tarefa_data: dict, contratacao_data: dict) -> tuple:
+    """Linha do relatório (na ordem de COLUNAS_RELATORIO) combinando a tarefa e a contratação."""
+    resultado_ia = tarefa_data.get('resultado') or {}
+    contatos_encontrados = tarefa_data.get('contatosEncontrados') or []
+    return (
+        pncp_number,
+        contratacao_data.get('orgaoRazaoSocial', 'N/A'),
+        f"{contratacao_data.get('municipioNome', 'N/A')}/{contratacao_data.get('ufSigla', 'N/A')}",
+        contratacao_data.get('objetoCompra', 'N/A'),
+        contratacao_data.get('linkEditalDocumentos', 'N/A'),
+        resultado_ia.get('gatilhoVenda', 'N/A'),
+        ", ".join(resultado_ia.get('palavrasChave', [])),
+        tarefa_data.get('status', 'N/A'),
+        # Pega o primeiro e-mail encontrado, se houver
+        contatos_encontrados[0]['email'] if contatos_encontrados else 'N/A',
+        len(contatos_encontrados)
+    )
+
+def _linhas_do_bloco(leitura, bloco: dict):
+    """Linhas das tarefas sem snapshot de um bloco, depois que suas contratações foram lidas."""
+    contratacoes = leitura.result()
+    ausentes = 0
+    for pncp_number, tarefas in bloco.items():
+        contratacao_data = contratacoes.get(pncp_number)
+        if contratacao_data is None:
+            ausentes += 1 # As colunas da contratação ficam como 'N/A'.
+            contratacao_data = {}
+        for tarefa_data in tarefas:
+            yield _linha(pncp_number, tarefa_data, contratacao_data)
+    if ausentes:
+        logger.warning(f"{ausentes} contratação(ões) de tarefas sem snapshot não encontrada(s).")
+
+def gerar_leads(db, tamanho_bloco: int = TAMANHO_BLOCO_CONTRATACOES, blocos_em_paralelo: int = BLOCOS_EM_PARALELO):
+    """
+    Gera as linhas do relatório (tuplas na ordem de COLUNAS_RELATORIO) à medida que as tarefas
+    finalizadas são lidas, sem acumular o conjunto inteiro em memória.
+    As tarefas vêm de uma única query com projeção dos campos usados no relatório; as
+    contratações das tarefas antigas (sem snapshot) são lidas em blocos de `tamanho_bloco`
+    com get_all, até `blocos_em_paralelo` ao mesmo tempo e enquanto a query ainda é lida.
+    As linhas dessas tarefas saem quando o seu bloco termina de ser lido, fora da ordem da query.
+    """
     logger.info("Buscando tarefas finalizadas no Firestore...")
     
     # Status que indicam que uma tarefa foi processada e pode ser um lead
     status_relevantes = ['analise_concluida', 'enriquecimento_concluido', 'falha_enriquecimento']
     
     tarefas_ref = db.collection(TAREFAS_COLLECTION_NAME)
-    contratacoes_ref = db.collection(CONTRATACOES_COLLECTION_NAME)
-    
-    leads_data = []
     
     # Usamos 'in' para buscar múltiplos status de uma vez
-    query = tarefas_ref.where('status', 'in', status_relevantes)
-    
-    for tarefa_doc in query.stream():
-        tarefa_data = tarefa_doc.to_dict()
-        pncp_number = tarefa_data.get("numeroControlePNCP")
-        
-        if not pncp_number:
-            continue
-
-        # Busca os dados da contratação original para complementar as informações
-        contratacao_doc = contratacoes_ref.document(pncp_number).get()
-        if contratacao_doc.exists:
-            contratacao_data = contratacao_doc.to_dict()
-        else:
-            contratacao_data = {}
+    query = tarefas_ref.where('status', 'in', status_relevantes).select(CAMPOS_TAREFA)
 
-        # Combina os dados da tarefa e da contratação
-        resultado_ia = tarefa_data.get('resultado', {})
-        contatos_encontrados = tarefa_data.get('contatosEncontrados', [])
-        
-        # Pega o primeiro e-mail encontrado, se houver
-        primeiro_email = contatos_encontrados[0]['email'] if contatos_encontrados else 'N/A'
-
-        lead = {
-            'PNCP': pncp_number,
-            'Orgao': contratacao_data.get('orgaoRazaoSocial', 'N/A'),
-            'Municipio': f"{contratacao_data.get('municipioNome', 'N/A')}/{contratacao_data.get('ufSigla', 'N/A')}",
-            'Objeto da Compra': contratacao_data.get('objetoCompra', 'N/A'),
-            'Link Edital': contratacao_data.get('linkEditalDocumentos', 'N/A'),
-            'Gatilho de Venda': resultado_ia.get('gatilhoVenda', 'N/A'),
-            'Palavras-Chave IA': ", ".join(resultado_ia.get('palavrasChave', [])),
-            'Status Final': tarefa_data.get('status', 'N/A'),
-            'Email Encontrado': primeiro_email,
-            'Total Contatos': len(contatos_encontrados)
-        }
-        leads_data.append(lead)
-        
-    if not leads_data:
-        return pd.DataFrame() # Retorna um DataFrame vazio se nada for encontrado
-
-    return pd.DataFrame(leads_data)
+    bloco = {} # numeroControlePNCP -> tarefas sem snapshot que dependem dessa contratação
+    leituras = deque() # (future do get_all, bloco), na ordem de envio
+    with ThreadPoolExecutor(max_workers=blocos_em_paralelo) as executor:
+        for tarefa_doc in query.stream():
+            tarefa_data = tarefa_doc.to_dict()
+            pncp_number = tarefa_data.get("numeroControlePNCP")
+            
+            if not pncp_number:
+                continue
+
+            # Dados da contratação original: snapshot gravado na tarefa (ou leitura em bloco, em tarefas antigas)
+            snapshot = obter_snapshot(tarefa_data)
+            if snapshot is not None:
+                yield _linha(pncp_number, tarefa_data, snapshot)
+                continue
+            bloco.setdefault(pncp_number, []).append(tarefa_data)
+            if len(bloco) < tamanho_bloco:
+                continue
+            leituras.append((executor.submit(_buscar_contratacoes, db, list(bloco)), bloco))
+            bloco = {}
+            # Emite os blocos já lidos; acima do limite de blocos em andamento, aguarda o mais antigo.
+            while leituras and (leituras[0][0].done() or len(leituras) > blocos_em_paralelo):
+                yield from _linhas_do_bloco(*leituras.popleft())
+
+        if bloco:
+            leituras.append((executor.submit(_buscar_contratacoes, db, list(bloco)), bloco))
+        while leituras:
+            yield from _linhas_do_bloco(*leituras.popleft())
 
 def main():
     """Função principal para gerar o relatório consolidado."""
-    db = get_firestore_client()
-    df_leads = fetch_data_from_firestore(db)
-
-    if df_leads.empty:
-        logger.warning("Nenhum lead finalizado foi encontrado no Firestore para gerar o relatório.")
-        return
+    parser = argparse.ArgumentParser(description="Consolida os leads finalizados num relatório.")
+    parser.add_argument('--formato', choices=list(FORMATOS), default='xlsx',
+                        help="Formato do relatório: 'xlsx' (padrão), 'csv' ou 'parquet' (recomendados para exportações grandes).")
+    args = parser.parse_args()
 
-    logger.info(f"Total de leads processados encontrados: {len(df_leads)}")
+    db = get_firestore_client()
 
     # Define o caminho do arquivo de saída
     output_dir = Path("resultados")
     output_dir.mkdir(exist_ok=True)
     timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    output_filepath = output_dir / f"Relatorio_Leads_{timestamp}.xlsx"
+    output_filepath = output_dir / f"Relatorio_Leads_{timestamp}.{args.formato}"
+
+    # Os leads são gravados à medida que são lidos do Firestore, em memória constante
+    total = FORMATOS[args.formato](gerar_leads(db), COLUNAS_RELATORIO, output_filepath)
+
+    if total == 0:
+        output_filepath.unlink(missing_ok=True)
+        logger.warning("Nenhum lead finalizado foi encontrado no Firestore para gerar o relatório.")
+        return
 
-    # Salva o arquivo Excel final
-    df_leads.to_excel(output_filepath, index=False, engine='openpyxl')
+    logger.info(f"Total de leads processados encontrados: {total}")
     logger.info(f"Relatório consolidado foi salvo com sucesso em: '{output_filepath}'")
 
 if __name__ == "__main__":
@@ -0,0 +1,86 @@
+# licitai/reporting/report_writers.py
+"""
+Gravação de relatórios em fluxo: cada função consome um iterável de linhas (tuplas na
+ordem de `colunas`) e grava à medida que as recebe, sem montar o relatório em memória.
+O Excel usa o modo write-only do openpyxl; o CSV é gravado linha a linha e o Parquet em
+grupos de linhas (pyarrow, importado apenas quando esse formato é pedido).
+Todas retornam o número de linhas gravadas.
+"""
+import csv
+import logging
+
+logger = logging.getLogger(__name__)
+
+# --- Constantes ---
+MAX_LINHAS_EXCEL = 1_048_575 # Limite de linhas de uma planilha, descontado o cabeçalho.
+LINHAS_POR_GRUPO_PARQUET = 50_000
+
+def escrever_excel(linhas, colunas: list, caminho) -> int:
+    """Planilha .xlsx em modo write-only (memória constante). Falha acima do limite de linhas do Excel."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    planilha = workbook.create_sheet("Leads")
+    planilha.append(colunas)
+    total = 0
+    for linha in linhas:
+        if total == MAX_LINHAS_EXCEL:
+            raise ValueError(f"O relatório passa de {MAX_LINHAS_EXCEL} linhas, o limite do Excel. Use --formato csv ou parquet.")
+        planilha.append(linha)
+        total += 1
+    workbook.save(caminho)
+    return total
+
+def escrever_csv(linhas, colunas: list, caminho) -> int:
+    """CSV em UTF-8 com BOM (abre com os acentos corretos no Excel)."""
+    total = 0
+    with open(caminho, 'w', encoding='utf-8-sig', newline='') as arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(colunas)
+        for linha in linhas:
+            escritor.writerow(linha)
+            total += 1
+    return total
+
+def escrever_parquet(linhas, colunas: list, caminho, linhas_por_grupo: int = LINHAS_POR_GRUPO_PARQUET) -> int:
+    """
+    Parquet gravado em grupos de `linhas_por_grupo` linhas. Os tipos das colunas vêm do
+    primeiro grupo (colunas só com valores nulos nele são gravadas como texto).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritor = None
+    total = 0
+    grupo = []
+
+    def gravar_grupo():
+        nonlocal escritor
+        dados = {coluna: [linha[i] for linha in grupo] for i, coluna in enumerate(colunas)}
+        if escritor is None:
+            esquema = pa.Table.from_pydict(dados).schema
+            esquema = pa.schema([pa.field(campo.name, pa.string()) if pa.types.is_null(campo.type) else campo
+                                 for campo in esquema])
+            escritor = pq.ParquetWriter(caminho, esquema)
+        escritor.write_table(pa.Table.from_pydict(dados, schema=escritor.schema))
+        grupo.clear()
+
+    try:
+        for linha in linhas:
+            grupo.append(linha)
+            total += 1
+            if len(grupo) >= linhas_por_grupo:
+                gravar_grupo()
+        if grupo or escritor is None:
+            gravar_grupo()
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return total
+
+# Formatos aceitos pelo consolidador (--formato) e a função que grava cada um.
+FORMATOS = {
+    'xlsx': escrever_excel,
+    'csv': escrever_csv,
+    'parquet': escrever_parquet,
+}
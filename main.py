@@ -20,6 +20,15 @@ COMMANDS = {
               --data-final <D>    : Define uma data de fim (AAAA-MM-DD).
         """)
     },
+    "importar-cnpj": {
+        "module": "licitai.data_collection.cnpj_index",
+        "description": textwrap.dedent("""
+            Gera o índice local de contatos dos órgãos públicos a partir dos dados abertos do CNPJ (Receita Federal).
+            Uso:
+              --origem <pasta>   : Pasta com os arquivos de Empresas e Estabelecimentos (.zip ou extraídos).
+              --destino <pasta>  : Pasta do índice (padrão: dados/cnpj).
+        """)
+    },
     "gerar-tarefas": {
         "module": "licitai.management.admin",
         "args": ["gerar-tarefas"],
@@ -40,13 +49,57 @@ COMMANDS = {
         "args": ["garantir-pesquisa"],
         "description": "Garante que uma pesquisa inicial de software exista no banco de dados para a geração de tarefas."
     },
+    "limpar-cache-ia": {
+        "module": "licitai.management.admin",
+        "args": ["limpar-cache-ia"],
+        "description": "Remove do cache de análises da IA as entradas geradas por versões antigas do prompt ou do modelo."
+    },
+    "atualizar-snapshots": {
+        "module": "licitai.management.admin",
+        "args": ["atualizar-snapshots"],
+        "description": "Grava nas tarefas existentes o snapshot dos dados da contratação (use --forcar para regravar todos)."
+    },
+    "reenfileirar": {
+        "module": "licitai.management.admin",
+        "args": ["reenfileirar"],
+        "description": textwrap.dedent("""
+            Devolve à fila as tarefas que terminaram em falha (após esgotar as tentativas automáticas).
+            Uso:
+              --etapa analise|enriquecimento : Etapa a reprocessar (padrão: analise).
+              --status <S1> <S2> ...         : Status a reenfileirar (padrão: os status de falha da etapa).
+              --manter-tentativas            : Não zera o contador de tentativas.
+        """)
+    },
+    "relatorio-ia": {
+        "module": "licitai.management.admin",
+        "args": ["relatorio-ia"],
+        "description": "Mostra o consumo da IA por dia: tokens por tarefa, custo estimado e latência (p50/p95) por modelo (--dias <N>)."
+    },
     "processar-tarefas": {
         "module": "licitai.processing.ai_worker",
         "description": "Inicia o worker de IA para processar as tarefas pendentes na fila."
     },
+    "benchmark-ia": {
+        "module": "licitai.benchmarks.ai_worker_bench",
+        "description": textwrap.dedent("""
+            Mede a vazão do worker de IA com um LLM falso e o emulador do Firestore (sem consumir cota).
+            Requer FIRESTORE_EMULATOR_HOST. Uso:
+              --tarefas <N>  --concorrencia <N>  --tamanho-lote <N>
+              --latencia-media <s>  --taxa-429 <0-1>  --taxa-json-malformado <0-1>
+        """)
+    },
+    "benchmark-enriquecimento": {
+        "module": "licitai.benchmarks.enricher_bench",
+        "description": textwrap.dedent("""
+            Mede a vazão do enriquecimento (tarefas/s e contatos/s) com um backend de busca falso e o emulador do Firestore.
+            Requer FIRESTORE_EMULATOR_HOST. Uso:
+              --tarefas <N>  --orgaos <N>  --concorrencia <N>  --latencia-media <s>
+              --taxa-bloqueio <0-1>  --taxa-contatos <0-1>  --buscas-por-minuto <N>  --sem-diretorio
+        """)
+    },
     "consolidar-leads": {
         "module": "licitai.reporting.lead_consolidator",
-        "description": "Consolida os resultados das tarefas processadas em um relatório de leads."
+        "description": "Consolida os resultados das tarefas processadas em um relatório de leads (--formato xlsx|csv|parquet)."
     },
     "monitorar-resultados": {
         "module": "licitai.reporting.results_monitor",
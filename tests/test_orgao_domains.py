@@ -0,0 +1,36 @@
+# tests/test_orgao_domains.py
+"""Testes da identificação do site oficial de um órgão (licitai/processing/orgao_domains.py)."""
+import pytest
+
+from licitai.processing.orgao_domains import eh_dominio_do_orgao
+
+PREFEITURA_ITU = dict(municipio_nome="Itu", orgao_nome="Prefeitura Municipal de Itu", uf_sigla="SP")
+
+@pytest.mark.parametrize("dominio", ["itu.sp.gov.br", "camaraitu.sp.leg.br", "camara-itu.sp.gov.br"])
+def test_aceita_dominios_do_municipio(dominio):
+    assert eh_dominio_do_orgao(dominio, **PREFEITURA_ITU)
+
+@pytest.mark.parametrize("dominio", ["sp.gov.br", "tce.sp.gov.br", "saude.sp.gov.br"])
+def test_rejeita_dominio_estadual_para_orgao_municipal(dominio):
+    assert not eh_dominio_do_orgao(dominio, **PREFEITURA_ITU)
+
+@pytest.mark.parametrize("dominio", ["salto.sp.gov.br", "itupeva.sp.gov.br", "camarasalto.sp.leg.br"])
+def test_rejeita_dominio_de_municipio_vizinho(dominio):
+    assert not eh_dominio_do_orgao(dominio, **PREFEITURA_ITU)
+
+def test_rejeita_municipio_homonimo_de_outra_uf():
+    assert not eh_dominio_do_orgao("itu.ba.gov.br", **PREFEITURA_ITU)
+
+def test_aceita_site_nao_oficial_com_nome_do_municipio():
+    assert eh_dominio_do_orgao("prefeituradecampinas.com.br", municipio_nome="Campinas",
+                               orgao_nome="Prefeitura Municipal de Campinas", uf_sigla="SP")
+
+def test_rejeita_portal_generico():
+    assert not eh_dominio_do_orgao("pncp.gov.br", **PREFEITURA_ITU)
+
+@pytest.mark.parametrize("orgao_nome, dominio", [
+    ("Tribunal de Contas do Estado de São Paulo", "tce.sp.gov.br"),
+    ("Tribunal de Justiça do Estado de São Paulo", "tjsp.jus.br"),
+])
+def test_aceita_orgao_estadual_pela_sigla(orgao_nome, dominio):
+    assert eh_dominio_do_orgao(dominio, municipio_nome="São Paulo", orgao_nome=orgao_nome, uf_sigla="SP")